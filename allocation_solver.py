@@ -0,0 +1,103 @@
+"""
+Deterministic allocation of the AI's ranked trade intents. Given the decisions in
+the order the AI returned them (its ranking) and a pre-trade snapshot, computes a
+feasible set of sell and buy notionals locally:
+
+    1. Sells first, clamped to what each position can deliver.
+    2. Buys in rank order, each clamped to min/max trade sizes and to the
+       snapshot's buying power, keeping the portfolio below PORTFOLIO_LIMIT stocks.
+    3. Buys that only fit with the sells' estimated proceeds (times
+       ALLOCATION_SELL_CREDIT_RATIO) or with the slots they free are deferred:
+       they are planned again against a fresh snapshot once the sells have filled,
+       so the broker never sees a buy funded by cash it doesn't have yet.
+
+Trade exceptions, pending orders and invalid amounts are rejected as in
+pretrade_validator. The AI only needs to be consulted again when no feasible
+trade is left.
+"""
+from config import PORTFOLIO_LIMIT, ALLOCATION_SELL_CREDIT_RATIO
+from pretrade_validator import screen_decisions, validate_sell, validate_buy, reject_decision
+
+
+def _held_symbols(snapshot):
+    """
+    Symbols taking a portfolio slot: open positions plus pending buys.
+    """
+    held = {symbol for symbol, position in snapshot["positions"].items() if position["qty"] > 0}
+    held.update(symbol for symbol, order in snapshot["open_orders"].items() if order["side"] == "buy")
+    return held
+
+
+def solve_allocation(decisions, snapshot):
+    """
+    Return a plan dict:
+        decisions        - decisions executable now, sells first, with adjusted amounts
+        deferred         - buys to plan again once the sells have filled
+        rejected         - dropped decisions with "reason" and "details"
+        feasible         - False when there were trade intents but none survived
+        buying_power     - estimated buying power left after the plan, sells included
+    """
+    intents, rejected = screen_decisions(decisions)
+    held_now = _held_symbols(snapshot)
+    held_after_sells = set(held_now)
+    buying_power_now = snapshot["buying_power"]
+    sells = []
+    buys = []
+    deferred = []
+
+    for decision_data in (intent for intent in intents if intent["decision"] == "sell"):
+        result, rejection = validate_sell(decision_data, snapshot)
+        if rejection:
+            rejected.append(rejection)
+            continue
+        sells.append(result)
+
+        # A sell of the whole position frees its portfolio slot
+        symbol = result["symbol"]
+        position = snapshot["positions"][symbol]
+        if result["amount"] >= position["qty"] * position["price"] - 0.01 and symbol not in snapshot["open_orders"]:
+            held_after_sells.discard(symbol)
+    buying_power_after_sells = buying_power_now + sum(sell["amount"] for sell in sells) * ALLOCATION_SELL_CREDIT_RATIO
+
+    for decision_data in (intent for intent in intents if intent["decision"] == "buy"):
+        symbol = decision_data["symbol"]
+        wanted, rejection = validate_buy(decision_data, snapshot, float("inf"))
+        if rejection:
+            rejected.append(rejection)
+            continue
+        slot_free_now = symbol in held_now or len(held_now) < PORTFOLIO_LIMIT - 1
+        if sells and (wanted["amount"] > buying_power_now or not slot_free_now):
+            # Only fundable (or placeable) once the sells have filled
+            if symbol not in held_after_sells and len(held_after_sells) >= PORTFOLIO_LIMIT - 1:
+                rejected.append(reject_decision(decision_data, "portfolio_limit", f"Portfolio would still hold {len(held_after_sells)} stocks after the sells, the limit is fewer than {PORTFOLIO_LIMIT}"))
+                continue
+            result, rejection = validate_buy(decision_data, snapshot, buying_power_after_sells)
+            if rejection:
+                rejected.append(rejection)
+                continue
+            deferred.append(result)
+            buying_power_after_sells -= result["amount"]
+            held_after_sells.add(symbol)
+            continue
+
+        if not slot_free_now:
+            rejected.append(reject_decision(decision_data, "portfolio_limit", f"Portfolio already holds {len(held_now)} stocks, the limit is fewer than {PORTFOLIO_LIMIT}"))
+            continue
+        # Higher-ranked deferred buys keep their share of the sell proceeds
+        result, rejection = validate_buy(decision_data, snapshot, min(buying_power_now, buying_power_after_sells))
+        if rejection:
+            rejected.append(rejection)
+            continue
+        buys.append(result)
+        buying_power_now -= result["amount"]
+        buying_power_after_sells -= result["amount"]
+        held_now.add(symbol)
+        held_after_sells.add(symbol)
+
+    return {
+        "decisions": sells + buys,
+        "deferred": deferred,
+        "rejected": rejected,
+        "feasible": bool(sells or buys or deferred) or not intents,
+        "buying_power": round(buying_power_after_sells, 2),
+    }
@@ -1,63 +1,143 @@
 import json
 from datetime import datetime
-from pytz import timezone
-import yfinance as yf
-import pandas as pd
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest, GetOrdersRequest
-from alpaca.trading.enums import OrderSide, TimeInForce, QueryOrderStatus
 from config import (
-    PAPER_TRADING, ALPACA_API_KEY, ALPACA_SECRET_KEY, WATCHLIST_FILE,
+    PAPER_TRADING, ALPACA_API_KEY, ALPACA_SECRET_KEY, ALPACA_TRADING_URL_OVERRIDE, WATCHLIST_FILE,
     MIN_BUYING_AMOUNT_USD, MAX_BUYING_AMOUNT_USD,
     MIN_SELLING_AMOUNT_USD, MAX_SELLING_AMOUNT_USD,
-    BYPASS_MARKET_HOURS
+    BYPASS_MARKET_HOURS, QUOTE_CACHE_SECONDS, MARKET_DATA_SHM_ENABLED
 )
 from log import log_error
+from yfinance_functions import get_cached_quote, get_batch_quotes, get_batch_daily_bars
+from market_data_cache import cache_get, cache_put, cache_put_many
+from shm_market_data import get_shared_closes
+from market_data_providers import get_market_data_provider
+from deadline_fetch import fetch_with_deadline
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning, module="yfinance")
 
+# Alpaca Trading Client, created on first use by get_trading_client()
+_trading_client = None
 
-# Initialize the Alpaca Trading Client
-trading_client = TradingClient(ALPACA_API_KEY, ALPACA_SECRET_KEY, paper=PAPER_TRADING)
+
+def get_trading_client():
+    """
+    Return the shared Alpaca Trading Client, initializing it on first use.
+    """
+    global _trading_client
+    if _trading_client is None:
+        from alpaca.trading.client import TradingClient
+        _trading_client = TradingClient(ALPACA_API_KEY, ALPACA_SECRET_KEY, paper=PAPER_TRADING, url_override=ALPACA_TRADING_URL_OVERRIDE)
+    return _trading_client
 
 ###############################################################################
 # PRICE + MOVING AVERAGES
 ###############################################################################
 def get_current_price(symbol):
     """
-    Simple helper that grabs the latest close from yfinance.
+    Simple helper that grabs the latest price from the market data provider,
+    reusing a recently batched quote when there is one.
     """
-    ticker = yf.Ticker(symbol)
-    data = ticker.history(period="1d")
-    if data.empty:
+    cached_quote = get_cached_quote(symbol, QUOTE_CACHE_SECONDS)
+    if cached_quote:
+        return cached_quote["price"]
+
+    quote = fetch_with_deadline(
+        "market_data_quotes", "latest", lambda: get_market_data_provider().get_quotes([symbol]), items=[symbol]
+    ).get(symbol)
+    if quote is None:
         return None
-    return float(data["Close"].iloc[-1])
+    cache_put("quote", symbol, {"price": quote.price})
+    return quote.price
+
+def get_current_prices(symbols):
+    """
+    Latest prices for many symbols, reusing recently batched quotes and fetching
+    the rest in one batched request to the market data provider.
+    """
+    prices = {}
+    missing_symbols = []
+    for symbol in dict.fromkeys(symbols):
+        cached_quote = get_cached_quote(symbol, QUOTE_CACHE_SECONDS)
+        if cached_quote:
+            prices[symbol] = cached_quote["price"]
+        else:
+            missing_symbols.append(symbol)
+    if missing_symbols:
+        for symbol, quote in get_batch_quotes(missing_symbols).items():
+            prices[symbol] = quote["price"]
+    return prices
+
+def moving_averages_from_closes(closes, short_window=50, long_window=200):
+    """
+    Compute rounded short and long simple moving averages from daily closes
+    (NaN when there is less history than the window).
+    """
+    short_mavg = sum(closes[-short_window:]) / short_window if len(closes) >= short_window else float("nan")
+    long_mavg = sum(closes[-long_window:]) / long_window if len(closes) >= long_window else float("nan")
+    return round(short_mavg, 2), round(long_mavg, 2)
 
 def calculate_moving_averages(symbol, short_window=50, long_window=200):
     """
-    Get short and long moving averages from yfinance.
+    Get short and long moving averages from the market data provider, reusing
+    the shared memory segment when enabled or the market data cache.
     """
-    ticker = yf.Ticker(symbol)
-    hist = ticker.history(period="1y")
-    if hist.empty:
+    if MARKET_DATA_SHM_ENABLED:
+        closes = get_shared_closes(symbol)
+        if closes and len(closes) >= long_window:
+            return moving_averages_from_closes(closes, short_window, long_window)
+
+    cache_key = f"{symbol}:{short_window}:{long_window}"
+    cached = cache_get("moving_averages", cache_key)
+    if cached:
+        return tuple(cached)
+
+    # Cached as daily bars too, so other consumers of the year of history (portfolio risk) reuse it
+    bars = get_batch_daily_bars([symbol], period="1y").get(symbol)
+    if not bars:
         return None, None
-    prices = hist["Close"]
-    short_mavg = prices.rolling(window=short_window).mean().iloc[-1]
-    long_mavg = prices.rolling(window=long_window).mean().iloc[-1]
-    return round(short_mavg, 2), round(long_mavg, 2)
+    moving_averages = moving_averages_from_closes(bars['closes'], short_window, long_window)
+    cache_put("moving_averages", cache_key, moving_averages)
+    return moving_averages
+
+def calculate_batch_moving_averages(symbols, short_window=50, long_window=200, max_age_seconds=None):
+    """
+    Fill the market data cache with moving averages for many symbols, fetching
+    a year of bars in one provider request for the symbols missing from it (or
+    cached longer ago than max_age_seconds). Returns the number of symbols fetched.
+    """
+    missing_symbols = sorted(
+        symbol for symbol in set(symbols)
+        if not cache_get("moving_averages", f"{symbol}:{short_window}:{long_window}", max_age_seconds)
+    )
+    if not missing_symbols:
+        return 0
+
+    bars_by_symbol = get_batch_daily_bars(missing_symbols, period="1y")
+    cache_put_many("moving_averages", {
+        f"{symbol}:{short_window}:{long_window}": moving_averages_from_closes(bars['closes'], short_window, long_window)
+        for symbol, bars in bars_by_symbol.items() if bars['closes']
+    })
+    return len(bars_by_symbol)
 
 ###############################################################################
 # MARKET + ACCOUNT INFO
 ###############################################################################
 def is_market_open():
     """
-    Check if the market is open using Alpaca's API.
+    Check if the market is open using the locally cached market calendar,
+    falling back to Alpaca's clock if the calendar is unavailable.
     If BYPASS_MARKET_HOURS is True, always returns True.
     """
     if BYPASS_MARKET_HOURS:
         return True
-        
-    clock = trading_client.get_clock()
+
+    try:
+        from market_calendar import is_market_open_at
+        return is_market_open_at()
+    except Exception as e:
+        log_error(f"Market calendar unavailable, falling back to Alpaca clock: {e}")
+
+    clock = get_trading_client().get_clock()
     return clock.is_open
 
 def get_buying_power():
@@ -70,20 +150,30 @@ def get_buying_power():
 ###############################################################################
 # PORTFOLIO + WATCHLIST
 ###############################################################################
-def get_portfolio_stocks():
+def get_positions_and_orders():
+    """
+    Get all positions and the current open orders (by symbol) from Alpaca.
+    """
+    return get_trading_client().get_all_positions(), get_open_orders()
+
+def get_portfolio_stocks(positions=None, open_orders=None, prices=None):
     """
-    Get all positions from Alpaca and include current prices from yfinance.
-    Also includes current open orders for each position.
+    Get all positions from Alpaca and include current prices from the market data
+    provider. Also includes current open orders for each position. Prices missing
+    from `prices` are fetched in one batched request.
     """
-    positions = trading_client.get_all_positions()
+    if positions is None:
+        positions, open_orders = get_positions_and_orders()
     portfolio = {}
-    
-    # Get current open orders
-    open_orders = get_open_orders()
-    
+
+    prices = dict(prices or {})
+    missing_symbols = [symbol for symbol in [position.symbol for position in positions] + list(open_orders) if symbol not in prices]
+    if missing_symbols:
+        prices.update(get_current_prices(missing_symbols))
+
     for position in positions:
         symbol = position.symbol
-        current_price = get_current_price(symbol)
+        current_price = prices.get(symbol)
         
         # Calculate total position value
         quantity = float(position.qty)
@@ -102,7 +192,7 @@ def get_portfolio_stocks():
     # Also include any open orders for symbols not in portfolio
     for symbol, order in open_orders.items():
         if symbol not in portfolio:
-            current_price = get_current_price(symbol)
+            current_price = prices.get(symbol)
             portfolio[symbol] = {
                 "price": round(current_price, 2) if current_price else 0,
                 "quantity": 0,
@@ -126,8 +216,9 @@ def get_watchlist_stocks(name):
     
     # Add current prices to watchlist stocks
     watchlist_stocks = watchlists[name]
+    prices = get_current_prices([stock['symbol'] for stock in watchlist_stocks])
     for stock in watchlist_stocks:
-        current_price = get_current_price(stock['symbol'])
+        current_price = prices.get(stock['symbol'])
         stock['price'] = round(current_price, 2) if current_price else 0
     
     return watchlist_stocks
@@ -229,6 +320,9 @@ def buy_stock(symbol, amount):
     if MAX_BUYING_AMOUNT_USD is not False:
         amount = min(amount, MAX_BUYING_AMOUNT_USD)
     
+    from alpaca.trading.requests import MarketOrderRequest
+    from alpaca.trading.enums import OrderSide, TimeInForce
+
     # Round to 2 decimal places for dollar amounts
     amount = round(amount, 2)
     
@@ -239,41 +333,56 @@ def buy_stock(symbol, amount):
         time_in_force=TimeInForce.DAY
     )
     
-    order_response = trading_client.submit_order(order_data=order_data)
+    order_response = get_trading_client().submit_order(order_data=order_data)
     
     return {
         "id": order_response.id,
-        "quantity": float(order_response.qty) if order_response.qty else amount/float(order_response.filled_avg_price or get_current_price(symbol)),
+        # Notional orders report no quantity until filled; the fill tracker records the executed one
+        "quantity": float(order_response.qty) if order_response.qty else None,
         "price": float(order_response.filled_avg_price) if order_response.filled_avg_price else None,
     }
 
-def sell_stock(symbol, amount):
+def sell_stock(symbol, amount, snapshot=None):
     """
     Places a market sell order via Alpaca using dollar amount (notional).
     Respects MIN_SELLING_AMOUNT_USD and MAX_SELLING_AMOUNT_USD settings.
-    Checks available quantity first and adjusts amount if necessary.
+    Checks available quantity first and adjusts amount if necessary, using the
+    pre-trade snapshot's positions and open orders when one is given instead of
+    fetching them again.
     """
+    from alpaca.trading.requests import MarketOrderRequest
+    from alpaca.trading.enums import OrderSide, TimeInForce
+
     try:
-        # Get current position
-        position = None
-        try:
-            position = trading_client.get_open_position(symbol)
-        except Exception as e:
-            if "position does not exist" in str(e).lower():
+        if snapshot is not None:
+            position = snapshot["positions"].get(symbol)
+            if position is None:
                 return {"error": f"No position exists for {symbol}"}
-            raise e
+            current_price = position["price"]
+            total_shares = position["qty"]
+            open_orders = snapshot["open_orders"]
+        else:
+            # Get current position
+            position = None
+            try:
+                position = get_trading_client().get_open_position(symbol)
+            except Exception as e:
+                if "position does not exist" in str(e).lower():
+                    return {"error": f"No position exists for {symbol}"}
+                raise e
+
+            # Get current price
+            current_price = float(position.current_price)
+            total_shares = float(position.qty)
+
+            # Get open orders for this symbol
+            open_orders = get_open_orders()
 
-        # Get current price
-        current_price = float(position.current_price)
-        
-        # Get open orders for this symbol
-        open_orders = get_open_orders()
         pending_sell_value = 0
         if symbol in open_orders and open_orders[symbol]["side"] == "sell":
             pending_sell_value = open_orders[symbol]["notional"]
 
         # Calculate available quantity and value
-        total_shares = float(position.qty)
         total_value = total_shares * current_price
         pending_value = pending_sell_value
         available_value = total_value - pending_value
@@ -309,7 +418,7 @@ def sell_stock(symbol, amount):
             time_in_force=TimeInForce.DAY
         )
         
-        order_response = trading_client.submit_order(order_data=order_data)
+        order_response = get_trading_client().submit_order(order_data=order_data)
         
         return {
             "id": order_response.id,
@@ -319,6 +428,33 @@ def sell_stock(symbol, amount):
     except Exception as e:
         return {"error": str(e)}
 
+def sell_shares(symbol, qty, current_price):
+    """
+    Places a market sell order for a quantity of shares, without the
+    MIN_SELLING_AMOUNT_USD and MAX_SELLING_AMOUNT_USD limits of sell_stock, so a
+    whole position can be closed in one order (risk exits).
+    """
+    from alpaca.trading.requests import MarketOrderRequest
+    from alpaca.trading.enums import OrderSide, TimeInForce
+
+    try:
+        order_data = MarketOrderRequest(
+            symbol=symbol,
+            qty=round(qty, 9),
+            side=OrderSide.SELL,
+            time_in_force=TimeInForce.DAY
+        )
+
+        order_response = get_trading_client().submit_order(order_data=order_data)
+
+        return {
+            "id": order_response.id,
+            "quantity": float(order_response.qty) if order_response.qty else qty,
+            "price": float(order_response.filled_avg_price) if order_response.filled_avg_price else current_price,
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
 ###############################################################################
 # ORDER RESPONSE EXTRACTION
 ###############################################################################
@@ -327,6 +463,7 @@ def extract_sell_response_data(sell_resp):
     Extracts relevant data from a sell order response.
     """
     return {
+        "order_id": str(sell_resp.get("id")),
         "quantity": sell_resp.get("quantity"),
         "price": sell_resp.get("price"),
     }
@@ -336,6 +473,7 @@ def extract_buy_response_data(buy_resp):
     Extracts relevant data from a buy order response.
     """
     return {
+        "order_id": str(buy_resp.get("id")),
         "quantity": buy_resp.get("quantity"),
         "price": buy_resp.get("price"),
     }
@@ -345,9 +483,12 @@ def get_open_orders():
     Get all open orders with their current status.
     Returns a dictionary of orders by symbol with their details.
     """
+    from alpaca.trading.requests import GetOrdersRequest
+    from alpaca.trading.enums import QueryOrderStatus
+
     try:
         # Get all open orders
-        orders = trading_client.get_orders(filter=GetOrdersRequest(status=QueryOrderStatus.OPEN))
+        orders = get_trading_client().get_orders(filter=GetOrdersRequest(status=QueryOrderStatus.OPEN))
         orders_dict = {}
         for order in orders:
             # Calculate filled notional from filled qty and filled avg price
@@ -381,7 +522,7 @@ def get_account_info():
     and current open orders.
     """
     try:
-        account = trading_client.get_account()
+        account = get_trading_client().get_account()
         open_orders = get_open_orders()
         
         return {
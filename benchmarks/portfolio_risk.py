@@ -0,0 +1,75 @@
+"""
+Portfolio risk benchmark: time of compute_risk() for a synthetic universe of
+held and candidate symbols plus the benchmark, with a year of daily bars already
+downloaded (the bars request itself is not measured). Reported are the median
+time to align the returns window (build_returns) and of the whole computation.
+
+Usage: python benchmarks/portfolio_risk.py [symbol counts...]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, "log_utils")]
+
+import portfolio_risk
+from config import RISK_BENCHMARK_SYMBOL
+
+SYMBOL_COUNTS = [int(count) for count in sys.argv[1:]] or [100, 500]
+HELD_SYMBOLS = 20
+HISTORY_DAYS = 260
+RUNS = 20
+
+
+def make_bars(symbols, days):
+    """
+    Return {symbol: bars} with `days` daily closes as get_batch_daily_bars() does.
+    """
+    random.seed(1)
+    start = int(time.time() // 86400 - days) * 86400
+    timestamps = [start + day * 86400 for day in range(days)]
+    bars_by_symbol = {}
+    for symbol in symbols:
+        price = 100.0
+        closes = []
+        for _ in range(days):
+            price *= 1 + random.gauss(0.0005, 0.015)
+            closes.append(price)
+        bars_by_symbol[symbol] = {"closes": closes, "volumes": [1e6] * days, "timestamps": list(timestamps)}
+    return bars_by_symbol
+
+
+def time_ms(function):
+    started_at = time.perf_counter()
+    function()
+    return (time.perf_counter() - started_at) * 1000
+
+
+def benchmark(count):
+    symbols = [f"S{index:04d}" for index in range(count)]
+    bars_by_symbol = make_bars(symbols + [RISK_BENCHMARK_SYMBOL], HISTORY_DAYS)
+    portfolio_risk.get_batch_daily_bars = lambda symbols, period: bars_by_symbol
+    positions = {symbol: 1000.0 for symbol in symbols[:HELD_SYMBOLS]}
+    candidates = symbols[HELD_SYMBOLS:]
+
+    all_symbols = sorted(symbols + [RISK_BENCHMARK_SYMBOL])
+
+    times = {"returns": [], "total": []}
+    for _ in range(RUNS):
+        times["returns"].append(time_ms(lambda: portfolio_risk.build_returns(bars_by_symbol, all_symbols)))
+        times["total"].append(time_ms(lambda: portfolio_risk.compute_risk(positions, candidates)))
+    return {case: statistics.median(values) for case, values in times.items()}
+
+
+def main():
+    print(f"{'symbols':>8} {'returns':>10} {'total':>10}")
+    for count in SYMBOL_COUNTS:
+        results = benchmark(count)
+        print(f"{count:>8} " + " ".join(f"{results[case]:>8.1f}ms" for case in ("returns", "total")))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Startup-time benchmark: measures how long a fresh interpreter takes to import
+main.py and to reach the first trading cycle, against the cost of eagerly
+importing the heavy dependencies the bot used to load at import time.
+
+Usage: python benchmarks/startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+# Import-to-first-cycle target in seconds (cold start with eager imports is ~2-4s)
+STARTUP_TARGET_SECONDS = 0.5
+
+# Imports main, then stops main() at the entry of the first trading cycle
+FIRST_CYCLE_SCRIPT = """
+import time
+started_at = time.perf_counter()
+import main
+imported_at = time.perf_counter()
+
+def first_cycle():
+    print(f"{imported_at - started_at:.4f} {time.perf_counter() - started_at:.4f}")
+    raise SystemExit(0)
+
+main.BYPASS_MARKET_HOURS = True
+main.is_market_open = lambda: True
+main.trading_bot = first_cycle
+main.main()
+"""
+
+EAGER_IMPORTS_SCRIPT = """
+import time
+started_at = time.perf_counter()
+import openai, alpaca.trading.client, yfinance, pandas, textblob, pytz
+print(f"{time.perf_counter() - started_at:.4f}")
+"""
+
+
+def run_python(script):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT_DIR, os.path.join(ROOT_DIR, "log_utils"), env.get("PYTHONPATH", "")])
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return [float(value) for value in output.strip().splitlines()[-1].split()]
+
+
+def main():
+    import_times, first_cycle_times, eager_times = [], [], []
+    for _ in range(RUNS):
+        import_time, first_cycle_time = run_python(FIRST_CYCLE_SCRIPT)
+        import_times.append(import_time)
+        first_cycle_times.append(first_cycle_time)
+        eager_times.append(run_python(EAGER_IMPORTS_SCRIPT)[0])
+
+    print(f"Runs: {RUNS}")
+    print(f"import main:              median {statistics.median(import_times):.3f}s, max {max(import_times):.3f}s")
+    print(f"import to first cycle:    median {statistics.median(first_cycle_times):.3f}s, max {max(first_cycle_times):.3f}s")
+    print(f"eager heavy imports:      median {statistics.median(eager_times):.3f}s (previous cold start floor)")
+    passed = statistics.median(first_cycle_times) <= STARTUP_TARGET_SECONDS
+    print(f"Target {STARTUP_TARGET_SECONDS:.2f}s: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""
+Record and replay of a trading cycle's external traffic. In record mode every HTTP
+request made through requests (Alpaca, Yahoo news, older yfinance), httpx (OpenAI)
+or curl_cffi (newer yfinance) during a cycle is captured with its response and
+duration into a gzipped per-cycle cassette in CASSETTE_DIR. In replay mode the
+same requests are answered from a cassette without touching the network, after a
+simulated latency, so one cycle can be re-run, profiled and tested repeatedly.
+
+Only the cycle's own requests are recorded: those made on the thread running the
+cycle and on the deadline_fetch pool on its behalf (see bind_cycle), not those of
+background threads such as prefetch, risk exits or the fill tracker. Replay only
+runs from the command line, against a temporary rotation state and without writing
+trades to the trading journal or tracking fills; the main loop refuses
+CASSETTE_MODE = "replay".
+
+Requests are matched on method, URL and body; when the body differs (e.g. a prompt
+with a new timestamp) the next recording for the same method and URL is used.
+Repeated requests get their recordings in order, the last one being reused.
+
+Usage: python cassette.py list
+       python cassette.py replay <cassette> (runs trading_bot() once against it)
+"""
+import base64
+import glob
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from config import CASSETTE_MODE, CASSETTE_DIR, CASSETTE_REPLAY_LATENCY
+from log_utils.log import log_info, log_warning
+
+# Headers describing the wire encoding; recorded bodies are stored decoded
+WIRE_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+_lock = threading.Lock()
+# Per thread: the number of the cycle the thread records requests for, if any
+_local = threading.local()
+_state = {
+    "mode": CASSETTE_MODE,
+    "installed": False,
+    "cycle": 0,
+    "recording_cycle": None,    # Record mode: number of the cycle being recorded, None between cycles
+    "interactions": [],         # Record mode: captured interactions of the current cycle
+    "replay_file": None,        # Replay mode: cassette replayed by the cycle
+    "by_request": {},           # Replay mode: (method, url, body_sha1) -> remaining interactions
+    "by_url": {},               # Replay mode: (method, url) -> remaining interactions
+    "served": 0,
+    "missing": 0,
+}
+
+
+def _body_sha1(body):
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode()
+    return hashlib.sha1(body).hexdigest()
+
+
+def _next(recordings):
+    # Serve recordings in order, then keep reusing the last one
+    return recordings.pop(0) if len(recordings) > 1 else recordings[0]
+
+
+def _is_recording():
+    cycle = getattr(_local, "cycle", None)
+    return _state["mode"] == "record" and cycle is not None and cycle == _state["recording_cycle"]
+
+
+def bind_cycle(fn):
+    """
+    Return fn wrapped so that, run on another thread (e.g. a fetch pool), its
+    requests are recorded with the calling thread's cycle. A call still running
+    after its cycle ended records nothing.
+    """
+    cycle = getattr(_local, "cycle", None)
+    if cycle is None:
+        return fn
+
+    def run():
+        _local.cycle = cycle
+        try:
+            return fn()
+        finally:
+            _local.cycle = None
+    return run
+
+
+def record_interaction(method, url, body, status, headers, content, elapsed):
+    with _lock:
+        if not _is_recording():
+            return
+        _state["interactions"].append({
+            "method": method,
+            "url": url,
+            "body_sha1": _body_sha1(body),
+            "status": status,
+            "headers": {name: value for name, value in headers.items() if name.lower() not in WIRE_HEADERS},
+            "content": base64.b64encode(content or b"").decode(),
+            "elapsed": round(elapsed, 4),
+        })
+
+
+def replay_interaction(method, url, body):
+    """
+    Return the recorded interaction for a request after its simulated latency,
+    or raise when the cassette has none.
+    """
+    with _lock:
+        recordings = _state["by_request"].get((method, url, _body_sha1(body))) or _state["by_url"].get((method, url))
+        if not recordings:
+            _state["missing"] += 1
+            raise Exception(f"Cassette has no recording for {method} {url}")
+        interaction = _next(recordings)
+        _state["served"] += 1
+    latency = interaction["elapsed"] if CASSETTE_REPLAY_LATENCY == "recorded" else CASSETTE_REPLAY_LATENCY
+    if latency:
+        time.sleep(latency)
+    return interaction["status"], interaction["headers"], base64.b64decode(interaction["content"])
+
+
+###############################################################################
+# HTTP CLIENT PATCHES
+###############################################################################
+def _patch_requests():
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    original_send = HTTPAdapter.send
+
+    def send(self, request, **kwargs):
+        if _state["mode"] == "replay":
+            status, headers, content = replay_interaction(request.method, request.url, request.body)
+            response = requests.Response()
+            response.status_code = status
+            response.headers = CaseInsensitiveDict(headers)
+            response._content = content
+            response.encoding = get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            return response
+        started_at = time.perf_counter()
+        response = original_send(self, request, **kwargs)
+        if _is_recording():
+            record_interaction(request.method, request.url, request.body, response.status_code,
+                               response.headers, response.content, time.perf_counter() - started_at)
+        return response
+
+    HTTPAdapter.send = send
+
+
+def _patch_httpx():
+    import httpx
+
+    original_handle_request = httpx.HTTPTransport.handle_request
+
+    def handle_request(self, request):
+        body = request.read()
+        if _state["mode"] == "replay":
+            status, headers, content = replay_interaction(request.method, str(request.url), body)
+            return httpx.Response(status, headers=headers, content=content, request=request)
+        started_at = time.perf_counter()
+        response = original_handle_request(self, request)
+        if not _is_recording():
+            return response
+        # Streams (e.g. OpenAI SSE) are read fully while recording
+        content = response.read()
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in WIRE_HEADERS}
+        record_interaction(request.method, str(request.url), body, response.status_code,
+                           headers, content, time.perf_counter() - started_at)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    httpx.HTTPTransport.handle_request = handle_request
+
+
+def _patch_curl_cffi():
+    from curl_cffi import requests as curl_requests
+
+    original_request = curl_requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        # Query parameters and the body are passed separately; both identify the request
+        body = json.dumps([kwargs.get("params"), kwargs.get("data"), kwargs.get("json")], sort_keys=True, default=str)
+        if _state["mode"] == "replay":
+            status, headers, content = replay_interaction(method.upper(), url, body)
+            response = curl_requests.Response()
+            response.status_code = status
+            response.headers = curl_requests.Headers(headers)
+            response.content = content
+            response.url = url
+            response.encoding = "utf-8"
+            return response
+        started_at = time.perf_counter()
+        response = original_request(self, method, url, *args, **kwargs)
+        if _is_recording():
+            record_interaction(method.upper(), url, body, response.status_code,
+                               dict(response.headers), response.content, time.perf_counter() - started_at)
+        return response
+
+    curl_requests.Session.request = request
+
+
+def install():
+    """
+    Patch every available HTTP client once. Missing libraries are skipped.
+    """
+    if _state["installed"]:
+        return
+    for patch in (_patch_requests, _patch_httpx, _patch_curl_cffi):
+        try:
+            patch()
+        except ImportError:
+            pass
+    _state["installed"] = True
+
+
+###############################################################################
+# CASSETTES
+###############################################################################
+def list_cassettes():
+    return sorted(glob.glob(os.path.join(CASSETTE_DIR, "*.json.gz")))
+
+
+def save_cassette(cycle, rotation_state):
+    os.makedirs(CASSETTE_DIR, exist_ok=True)
+    path = os.path.join(CASSETTE_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_cycle{cycle}.json.gz")
+    with _lock:
+        _state["recording_cycle"] = None
+        interactions, _state["interactions"] = _state["interactions"], []
+    with gzip.open(path, "wt") as file:
+        json.dump({"cycle": cycle, "rotation_state": rotation_state, "interactions": interactions}, file)
+    log_info(f"Recorded {len(interactions)} requests of cycle {cycle} to {path}")
+    return path
+
+
+def load_cassette(path):
+    """
+    Load a cassette for replay and return its rotation state.
+    """
+    with gzip.open(path, "rt") as file:
+        cassette = json.load(file)
+    by_request, by_url = defaultdict(list), defaultdict(list)
+    for interaction in cassette["interactions"]:
+        by_request[(interaction["method"], interaction["url"], interaction["body_sha1"])].append(interaction)
+        by_url[(interaction["method"], interaction["url"])].append(interaction)
+    with _lock:
+        # Each interaction can be served through either index; copies keep their queues independent
+        _state["by_request"] = {key: list(value) for key, value in by_request.items()}
+        _state["by_url"] = {key: list(value) for key, value in by_url.items()}
+        _state["served"] = 0
+        _state["missing"] = 0
+    log_info(f"Replaying {len(cassette['interactions'])} requests from {path}")
+    return cassette.get("rotation_state")
+
+
+@contextmanager
+def cassette_cycle():
+    """
+    Record or replay the external requests of the cycle run inside this block,
+    depending on the mode (CASSETTE_MODE, or "replay" set by main()).
+    """
+    if not _state["mode"]:
+        yield
+        return
+
+    # The rotation picks this cycle's watchlist symbols from its persisted state; replay
+    # restores it so the same symbols (and so the same requests) come up again
+    import universe_rotation
+
+    install()
+    _state["cycle"] += 1
+    if _state["mode"] == "record":
+        universe_rotation._load_state()
+        rotation_state = dict(universe_rotation._last_evaluated)
+        # Start from an empty buffer and record only this thread (and the fetches it hands off)
+        with _lock:
+            _state["interactions"] = []
+            _state["recording_cycle"] = _state["cycle"]
+        _local.cycle = _state["cycle"]
+        try:
+            yield
+        finally:
+            _local.cycle = None
+            save_cassette(_state["cycle"], rotation_state)
+        return
+
+    if not _state["replay_file"]:
+        raise Exception("Cassettes are replayed with python cassette.py replay <cassette>")
+    rotation_state = load_cassette(_state["replay_file"])
+    if rotation_state is not None:
+        universe_rotation._last_evaluated = dict(rotation_state)
+    try:
+        yield
+    finally:
+        if _state["missing"]:
+            log_warning(f"Replay served {_state['served']} requests, {_state['missing']} had no recording")
+        else:
+            log_info(f"Replay served {_state['served']} requests")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and replay recorded trading cycles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list recorded cassettes")
+    replay_parser = subparsers.add_parser("replay", help="run trading_bot() once against a cassette")
+    replay_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in list_cassettes():
+            with gzip.open(path, "rt") as file:
+                interactions = json.load(file)["interactions"]
+            print(f"{os.path.basename(path)}  {len(interactions):>5} requests  {sum(i['elapsed'] for i in interactions):>8.1f}s recorded")
+        return
+
+    _state.update(mode="replay", replay_file=args.path)
+    # main.py imports the log utilities as top-level modules
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_utils"))
+    import main as bot
+    import universe_rotation
+
+    # A replayed cycle must not touch the live bot's state: the rotation state goes to
+    # a temporary file, and replayed orders are neither journaled nor tracked (their
+    # fills aren't in the cassette, so buys waiting on sells are dropped as unfilled)
+    universe_rotation.ROTATION_STATE_FILE = os.path.join(tempfile.mkdtemp(prefix="cassette-"), "rotation_state.json")
+    bot.log_trade_to_db = lambda *args, **kwargs: None
+    bot.track_order = lambda *args, **kwargs: None
+    bot.wait_for_orders = lambda order_ids, timeout_seconds: {}
+
+    started_at = time.perf_counter()
+    with cassette_cycle():
+        trading_results = bot.trading_bot()
+    bot.log_trading_results(trading_results)
+    log_info(f"Replayed cycle in {time.perf_counter() - started_at:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
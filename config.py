@@ -1,9 +1,30 @@
 # Basic config parameters
 PAPER_TRADING = True                        # Trading mode (True - paper, False - live)
 LOG_LEVEL = "DEBUG"                          # Log level (DEBUG, INFO, WARNING, ERROR)
+LOG_PREFIX = ""                              # Prefix added to every log message (set per profile by multi_runner.py)
 RUN_INTERVAL_SECONDS = 600                  # Trading interval in seconds (if the market is open)
 BYPASS_MARKET_HOURS = True                 # Set to True to ignore market hours check
 
+# Scheduler config parameters
+SCHEDULER_MODE = "interval"                 # Scheduler mode ("interval" - every RUN_INTERVAL_SECONDS, "event" - on price/volume/P&L triggers)
+EVENT_POLL_SECONDS = 30                     # Price watch polling interval in seconds (event mode)
+EVENT_DEBOUNCE_SECONDS = 120                # Minimum seconds between two triggered runs (event mode)
+EVENT_MAX_INTERVAL_SECONDS = 1800           # Maximum seconds between runs when nothing triggers (event mode)
+EVENT_PRICE_MOVE_PCT = 2.0                  # Price move in % since the last run that triggers a run
+EVENT_VOLUME_SPIKE_RATIO = 3.0              # Latest bar volume vs. average bar volume that triggers a run when crossed since the last run
+EVENT_PL_MOVE_PCT = 3.0                     # Change in a position's unrealized P/L % since the last run that triggers a run
+EVENT_SYMBOL_THRESHOLDS = {}                # Per-symbol overrides (e.g. {"TSLA": {"price_move_pct": 4.0, "volume_spike_ratio": 5.0}})
+QUOTE_CACHE_SECONDS = 60                    # Reuse batched quotes for current prices if newer than this (when the in-process market data cache is on)
+MATERIALITY_GATE_ENABLED = False            # Skip enrichment and the AI call when nothing changed materially since the last evaluated cycle
+MATERIALITY_PRICE_MOVE_PCT = 0.5            # Price move in % of a held or ranked candidate stock that makes a cycle material
+MATERIALITY_BUYING_POWER_USD = 25           # Buying power change in USD that makes a cycle material
+MATERIALITY_MAX_SKIP_SECONDS = 3600         # Always evaluate a cycle when the last evaluation is older than this
+PREFETCH_ENABLED = False                    # Refresh the next cycle's moving averages and quotes in the background during AI and order waits
+PREFETCH_MAX_STALENESS_SECONDS = 900        # Prefetched moving averages are fetched again once older than this
+PREFETCH_QUOTE_LEAD_SECONDS = 20            # Refresh quotes this long before the next interval cycle (keep below QUOTE_CACHE_SECONDS)
+WARMUP_ENABLED = False                      # Backfill bars, moving averages and rotation signals for all symbols before the open (turns on the in-process market data cache)
+WARMUP_LEAD_SECONDS = 900                   # Start the warm-up this long before the next open (keep below MARKET_DATA_CACHE_MAX_AGE)
+
 # Alpaca Live Trading Credentials
 ALPACA_LIVE_API_KEY = ""                            # Alpaca live trading API key
 ALPACA_LIVE_SECRET_KEY = ""     # Alpaca live trading secret key
@@ -15,22 +36,123 @@ ALPACA_PAPER_SECRET_KEY = ""    # Alpaca paper trading secret key
 # Set the active credentials based on PAPER_TRADING setting
 ALPACA_API_KEY = ALPACA_PAPER_API_KEY if PAPER_TRADING else ALPACA_LIVE_API_KEY
 ALPACA_SECRET_KEY = ALPACA_PAPER_SECRET_KEY if PAPER_TRADING else ALPACA_LIVE_SECRET_KEY
+ALPACA_TRADING_URL_OVERRIDE = None          # Trading API endpoint (None - Alpaca, e.g. "http://127.0.0.1:8090" for paper_exchange.py)
 
 # Watchlist file
 WATCHLIST_FILE = "watchlist.json"
 
+# Market calendar cache
+MARKET_CALENDAR_FILE = "market_calendar.json"   # Local cache of Alpaca's trading calendar
+MARKET_CALENDAR_DAYS_AHEAD = 90             # Number of days of trading sessions to fetch at once
+
 # Trading config parameters
 TRADE_EXCEPTIONS = []                       # List of stocks to exclude from trading (e.g. ["AAPL", "TSLA", "AMZN"])
 WATCHLIST_NAMES = ["Primary", "TopAIPicks", "AIStocks"]               # Watchlist names (can be empty, or create in Alpaca dashboard)
 WATCHLIST_OVERVIEW_LIMIT = 20                # Number of stocks to process in decision-making (e.g. 20)
 PORTFOLIO_LIMIT = 12                         # Number of stocks to hold in the portfolio
+ROTATION_STATE_FILE = "rotation_state.json"  # Last evaluation time of each watchlist stock
+ROTATION_SIGNALS_TTL_SECONDS = 3600         # How long batched return/volatility/volume signals are reused
+ROTATION_MAX_STALENESS_SECONDS = 86400      # Watchlist stocks not evaluated for this long are always picked first
+ROTATION_WEIGHTS = {                        # Weights of the watchlist rotation priority score
+    "age_hours": 1.0,                       #   per hour since last evaluation
+    "abs_return_pct": 2.0,                  #   per % of absolute 5-day return
+    "volatility_pct": 1.0,                  #   per % of daily volatility
+    "volume_spike": 5.0,                    #   per unit of latest volume above its average
+    "news_count": 0.5,                      #   per recent news article
+}
 MIN_SELLING_AMOUNT_USD = 1                   # Minimum sell amount in USD (False - disable setting)
 MAX_SELLING_AMOUNT_USD = 10000               # Maximum sell amount in USD (False - disable setting)
 MIN_BUYING_AMOUNT_USD = 1                    # Minimum buy amount in USD (False - disable setting)
 MAX_BUYING_AMOUNT_USD = 10000                # Maximum buy amount in USD (False - disable setting)
 PDT_PROTECTION = False                       # Pattern day trader protection (False - disable protection)
+ALLOCATION_SELL_CREDIT_RATIO = 0.98         # Share of estimated sell proceeds expected for buys deferred until the sells fill
+ALLOCATION_SELL_FILL_WAIT_SECONDS = 60      # How long deferred buys wait for the cycle's sells to fill before they are dropped
+RISK_EXITS_ENABLED = False                   # Sell positions on stop-loss/trailing-stop/take-profit between AI cycles
+RISK_EXIT_POLL_SECONDS = 15                  # Interval of the risk exit check
+RISK_STOP_LOSS_PCT = 8.0                     # Sell when a position is down this % from its entry price (False - disable rule)
+RISK_TRAILING_STOP_PCT = 5.0                 # Sell when a position falls this % from its highest price since entry, once that level is above the entry price (False - disable rule)
+RISK_TAKE_PROFIT_PCT = 25.0                  # Sell when a position is up this % from its entry price (False - disable rule)
+RISK_SYMBOL_RULES = {}                       # Per-symbol overrides (e.g. {"TSLA": {"stop_loss_pct": 12.0, "trailing_stop_pct": False}})
+RISK_HIGH_WATER_FILE = "risk_high_water.json"   # Highest price of each position since entry, the reference of the trailing stop
+RISK_SUMMARY_ENABLED = False                 # Send portfolio volatility, beta, VaR, concentration and risk contributions with the decision prompt (downloads a year of bars unless prefetched or warmed up)
+RISK_RETURNS_WINDOW = 120                    # Number of daily returns in the rolling risk window
+RISK_BENCHMARK_SYMBOL = "SPY"                # Benchmark for beta
+RISK_VAR_CONFIDENCE = 0.95                   # Confidence level of the 1-day parametric VaR
+FILL_TRACKER_POLL_SECONDS = 2                # Interval of the batched order status poll that records fills
+FILL_TRACKER_MAX_AGE_SECONDS = 86400         # Stop tracking orders that haven't reached a final status after this long
+
+# Cycle profiling (cycle_profiler.py)
+PROFILE_EVERY_N_CYCLES = 0                  # Profile every Nth trading cycle with cProfile (0 - disable)
+PROFILE_LATENCY_THRESHOLD_SECONDS = False   # Keep sampled stacks of cycles slower than this (False - disable)
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.01      # Interval of the stack sampler
+PROFILE_DIR = "profiles"                    # Directory of the captured cycle profiles
+PROFILE_MAX_CAPTURES = 50                   # Number of captured cycles kept (oldest are deleted)
+
+# Cycle record/replay (cassette.py)
+CASSETTE_MODE = None                        # Record each cycle's external requests (None or "record"; replay with python cassette.py replay)
+CASSETTE_DIR = "cassettes"                  # Directory of the recorded cycle cassettes
+CASSETTE_REPLAY_LATENCY = "recorded"        # Simulated latency per replayed request ("recorded" or seconds)
+
+# Cycle archive (cycle_archive.py)
+CYCLE_ARCHIVE_ENABLED = False               # Archive each cycle's inputs, AI prompts and responses, decisions and results
+CYCLE_ARCHIVE_DB = "cycle_archive.db"       # SQLite file of the cycle archive
+CYCLE_ARCHIVE_COMPRESSION = "zlib"          # Compression of archived content ("zlib" or "zstd", which needs the zstandard package)
+
+# Market data provider
+MARKET_DATA_PROVIDER = "yfinance"           # Source of quotes and bars ("yfinance", "alpaca" or "fixture")
+ALPACA_DATA_FEED = "iex"                    # Alpaca market data feed ("iex" - free, "sip" - paid subscription)
+MARKET_DATA_FIXTURE_FILE = "market_data_fixture.json"   # JSON file served by the "fixture" provider
+
+# Fetch deadlines
+FETCH_SOURCES = {                           # Time budget per external source, whether slow calls get a hedged second attempt, and the oldest last good value served when a fetch fails
+    "yahoo_news": {"budget_seconds": 5, "hedge": True, "stale_max_age_seconds": 3600},
+    "yfinance_info": {"budget_seconds": 10, "hedge": True, "stale_max_age_seconds": 86400},
+    "yfinance_recommendations": {"budget_seconds": 8, "hedge": True, "stale_max_age_seconds": 86400},
+    "market_data_quotes": {"budget_seconds": 20, "hedge": False, "stale_max_age_seconds": 300},    # Batched requests: a hedge would double a large download
+    "market_data_bars": {"budget_seconds": 45, "hedge": False, "stale_max_age_seconds": 345600},  # Covers a long weekend
+}
+FETCH_HEDGE_MIN_SAMPLES = 20                # Latency samples needed before hedging at the observed p95 (half the budget until then)
+FETCH_MAX_OUTSTANDING_PER_SOURCE = 4        # Calls in flight per source, including timed-out ones still running (more are served stale)
+FETCH_CIRCUIT_FAILURES = 5                  # Consecutive timeouts/errors that open a source's circuit
+FETCH_CIRCUIT_COOLDOWN_SECONDS = 120        # How long an open circuit skips the source (serving stale data instead)
+
+# Shared market data cache
+MARKET_DATA_CACHE_ENABLED = False           # Share fetched market data between processes (always on under multi_runner.py)
+MARKET_DATA_CACHE_DB = "market_data_cache.db"   # SQLite file backing the shared market data cache
+MARKET_DATA_MEMORY_CACHE_MAX_ENTRIES = 5000 # Entries kept in the in-process tier (on with PREFETCH_ENABLED, WARMUP_ENABLED, event scheduling or MARKET_DATA_CACHE_ENABLED)
+MARKET_DATA_CACHE_MAX_AGE = {               # Maximum age in seconds of cached market data, by kind
+    "quote": 120,
+    "moving_averages": 3600,
+    "daily_bars": 3600,
+    "comprehensive": 1800,
+}
+MARKET_DATA_FETCH_INTERVAL_SECONDS = 60     # Refresh interval of the shared market data fetcher (multi_runner.py)
+MARKET_DATA_SHM_ENABLED = False             # Publish/read quotes and daily closes through a shared memory segment
+MARKET_DATA_SHM_NAME = "alpaca_ai_trader_market_data"   # Name of the shared memory segment
+MARKET_DATA_SHM_BARS = 252                  # Number of daily closes kept per symbol in the segment
+MARKET_DATA_SHM_READ_TIMEOUT_SECONDS = 0.5  # Time a reader waits out a publish before falling back to the cache or provider
+
+# Enrichment workers (enrichment_workers.py)
+ENRICHMENT_BROKER_ADDRESS = "127.0.0.1:50071"   # Job queue address ("0.0.0.0:50071" to accept workers on other nodes)
+ENRICHMENT_BROKER_AUTHKEY = "change-me"     # Shared secret of the coordinator and its workers (required for non-loopback addresses)
+ENRICHMENT_LOCAL_WORKERS = 4                # Worker processes started next to the coordinator (0 - remote workers only)
+ENRICHMENT_JOB_DEADLINE_SECONDS = 30        # Time a worker has for one symbol before the job is retried
+ENRICHMENT_MAX_ATTEMPTS = 2                 # Attempts per symbol before its enrichment fails
+
+# Strategy profiles for multi_runner.py: each one runs the bot in its own process with these config overrides
+STRATEGY_PROFILES = []                      # e.g. [{"name": "growth", "WATCHLIST_NAMES": ["AIStocks"], "PORTFOLIO_LIMIT": 6, "PAPER_TRADING": True}]
 
 # OpenAI config params
 OPENAI_MODEL_NAME = "gpt-4o"           # OpenAI model name
 MAX_POST_DECISIONS_ADJUSTMENTS = False      # Maximum number of adjustments to make (False - disable adjustments)
+AI_DELTA_FOLLOWUPS = True                   # Continue the decision conversation with only what changed in post-decision adjustments (False - full prompt each round)
+OPENAI_STREAM_RESPONSES = True              # Stream AI responses to measure time to first token
 OPENAI_API_KEY = ""  # OpenAI API key
+OPENAI_BASE_URL = None                      # OpenAI-compatible API endpoint (None - OpenAI, e.g. "http://127.0.0.1:8089/v1" for stub_openai_server.py)
+
+# Triage config params (cheap first tier that picks the symbols sent to OPENAI_MODEL_NAME)
+TRIAGE_ENABLED = False                      # Screen symbols with TRIAGE_MODEL_NAME before the decision request
+TRIAGE_MODEL_NAME = "gpt-4o-mini"           # Triage model name
+TRIAGE_BASE_URL = None                      # Triage API endpoint (None - same as OPENAI_BASE_URL)
+TRIAGE_API_KEY = None                       # Triage API key (None - same as OPENAI_API_KEY)
+TRIAGE_BATCH_SIZE = 50                      # Number of symbols screened per triage request
@@ -0,0 +1,372 @@
+"""
+Archive of every trading cycle's inputs, AI prompts and responses, decisions and
+results, in SQLite (CYCLE_ARCHIVE_DB). Content is stored as content-addressed,
+compressed blobs (zlib, or zstd when the zstandard package is installed), so
+anything repeated across cycles - the static system prompt, per-symbol inputs
+and prompt sections that did not change - is stored once. Prompts are split into
+sections (paragraphs and top-level JSON entries, i.e. one per symbol), so the
+archive grows with what changed, not with the number of cycles. Entries are
+indexed by cycle, kind and symbol.
+
+Usage: python cycle_archive.py list [--limit 20]
+       python cycle_archive.py show [cycle] [--kind prompt] [--symbol AAPL]
+       python cycle_archive.py history <symbol> [--limit 10]
+       python cycle_archive.py stats
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from config import CYCLE_ARCHIVE_ENABLED, CYCLE_ARCHIVE_DB, CYCLE_ARCHIVE_COMPRESSION
+from log_utils.log import log_error, log_warning
+
+# Longest prompt section stored as one blob
+MAX_SECTION_LINES = 64
+# Top-level entry of a json.dumps(..., indent=1) block, e.g. ' "AAPL": {'
+TOP_LEVEL_KEY = re.compile(r'^ "[^"]+": ')
+# SQLite's default limit of bound parameters per statement
+MAX_QUERY_PARAMETERS = 900
+
+_lock = threading.Lock()
+_state = {
+    "conn": None,
+    "cycle_id": None,
+    "seq": 0,
+    "blob_ids": {},             # hash -> id of blobs already stored, to skip compressing them again
+    "zstd": None,
+}
+
+
+def _get_connection():
+    if _state["conn"] is None:
+        conn = sqlite3.connect(CYCLE_ARCHIVE_DB, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS cycles (
+            id INTEGER PRIMARY KEY,
+            started_at REAL,
+            finished_at REAL
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            id INTEGER PRIMARY KEY,
+            hash TEXT UNIQUE,
+            codec TEXT,
+            size INTEGER,
+            data BLOB
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS entries (
+            cycle_id INTEGER,
+            seq INTEGER,
+            kind TEXT,
+            label TEXT,
+            symbol TEXT,
+            role TEXT,
+            chunks TEXT,
+            PRIMARY KEY (cycle_id, seq)
+        )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_symbol ON entries (symbol, cycle_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_kind ON entries (kind, cycle_id)")
+        _state["conn"] = conn
+    return _state["conn"]
+
+
+###############################################################################
+# BLOBS
+###############################################################################
+def _get_zstd():
+    # zstandard is optional; without it blobs are written with zlib
+    if _state["zstd"] is None:
+        try:
+            import zstandard
+            _state["zstd"] = zstandard
+        except ImportError:
+            log_warning("zstandard is not installed, compressing the cycle archive with zlib")
+            _state["zstd"] = False
+    return _state["zstd"]
+
+
+def _compress(data):
+    if CYCLE_ARCHIVE_COMPRESSION == "zstd" and _get_zstd():
+        return "zstd", _get_zstd().ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec, data):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if not _get_zstd():
+            raise Exception("Archive blob is zstd-compressed but zstandard is not installed")
+        return _get_zstd().ZstdDecompressor().decompress(data)
+    raise Exception(f"Unknown archive codec {codec}")
+
+
+def split_sections(text):
+    """
+    Split text into sections that stay identical while their content does:
+    paragraphs, and each top-level entry of an indented JSON block.
+    """
+    sections = []
+    lines = []
+    for line in text.splitlines(keepends=True):
+        if lines and (TOP_LEVEL_KEY.match(line) or not lines[-1].strip() or len(lines) >= MAX_SECTION_LINES):
+            sections.append("".join(lines))
+            lines = []
+        lines.append(line)
+    if lines:
+        sections.append("".join(lines))
+    return sections or [""]
+
+
+def _store_blobs(conn, sections):
+    """
+    Store the sections not stored yet and return their blob ids. Called under _lock.
+    """
+    blob_ids = []
+    for section in sections:
+        data = section.encode()
+        blob_hash = hashlib.sha256(data).hexdigest()
+        blob_id = _state["blob_ids"].get(blob_hash)
+        if blob_id is None:
+            row = conn.execute("SELECT id FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+            if row:
+                blob_id = row[0]
+            else:
+                codec, compressed = _compress(data)
+                blob_id = conn.execute("INSERT INTO blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)",
+                                       (blob_hash, codec, len(data), compressed)).lastrowid
+            _state["blob_ids"][blob_hash] = blob_id
+        blob_ids.append(blob_id)
+    return blob_ids
+
+
+def _parse_chunks(chunks):
+    return [int(blob_id) for blob_id in chunks.split(",")]
+
+
+def _load_blobs(conn, blob_ids):
+    blobs = {}
+    blob_ids = list(set(blob_ids))
+    for start in range(0, len(blob_ids), MAX_QUERY_PARAMETERS):
+        batch = blob_ids[start:start + MAX_QUERY_PARAMETERS]
+        rows = conn.execute(f"SELECT id, codec, data FROM blobs WHERE id IN ({','.join('?' * len(batch))})", batch)
+        for blob_id, codec, data in rows:
+            blobs[blob_id] = _decompress(codec, data).decode()
+    return blobs
+
+
+###############################################################################
+# RECORDING
+###############################################################################
+@contextmanager
+def archive_cycle():
+    """
+    Archive everything recorded while the cycle inside this block runs.
+    """
+    if not CYCLE_ARCHIVE_ENABLED:
+        yield
+        return
+    try:
+        with _lock:
+            cursor = _get_connection().execute("INSERT INTO cycles (started_at) VALUES (?)", (time.time(),))
+            _state["cycle_id"] = cursor.lastrowid
+            _state["seq"] = 0
+    except sqlite3.Error as e:
+        log_error(f"Cycle archive error: {e}")
+    try:
+        yield
+    finally:
+        with _lock:
+            cycle_id, _state["cycle_id"] = _state["cycle_id"], None
+            if cycle_id is not None:
+                try:
+                    _get_connection().execute("UPDATE cycles SET finished_at = ? WHERE id = ?", (time.time(), cycle_id))
+                except sqlite3.Error as e:
+                    log_error(f"Cycle archive error: {e}")
+
+
+def archive_record(kind, label, content, symbol=None, role=None):
+    """
+    Add an entry to the current cycle; content is text or JSON-serializable.
+    Does nothing outside an archived cycle.
+    """
+    if _state["cycle_id"] is None:
+        return
+    text = content if isinstance(content, str) else json.dumps(content, indent=1, default=str)
+    try:
+        with _lock:
+            if _state["cycle_id"] is None:
+                return
+            conn = _get_connection()
+            with conn:
+                conn.execute("BEGIN")
+                blob_ids = _store_blobs(conn, split_sections(text))
+                _state["seq"] += 1
+                conn.execute(
+                    "INSERT INTO entries (cycle_id, seq, kind, label, symbol, role, chunks) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (_state["cycle_id"], _state["seq"], kind, label, symbol, role, ",".join(map(str, blob_ids)))
+                )
+    except sqlite3.Error as e:
+        # A failed transaction may have stored blobs that were rolled back
+        _state["blob_ids"].clear()
+        log_error(f"Cycle archive error: {e}")
+
+
+def archive_symbols(label, data_by_symbol):
+    """
+    Add one entry per symbol, e.g. the per-symbol overviews sent to the AI.
+    """
+    for symbol, data in data_by_symbol.items():
+        archive_record("input", label, data, symbol=symbol)
+
+
+def archive_ai_exchange(label, model, messages, content):
+    """
+    Add the messages of an AI request and its response.
+    """
+    for message in messages:
+        archive_record("prompt", f"{label} [{model}]", message["content"], role=message["role"])
+    archive_record("response", f"{label} [{model}]", content, role="assistant")
+
+
+###############################################################################
+# READING
+###############################################################################
+def load_cycle(cycle_id=None, kind=None, symbol=None):
+    """
+    Return a cycle (the latest one by default) with its entries, optionally only
+    those of one kind and/or symbol, or None when it does not exist.
+    """
+    conn = _get_connection()
+    if cycle_id is None:
+        row = conn.execute("SELECT id, started_at, finished_at FROM cycles ORDER BY id DESC LIMIT 1").fetchone()
+    else:
+        row = conn.execute("SELECT id, started_at, finished_at FROM cycles WHERE id = ?", (cycle_id,)).fetchone()
+    if not row:
+        return None
+    query = "SELECT seq, kind, label, symbol, role, chunks FROM entries WHERE cycle_id = ?"
+    parameters = [row[0]]
+    if kind:
+        query += " AND kind = ?"
+        parameters.append(kind)
+    if symbol:
+        query += " AND symbol = ?"
+        parameters.append(symbol)
+    rows = conn.execute(query + " ORDER BY seq", parameters).fetchall()
+    chunks_by_seq = {entry[0]: _parse_chunks(entry[5]) for entry in rows}
+    blobs = _load_blobs(conn, [blob_id for chunks in chunks_by_seq.values() for blob_id in chunks])
+    return {
+        "id": row[0], "started_at": row[1], "finished_at": row[2],
+        "entries": [
+            {"kind": entry_kind, "label": label, "symbol": entry_symbol, "role": role,
+             "content": "".join(blobs[blob_id] for blob_id in chunks_by_seq[seq])}
+            for seq, entry_kind, label, entry_symbol, role, _ in rows
+        ],
+    }
+
+
+def load_symbol_history(symbol, limit=10):
+    """
+    Return [(cycle id, started_at, entries)] of a symbol's entries in its last `limit` cycles.
+    """
+    conn = _get_connection()
+    cycle_ids = [row[0] for row in conn.execute(
+        "SELECT DISTINCT cycle_id FROM entries WHERE symbol = ? ORDER BY cycle_id DESC LIMIT ?", (symbol, limit)
+    )]
+    history = []
+    for cycle_id in reversed(cycle_ids):
+        cycle = load_cycle(cycle_id, symbol=symbol)
+        history.append((cycle["id"], cycle["started_at"], cycle["entries"]))
+    return history
+
+
+def get_archive_stats():
+    """
+    Return cycle, entry and blob counts, and the bytes referenced by entries
+    against the bytes actually stored.
+    """
+    conn = _get_connection()
+    sizes = dict(conn.execute("SELECT id, size FROM blobs"))
+    referenced = 0
+    entries = 0
+    for (chunks,) in conn.execute("SELECT chunks FROM entries"):
+        entries += 1
+        referenced += sum(sizes.get(blob_id, 0) for blob_id in _parse_chunks(chunks))
+    return {
+        "cycles": conn.execute("SELECT COUNT(*) FROM cycles").fetchone()[0],
+        "entries": entries,
+        "blobs": len(sizes),
+        "referenced_bytes": referenced,
+        "unique_bytes": sum(sizes.values()),
+        "stored_bytes": conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()[0],
+    }
+
+
+def _format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else "-"
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the archive of trading cycles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="list the latest cycles")
+    list_parser.add_argument("--limit", type=int, default=20)
+    show_parser = subparsers.add_parser("show", help="print a cycle's entries (the latest by default)")
+    show_parser.add_argument("cycle", type=int, nargs="?")
+    show_parser.add_argument("--kind", choices=["input", "prompt", "response", "decisions", "results"])
+    show_parser.add_argument("--symbol")
+    history_parser = subparsers.add_parser("history", help="print a symbol's entries over the latest cycles")
+    history_parser.add_argument("symbol")
+    history_parser.add_argument("--limit", type=int, default=10)
+    subparsers.add_parser("stats", help="print storage and deduplication statistics")
+    args = parser.parse_args()
+
+    conn = _get_connection()
+    if args.command == "list":
+        rows = conn.execute('''
+        SELECT c.id, c.started_at, c.finished_at, COUNT(e.seq), COUNT(DISTINCT e.symbol)
+        FROM cycles c LEFT JOIN entries e ON e.cycle_id = c.id
+        GROUP BY c.id ORDER BY c.id DESC LIMIT ?
+        ''', (args.limit,)).fetchall()
+        for cycle_id, started_at, finished_at, entries, symbols in reversed(rows):
+            duration = f"{finished_at - started_at:>7.1f}s" if finished_at else "    n/a "
+            print(f"{cycle_id:>6}  {_format_time(started_at)}  {duration}  {entries:>4} entries  {symbols:>4} symbols")
+    elif args.command == "show":
+        started_at = time.perf_counter()
+        cycle = load_cycle(args.cycle, args.kind, args.symbol)
+        loaded_ms = (time.perf_counter() - started_at) * 1000
+        if cycle is None:
+            print("No such cycle")
+            return
+        print(f"Cycle {cycle['id']} started {_format_time(cycle['started_at'])}, {len(cycle['entries'])} entries (loaded in {loaded_ms:.1f}ms)")
+        for entry in cycle["entries"]:
+            details = ", ".join(value for value in (entry["symbol"], entry["role"]) if value)
+            print(f"\n--- {entry['kind']}: {entry['label']}{f' ({details})' if details else ''}")
+            print(entry["content"].rstrip())
+    elif args.command == "history":
+        for cycle_id, started_at, entries in load_symbol_history(args.symbol.upper(), args.limit):
+            print(f"\n=== Cycle {cycle_id} ({_format_time(started_at)})")
+            for entry in entries:
+                print(f"--- {entry['kind']}: {entry['label']}")
+                print(entry["content"].rstrip())
+    else:
+        stats = get_archive_stats()
+        print(f"{stats['cycles']} cycles, {stats['entries']} entries, {stats['blobs']} blobs")
+        print(f"Referenced {stats['referenced_bytes']:,} bytes, {stats['unique_bytes']:,} unique, {stats['stored_bytes']:,} stored "
+              f"({stats['referenced_bytes'] / max(stats['stored_bytes'], 1):.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
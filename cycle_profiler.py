@@ -0,0 +1,211 @@
+"""
+Opt-in cycle profiling. Every PROFILE_EVERY_N_CYCLES-th trading cycle runs under
+cProfile, and every cycle is sampled by a lightweight stack sampler so that cycles
+slower than PROFILE_LATENCY_THRESHOLD_SECONDS can be kept after the fact. Each kept
+cycle is written to PROFILE_DIR as:
+
+    <name>.folded   collapsed stacks ("frame;frame;frame count"), for flamegraph tools
+    <name>.prof     cProfile stats (every Nth cycle only), for pstats/snakeviz
+    <name>.json     cycle number, duration, trigger and sampling interval
+
+Only the newest PROFILE_MAX_CAPTURES cycles are kept.
+
+Usage: python cycle_profiler.py list
+       python cycle_profiler.py diff <name_a> <name_b> [--top 20]
+"""
+import argparse
+import cProfile
+import glob
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from config import (
+    PROFILE_DIR, PROFILE_EVERY_N_CYCLES, PROFILE_LATENCY_THRESHOLD_SECONDS,
+    PROFILE_SAMPLE_INTERVAL_SECONDS, PROFILE_MAX_CAPTURES
+)
+from log_utils.log import log_info, log_error
+
+# Number of cycles run through profile_cycle() since start
+_state = {
+    "cycles": 0,
+}
+
+
+def _frame_name(filename, line, function):
+    # Shared by sampled frames and cProfile entries, so both can be diffed
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+class StackSampler:
+    """
+    Samples one thread's call stack every `interval` seconds from a daemon thread
+    and counts identical stacks.
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cycle-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_frame_name(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def save_capture(cycle, seconds, trigger, sampler, profile):
+    """
+    Write a cycle's collapsed stacks, cProfile stats and metadata, then enforce retention.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_cycle{cycle}"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(f"{path}.folded", "w") as file:
+        for stack, count in sampler.stacks.most_common():
+            file.write(f"{stack} {count}\n")
+    if profile is not None:
+        profile.dump_stats(f"{path}.prof")
+    with open(f"{path}.json", "w") as file:
+        json.dump({
+            "cycle": cycle,
+            "seconds": round(seconds, 3),
+            "trigger": trigger,
+            "sample_interval": sampler.interval,
+            "samples": sum(sampler.stacks.values()),
+        }, file)
+    log_info(f"Cycle {cycle} profile ({trigger}, {seconds:.1f}s) saved to {path}.*")
+
+    captures = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")))
+    for old in captures[:max(0, len(captures) - PROFILE_MAX_CAPTURES)]:
+        for old_file in glob.glob(old[:-len(".json")] + ".*"):
+            os.remove(old_file)
+
+
+def profile_cycle(cycle_function):
+    """
+    Run one trading cycle, profiling it with cProfile when it is an Nth cycle and
+    keeping its sampled stacks when it is that or slower than the threshold.
+    """
+    _state["cycles"] += 1
+    cycle = _state["cycles"]
+    use_cprofile = bool(PROFILE_EVERY_N_CYCLES) and cycle % PROFILE_EVERY_N_CYCLES == 0
+    if not use_cprofile and not PROFILE_LATENCY_THRESHOLD_SECONDS:
+        return cycle_function()
+
+    sampler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_SECONDS)
+    profile = cProfile.Profile() if use_cprofile else None
+    started_at = time.perf_counter()
+    sampler.start()
+    if profile:
+        profile.enable()
+    try:
+        return cycle_function()
+    finally:
+        if profile:
+            profile.disable()
+        sampler.stop()
+        seconds = time.perf_counter() - started_at
+        slow = bool(PROFILE_LATENCY_THRESHOLD_SECONDS) and seconds >= PROFILE_LATENCY_THRESHOLD_SECONDS
+        if use_cprofile or slow:
+            try:
+                save_capture(cycle, seconds, f"every {PROFILE_EVERY_N_CYCLES} cycles" if use_cprofile else "slow cycle", sampler, profile)
+            except Exception as e:
+                log_error(f"Error saving cycle profile: {e}")
+
+
+###############################################################################
+# CAPTURE ANALYSIS
+###############################################################################
+def load_hotspots(name):
+    """
+    Return ({function: self seconds}, {function: inclusive seconds}, metadata) for a
+    capture, from cProfile stats when present, otherwise from the sampled stacks.
+    """
+    path = name if os.path.dirname(name) else os.path.join(PROFILE_DIR, name)
+    for extension in (".json", ".folded", ".prof"):
+        if path.endswith(extension):
+            path = path[:-len(extension)]
+    with open(f"{path}.json", "r") as file:
+        metadata = json.load(file)
+
+    self_seconds, inclusive_seconds = Counter(), Counter()
+    if os.path.exists(f"{path}.prof"):
+        for (filename, line, function), (_, _, tottime, cumtime, _) in pstats.Stats(f"{path}.prof").stats.items():
+            key = _frame_name(filename, line, function)
+            self_seconds[key] += tottime
+            inclusive_seconds[key] += cumtime
+        return self_seconds, inclusive_seconds, metadata
+
+    with open(f"{path}.folded", "r") as file:
+        for line in file:
+            stack, count = line.rstrip("\n").rsplit(" ", 1)
+            frames = stack.split(";")
+            seconds = int(count) * metadata["sample_interval"]
+            self_seconds[frames[-1]] += seconds
+            for frame in set(frames):
+                inclusive_seconds[frame] += seconds
+    return self_seconds, inclusive_seconds, metadata
+
+
+def diff_captures(name_a, name_b, top=20):
+    """
+    Print the functions whose self and inclusive time changed the most between two captures.
+    """
+    self_a, inclusive_a, metadata_a = load_hotspots(name_a)
+    self_b, inclusive_b, metadata_b = load_hotspots(name_b)
+    print(f"A: {name_a} - cycle {metadata_a['cycle']}, {metadata_a['seconds']}s ({metadata_a['trigger']})")
+    print(f"B: {name_b} - cycle {metadata_b['cycle']}, {metadata_b['seconds']}s ({metadata_b['trigger']})")
+    for title, a, b in (("Self time", self_a, self_b), ("Inclusive time", inclusive_a, inclusive_b)):
+        print(f"\n{title} (top {top} by change):")
+        print(f"{'A (s)':>9} {'B (s)':>9} {'delta':>9}  function")
+        changes = sorted(set(a) | set(b), key=lambda function: abs(b[function] - a[function]), reverse=True)
+        for function in changes[:top]:
+            print(f"{a[function]:>9.3f} {b[function]:>9.3f} {b[function] - a[function]:>+9.3f}  {function}")
+
+
+def list_captures():
+    for path in sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json"))):
+        with open(path, "r") as file:
+            metadata = json.load(file)
+        name = os.path.basename(path)[:-len(".json")]
+        has_prof = os.path.exists(os.path.join(PROFILE_DIR, f"{name}.prof"))
+        print(f"{name}  {metadata['seconds']:>8.1f}s  {metadata['trigger']}{'' if has_prof else ' (sampled only)'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect captured cycle profiles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list captured cycles")
+    diff_parser = subparsers.add_parser("diff", help="diff the hotspots of two captured cycles")
+    diff_parser.add_argument("name_a")
+    diff_parser.add_argument("name_b")
+    diff_parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_captures()
+    else:
+        diff_captures(args.name_a, args.name_b, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Deadline-aware fetches for external data sources. Each call gets the per-source
+time budget from FETCH_SOURCES; a hedged second attempt is fired once the first
+has run longer than the source's observed p95 latency; a circuit breaker skips a
+source after repeated failures; and the last good value, if it is not older than
+the source's stale_max_age_seconds, is served when a fetch can't complete in time.
+Batched fetches keep their last good values per item, so a batch of any symbols
+can be rebuilt from them. Timed-out attempts keep running in the background, so
+each source is capped at FETCH_MAX_OUTSTANDING_PER_SOURCE calls in flight.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import (
+    FETCH_SOURCES, FETCH_HEDGE_MIN_SAMPLES, FETCH_MAX_OUTSTANDING_PER_SOURCE,
+    FETCH_CIRCUIT_FAILURES, FETCH_CIRCUIT_COOLDOWN_SECONDS
+)
+from log_utils.log import log_debug, log_warning
+from cassette import bind_cycle
+
+# Timed-out attempts can't be cancelled; they finish in the background on this pool
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="fetch")
+_lock = threading.Lock()
+
+_latencies = defaultdict(lambda: deque(maxlen=500))   # source -> recent successful latencies
+_counters = defaultdict(Counter)                      # source -> calls/hedges/timeouts/errors/stale/skipped/saturated
+_consecutive_failures = Counter()                     # source -> failures since last success
+_circuit_open_until = {}                              # source -> epoch seconds
+_outstanding = Counter()                              # source -> attempts still running, including timed-out ones
+_last_good = OrderedDict()                            # (source, key[, item]) -> (fetched_at, value), least recently used first
+LAST_GOOD_MAX_ENTRIES = 5000
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def _hedge_delay(source, budget_seconds):
+    """
+    Fire the hedge at the source's p95 latency once there are enough samples,
+    or halfway through the budget until then.
+    """
+    with _lock:
+        samples = list(_latencies[source])
+    if len(samples) < FETCH_HEDGE_MIN_SAMPLES:
+        return budget_seconds / 2
+    return min(_percentile(samples, 95), budget_seconds)
+
+
+def _timed(fn):
+    started_at = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started_at
+
+
+def _submit(source, fn):
+    """
+    Start an attempt on the pool, or return None when the source already has
+    FETCH_MAX_OUTSTANDING_PER_SOURCE attempts running.
+    """
+    with _lock:
+        if _outstanding[source] >= FETCH_MAX_OUTSTANDING_PER_SOURCE:
+            return None
+        _outstanding[source] += 1
+    # Requests made on the pool belong to the submitting cycle's cassette
+    future = _executor.submit(_timed, bind_cycle(fn))
+    future.add_done_callback(lambda _: _finish(source))
+    return future
+
+
+def _finish(source):
+    with _lock:
+        _outstanding[source] -= 1
+
+
+def _store_last_good(last_good_key, fetched_at, value):
+    _last_good[last_good_key] = (fetched_at, value)
+    _last_good.move_to_end(last_good_key)
+    if len(_last_good) > LAST_GOOD_MAX_ENTRIES:
+        _last_good.popitem(last=False)
+
+
+def _record_success(source, key, value, latency, items):
+    fetched_at = time.time()
+    with _lock:
+        _latencies[source].append(latency)
+        _consecutive_failures[source] = 0
+        _circuit_open_until.pop(source, None)
+        if items is None:
+            _store_last_good((source, key), fetched_at, value)
+        else:
+            for item in items:
+                if item in value:
+                    _store_last_good((source, key, item), fetched_at, value[item])
+
+
+def _record_failure(source, reason):
+    with _lock:
+        _counters[source][reason] += 1
+        _consecutive_failures[source] += 1
+        if _consecutive_failures[source] >= FETCH_CIRCUIT_FAILURES and source not in _circuit_open_until:
+            _circuit_open_until[source] = time.time() + FETCH_CIRCUIT_COOLDOWN_SECONDS
+            log_warning(f"Circuit open for {source} after {_consecutive_failures[source]} failures, skipping it for {FETCH_CIRCUIT_COOLDOWN_SECONDS}s")
+
+
+def _get_last_good(last_good_key, max_age_seconds):
+    entry = _last_good.get(last_good_key)
+    if entry is None or time.time() - entry[0] > max_age_seconds:
+        return None
+    return entry
+
+
+def _fallback(source, key, error, items):
+    """
+    Serve the last good value for (source, key), or for a batch the last good
+    values of the items that have one, unless older than the source's
+    stale_max_age_seconds. Raises if there is none.
+    """
+    max_age_seconds = FETCH_SOURCES[source]["stale_max_age_seconds"]
+    with _lock:
+        if items is None:
+            entry = _get_last_good((source, key), max_age_seconds)
+            if entry is not None:
+                _counters[source]["stale"] += 1
+                return entry[1]
+        else:
+            entries = {item: _get_last_good((source, key, item), max_age_seconds) for item in items}
+            batch = {item: entry[1] for item, entry in entries.items() if entry is not None}
+            if batch:
+                _counters[source]["stale"] += 1
+                if len(batch) < len(items):
+                    log_debug(f"Serving stale {source} data for {len(batch)} of {len(items)} items")
+                return batch
+    raise Exception(f"{source} fetch failed for {key}: {error}")
+
+
+def fetch_with_deadline(source, key, fn, items=None):
+    """
+    Call fn() within the time budget of `source`, hedging slow calls, and return its
+    result. Falls back to the last good value for (source, key) on timeout, error,
+    open circuit or too many calls in flight; raises when there is none. For a
+    batched fetch, `items` lists what fn() returns a {item: value} dict for; last
+    good values are then kept per (source, key, item).
+    """
+    settings = FETCH_SOURCES[source]
+    budget_seconds = settings["budget_seconds"]
+
+    with _lock:
+        _counters[source]["calls"] += 1
+        open_until = _circuit_open_until.get(source)
+    if open_until is not None:
+        if time.time() < open_until:
+            with _lock:
+                _counters[source]["skipped"] += 1
+            return _fallback(source, key, "circuit open", items)
+        # Cool-down is over: let this call probe the source again
+        with _lock:
+            _circuit_open_until.pop(source, None)
+            _consecutive_failures[source] = FETCH_CIRCUIT_FAILURES - 1
+
+    deadline = time.perf_counter() + budget_seconds
+    first_attempt = _submit(source, fn)
+    if first_attempt is None:
+        with _lock:
+            _counters[source]["saturated"] += 1
+        return _fallback(source, key, f"{FETCH_MAX_OUTSTANDING_PER_SOURCE} calls still in flight", items)
+    pending = {first_attempt}
+    hedged = not settings.get("hedge", False)
+    last_error = "timed out"
+
+    while pending:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        timeout = remaining if hedged else min(remaining, _hedge_delay(source, budget_seconds))
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                value, latency = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            _record_success(source, key, value, latency, items)
+            return value
+        if not hedged and (not done or not pending):
+            # A slow first attempt gets a hedge; one that failed fast gets it as a retry
+            hedged = True
+            hedge = _submit(source, fn)
+            if hedge is None:
+                with _lock:
+                    _counters[source]["saturated"] += 1
+            else:
+                pending.add(hedge)
+                if not done:
+                    with _lock:
+                        _counters[source]["hedges"] += 1
+                    log_debug(f"Hedging slow {source} fetch for {key}")
+
+    _record_failure(source, "timeouts" if pending else "errors")
+    return _fallback(source, key, last_error, items)
+
+
+def get_fetch_stats():
+    """
+    Return per-source latency percentiles (seconds) and counters.
+    """
+    with _lock:
+        sources = set(_latencies) | set(_counters)
+        stats = {}
+        for source in sorted(sources):
+            samples = list(_latencies[source])
+            stats[source] = dict(_counters[source])
+            stats[source]["circuit_open"] = source in _circuit_open_until
+            stats[source]["outstanding"] = _outstanding[source]
+            if samples:
+                stats[source].update({
+                    "p50": round(_percentile(samples, 50), 3),
+                    "p95": round(_percentile(samples, 95), 3),
+                    "p99": round(_percentile(samples, 99), 3),
+                })
+    return stats
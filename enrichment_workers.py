@@ -0,0 +1,318 @@
+"""
+Distributed per-symbol enrichment. The coordinator hosts a job queue in a
+multiprocessing manager listening on ENRICHMENT_BROKER_ADDRESS (a plain socket,
+no outside services) and enqueues one get_comprehensive_stock_data() job per
+symbol. Worker processes - ENRICHMENT_LOCAL_WORKERS started next to the
+coordinator, plus any started on other nodes with the worker command - run the
+jobs and send back EnrichmentResults. A job that misses its deadline or fails
+is enqueued again, up to ENRICHMENT_MAX_ATTEMPTS attempts. Successful results
+are written to the coordinator's market data cache, so later lookups are hits.
+Deadlines run from when a worker picks a job up, so a long queue does not expire
+jobs; queued jobs fail only when no worker makes progress for a whole deadline.
+
+Neither the decision cycle nor the warm-up reads the comprehensive data, so the
+coordinator runs on its own with the enrich command, filling the shared market
+data cache for everything reading get_comprehensive_stock_data() (enrich_data.py).
+It can't run inside a multi_runner.py profile: those are daemonic processes,
+which can't start the broker and its workers; all profiles share the one cache
+the enrich command fills. A broker bound to a non-loopback address refuses to
+start with the default ENRICHMENT_BROKER_AUTHKEY.
+
+Usage: python enrichment_workers.py enrich [SYMBOL ...] (defaults to the held and watchlist symbols)
+       python enrichment_workers.py worker [--address host:port] [--processes 4]
+"""
+import ipaddress
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from multiprocessing import Process
+from multiprocessing.managers import BaseManager
+from config import (
+    ENRICHMENT_BROKER_ADDRESS, ENRICHMENT_BROKER_AUTHKEY, ENRICHMENT_LOCAL_WORKERS,
+    ENRICHMENT_JOB_DEADLINE_SECONDS, ENRICHMENT_MAX_ATTEMPTS
+)
+from log_utils.log import log_info, log_warning, log_error, log_debug
+
+# How long workers and the coordinator block on a queue before checking again
+POLL_SECONDS = 0.5
+
+# Shipped ENRICHMENT_BROKER_AUTHKEY, only accepted on a loopback address
+DEFAULT_AUTHKEY = "change-me"
+
+
+@dataclass
+class EnrichmentResult:
+    __slots__ = ("symbol", "success", "data", "error", "attempts", "worker", "seconds")
+    symbol: str
+    success: bool
+    data: dict                  # get_comprehensive_stock_data() payload, None on failure
+    error: str                  # None on success
+    attempts: int
+    worker: str                 # host:pid of the worker that ran the last attempt
+    seconds: float              # Time spent by the worker on the last attempt
+
+
+###############################################################################
+# BROKER
+###############################################################################
+# Queues living in the manager's server process
+_jobs = queue.Queue()
+_results = queue.Queue()
+
+
+def _get_jobs():
+    return _jobs
+
+
+def _get_results():
+    return _results
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+class BrokerClient(BaseManager):
+    pass
+
+
+BrokerManager.register("get_jobs", callable=_get_jobs)
+BrokerManager.register("get_results", callable=_get_results)
+BrokerClient.register("get_jobs")
+BrokerClient.register("get_results")
+
+# Running broker, its queue proxies and the local worker processes
+_state = {
+    "manager": None,
+    "jobs": None,
+    "results": None,
+    "workers": [],
+}
+_lock = threading.Lock()
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def _connect_address(address):
+    # A broker listening on all interfaces is reached locally over loopback
+    host, port = parse_address(address)
+    return ("127.0.0.1" if host in ("", "0.0.0.0") else host), port
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def start_broker():
+    """
+    Start the broker and the local workers once. Returns (jobs, results) queue proxies.
+    """
+    with _lock:
+        if _state["manager"] is None:
+            host = parse_address(ENRICHMENT_BROKER_ADDRESS)[0]
+            if ENRICHMENT_BROKER_AUTHKEY == DEFAULT_AUTHKEY and not _is_loopback(host):
+                raise Exception(f"Refusing to listen on {ENRICHMENT_BROKER_ADDRESS} with the default ENRICHMENT_BROKER_AUTHKEY; set a secret one")
+            if multiprocessing.current_process().daemon:
+                raise Exception("Daemonic processes (e.g. multi_runner.py profiles) can't start the enrichment broker; run 'python enrichment_workers.py enrich' instead")
+            manager = BrokerManager(address=parse_address(ENRICHMENT_BROKER_ADDRESS), authkey=ENRICHMENT_BROKER_AUTHKEY.encode())
+            manager.start()
+            _state["manager"] = manager
+            _state["jobs"] = manager.get_jobs()
+            _state["results"] = manager.get_results()
+            # The bound port, in case ENRICHMENT_BROKER_ADDRESS asked for any free one (port 0)
+            worker_address = f"{_connect_address(ENRICHMENT_BROKER_ADDRESS)[0]}:{manager.address[1]}"
+            for _ in range(ENRICHMENT_LOCAL_WORKERS):
+                worker = Process(target=run_worker, args=(worker_address,), daemon=True)
+                worker.start()
+                _state["workers"].append(worker)
+            log_info(f"Enrichment broker listening on {manager.address[0]}:{manager.address[1]} with {ENRICHMENT_LOCAL_WORKERS} local workers")
+        return _state["jobs"], _state["results"]
+
+
+def stop_broker():
+    with _lock:
+        for worker in _state["workers"]:
+            worker.terminate()
+        if _state["manager"] is not None:
+            _state["manager"].shutdown()
+        _state.update(manager=None, jobs=None, results=None, workers=[])
+
+
+###############################################################################
+# COORDINATOR
+###############################################################################
+def enrich_symbols(symbols, deadline_seconds=ENRICHMENT_JOB_DEADLINE_SECONDS, max_attempts=ENRICHMENT_MAX_ATTEMPTS):
+    """
+    Enrich symbols on the workers, skipping the ones already cached. Returns
+    {symbol: EnrichmentResult}; a symbol whose every attempt failed or missed its
+    deadline gets a failed result.
+    """
+    from market_data_cache import cache_get, cache_put
+
+    started_at = time.time()
+    enriched = {}
+    for symbol in dict.fromkeys(symbols):
+        cached = cache_get('comprehensive', symbol)
+        if cached:
+            enriched[symbol] = EnrichmentResult(symbol, True, cached, None, 0, None, 0.0)
+    cached_count = len(enriched)
+
+    jobs, results = start_broker()
+    issued = {}                 # job id -> symbol, for every attempt of this call
+    current = {}                # symbol -> [job id, deadline] of its latest attempt, no deadline until a worker starts it
+    attempts = {}
+    progress_at = time.time()
+
+    def submit(symbol):
+        attempts[symbol] = attempts.get(symbol, 0) + 1
+        job_id = uuid.uuid4().hex
+        issued[job_id] = symbol
+        current[symbol] = [job_id, None]
+        jobs.put({"job_id": job_id, "symbol": symbol})
+
+    def retry_or_fail(symbol, error, worker, seconds):
+        if attempts[symbol] < max_attempts:
+            log_debug(f"Retrying enrichment of {symbol} ({error})")
+            submit(symbol)
+        else:
+            del current[symbol]
+            enriched[symbol] = EnrichmentResult(symbol, False, None, error, attempts[symbol], worker, seconds)
+
+    for symbol in dict.fromkeys(symbols):
+        if symbol not in enriched:
+            submit(symbol)
+
+    while current:
+        try:
+            message = results.get(timeout=POLL_SECONDS)
+            progress_at = time.time()
+        except queue.Empty:
+            message = None
+        # A late success of an earlier attempt still counts; messages of other calls are dropped
+        symbol = issued.get(message["job_id"]) if message else None
+        if symbol in current:
+            if message.get("started"):
+                if message["job_id"] == current[symbol][0]:
+                    current[symbol][1] = time.time() + deadline_seconds
+            elif message["success"]:
+                del current[symbol]
+                cache_put('comprehensive', symbol, message["data"])
+                enriched[symbol] = EnrichmentResult(symbol, True, message["data"], None, attempts[symbol], message["worker"], message["seconds"])
+            elif message["job_id"] == current[symbol][0]:
+                retry_or_fail(symbol, message["error"], message["worker"], message["seconds"])
+
+        now = time.time()
+        for symbol, (job_id, deadline) in list(current.items()):
+            if deadline is not None and deadline <= now:
+                retry_or_fail(symbol, f"deadline of {deadline_seconds}s exceeded", None, deadline_seconds)
+            elif deadline is None and now - progress_at > deadline_seconds:
+                # No worker has picked anything up for a whole deadline; retrying would not help
+                del current[symbol]
+                enriched[symbol] = EnrichmentResult(symbol, False, None, "no worker available", attempts[symbol], None, 0.0)
+
+    failed = [symbol for symbol, result in enriched.items() if not result.success]
+    retried = sum(1 for result in enriched.values() if result.attempts > 1)
+    log_debug(f"Enriched {len(enriched) - len(failed)} of {len(enriched)} symbols in {time.time() - started_at:.1f}s ({cached_count} cached, {retried} retried)")
+    if failed:
+        log_warning(f"Enrichment failed for: {', '.join(failed)}")
+    return enriched
+
+
+###############################################################################
+# WORKER
+###############################################################################
+def run_worker(address=ENRICHMENT_BROKER_ADDRESS):
+    """
+    Run enrichment jobs from the broker at `address` until it goes away.
+    """
+    # The fetchers import the log utilities as top-level modules
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_utils"))
+    from yfinance_functions import get_comprehensive_stock_data
+
+    client = BrokerClient(address=_connect_address(address), authkey=ENRICHMENT_BROKER_AUTHKEY.encode())
+    client.connect()
+    jobs, results = client.get_jobs(), client.get_results()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    while True:
+        try:
+            job = jobs.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            continue
+        except (EOFError, ConnectionError):
+            return
+        started_at = time.time()
+        try:
+            # The job's deadline runs from here, not from when it was queued
+            results.put({"job_id": job["job_id"], "started": True})
+        except (EOFError, ConnectionError):
+            return
+        try:
+            data = get_comprehensive_stock_data(job["symbol"])
+            error = None if data.get("success") else data.get("error", "enrichment failed")
+        except Exception as e:
+            data, error = None, str(e)
+        try:
+            results.put({
+                "job_id": job["job_id"], "success": error is None, "data": data if error is None else None,
+                "error": error, "worker": worker, "seconds": round(time.time() - started_at, 3),
+            })
+        except (EOFError, ConnectionError):
+            return
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Enrich symbols on worker processes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    enrich_parser = subparsers.add_parser("enrich", help="run the coordinator and its local workers once")
+    enrich_parser.add_argument("symbols", nargs="*", help="symbols to enrich (default: held and watchlist symbols)")
+    worker_parser = subparsers.add_parser("worker", help="run worker processes for a coordinator's broker")
+    worker_parser.add_argument("--address", default=ENRICHMENT_BROKER_ADDRESS, help="broker host:port")
+    worker_parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.command == "enrich":
+        # The fetchers import the log utilities as top-level modules
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_utils"))
+        import market_data_cache
+        from warmup import get_universe_symbols
+
+        # Without the shared cache the results would be lost when this process exits
+        market_data_cache.MARKET_DATA_CACHE_ENABLED = True
+        symbols = [symbol.upper() for symbol in args.symbols] or get_universe_symbols()
+        try:
+            results = enrich_symbols(symbols)
+        finally:
+            stop_broker()
+        log_info(f"Enriched {sum(1 for result in results.values() if result.success)} of {len(results)} symbols")
+        return
+
+    # Workers must be the importable module's, not __main__'s, to unpickle the same way everywhere
+    from enrichment_workers import run_worker as worker_entry
+    workers = [Process(target=worker_entry, args=(args.address,)) for _ in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    log_info(f"Started {len(workers)} enrichment workers for {args.address}")
+    for worker in workers:
+        worker.join()
+    log_error("Enrichment broker went away, workers stopped")
+
+
+if __name__ == '__main__':
+    main()
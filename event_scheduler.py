@@ -0,0 +1,130 @@
+import time
+from collections import Counter
+from config import (
+    EVENT_POLL_SECONDS, EVENT_DEBOUNCE_SECONDS,
+    EVENT_PRICE_MOVE_PCT, EVENT_VOLUME_SPIKE_RATIO, EVENT_PL_MOVE_PCT,
+    EVENT_SYMBOL_THRESHOLDS
+)
+from log_utils.log import log_debug, log_info, log_error
+from yfinance_functions import get_batch_quotes
+
+# Number of wake-ups by reason ("price_move", "volume_spike", "pl_move", "max_interval")
+# plus "debounced" for triggers that arrived too soon after the previous run
+trigger_counts = Counter()
+
+
+def get_thresholds(symbol):
+    """
+    Return the trigger thresholds for a symbol, applying any per-symbol overrides.
+    """
+    thresholds = {
+        "price_move_pct": EVENT_PRICE_MOVE_PCT,
+        "volume_spike_ratio": EVENT_VOLUME_SPIKE_RATIO,
+        "pl_move_pct": EVENT_PL_MOVE_PCT,
+    }
+    thresholds.update(EVENT_SYMBOL_THRESHOLDS.get(symbol, {}))
+    return thresholds
+
+
+def get_positions_pl():
+    """
+    Return the unrealized P/L percentage of every open position in one request.
+    """
+    from alpacaFunctions import get_trading_client
+
+    positions = get_trading_client().get_all_positions()
+    return {position.symbol: float(position.unrealized_plpc) * 100 for position in positions}
+
+
+def volume_ratio(quote):
+    """
+    Return a quote's latest bar volume relative to its average bar volume (None without an average).
+    """
+    return quote["volume"] / quote["avg_volume"] if quote["avg_volume"] > 0 else None
+
+
+def check_triggers(quotes, positions_pl, baseline):
+    """
+    Compare the latest quotes and P/L against the baseline taken after the last run.
+    Returns a list of (symbol, reason, value) tuples for every crossed threshold.
+    A volume spike only counts when the volume ratio crossed its threshold since the
+    baseline, so a session that stays busy doesn't trigger again on every poll.
+    """
+    triggers = []
+    for symbol, quote in quotes.items():
+        thresholds = get_thresholds(symbol)
+        base_price = baseline["prices"].get(symbol)
+        if base_price:
+            move_pct = (quote["price"] - base_price) / base_price * 100
+            if thresholds["price_move_pct"] is not False and abs(move_pct) >= thresholds["price_move_pct"]:
+                triggers.append((symbol, "price_move", round(move_pct, 2)))
+        ratio = volume_ratio(quote)
+        base_ratio = baseline["volume_ratios"].get(symbol)
+        if ratio is not None and base_ratio is not None and thresholds["volume_spike_ratio"] is not False:
+            if ratio >= thresholds["volume_spike_ratio"] > base_ratio:
+                triggers.append((symbol, "volume_spike", round(ratio, 2)))
+
+    for symbol, plpc in positions_pl.items():
+        thresholds = get_thresholds(symbol)
+        base_plpc = baseline["pl"].get(symbol)
+        if base_plpc is None or thresholds["pl_move_pct"] is False:
+            continue
+        if abs(plpc - base_plpc) >= thresholds["pl_move_pct"]:
+            triggers.append((symbol, "pl_move", round(plpc - base_plpc, 2)))
+
+    return triggers
+
+
+def wait_for_next_cycle(watchlist_symbols, last_cycle_started_at, max_wait_seconds):
+    """
+    Watch held and watchlist symbols until a threshold is crossed or max_wait_seconds
+    pass, whichever comes first. Returns the list of triggers that woke us up
+    (empty when the maximum interval elapsed).
+    """
+    deadline = time.time() + max_wait_seconds
+    baseline = None
+    # (symbol, reason) of triggers already counted as debounced, so each is counted once
+    debounced = set()
+
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            trigger_counts["max_interval"] += 1
+            log_info(f"No triggers in {max_wait_seconds} seconds, running scheduled cycle")
+            log_debug(f"Scheduler trigger counts: {dict(trigger_counts)}")
+            return []
+
+        try:
+            positions_pl = get_positions_pl()
+            quotes = get_batch_quotes(set(watchlist_symbols) | set(positions_pl))
+        except Exception as e:
+            log_error(f"Error refreshing price watch: {e}")
+            time.sleep(min(EVENT_POLL_SECONDS, remaining))
+            continue
+
+        if baseline is None:
+            baseline = {
+                "prices": {symbol: quote["price"] for symbol, quote in quotes.items()},
+                "volume_ratios": {symbol: volume_ratio(quote) for symbol, quote in quotes.items()},
+                "pl": positions_pl,
+            }
+            log_debug(f"Price watch baseline set for {len(baseline['prices'])} symbols")
+        else:
+            triggers = check_triggers(quotes, positions_pl, baseline)
+            if triggers:
+                summary = ", ".join(f"{symbol} {reason} ({value})" for symbol, reason, value in triggers)
+                since_last_cycle = time.time() - last_cycle_started_at
+                if since_last_cycle < EVENT_DEBOUNCE_SECONDS:
+                    for symbol, reason, _ in triggers:
+                        if (symbol, reason) not in debounced:
+                            debounced.add((symbol, reason))
+                            trigger_counts["debounced"] += 1
+                    log_debug(f"Debounced triggers {since_last_cycle:.0f}s after last cycle: {summary}")
+                else:
+                    for _, reason, _ in triggers:
+                        trigger_counts[reason] += 1
+                    log_info(f"Triggered cycle: {summary}")
+                    log_debug(f"Scheduler trigger counts: {dict(trigger_counts)}")
+                    return triggers
+
+        time.sleep(min(EVENT_POLL_SECONDS, max(0, deadline - time.time())))
@@ -0,0 +1,163 @@
+"""
+Background fill tracker. Orders submitted during a cycle are registered with
+track_order(); a daemon thread polls all of them with batched get_orders calls
+(one per page of ORDERS_PAGE_SIZE orders) per tick and writes the executed
+quantity, average price and fill latency to the trading journal once each order
+reaches a final status.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config import FILL_TRACKER_POLL_SECONDS, FILL_TRACKER_MAX_AGE_SECONDS
+from log import log_info, log_warning, log_error
+from alpacaFunctions import get_trading_client
+from trading_logs import update_trade_fill
+
+FINAL_STATUSES = {"filled", "canceled", "expired", "rejected", "replaced", "done_for_day"}
+
+# Largest page Alpaca returns for one get_orders call
+ORDERS_PAGE_SIZE = 500
+
+# order_id -> {"symbol", "side", "amount", "tracked_at"}
+_pending = {}
+
+# order_id -> {"status", "filled_qty", "filled_avg_price", "fill_latency_seconds"} of resolved orders
+_resolved = {}
+_lock = threading.Lock()
+_thread = None
+
+
+def track_order(order_id, symbol, side, amount):
+    """
+    Register a submitted order for fill tracking, starting the tracker thread on
+    first use. Returns immediately.
+    """
+    global _thread
+    with _lock:
+        _pending[str(order_id)] = {"symbol": symbol, "side": side, "amount": amount, "tracked_at": time.time()}
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="fill-tracker", daemon=True)
+            _thread.start()
+
+
+def get_pending_orders():
+    """
+    Return a copy of the orders still waiting for a final status.
+    """
+    with _lock:
+        return dict(_pending)
+
+
+def get_resolved_orders():
+    """
+    Return a copy of the final status and fill of every order resolved so far.
+    """
+    with _lock:
+        return dict(_resolved)
+
+
+def wait_for_orders(order_ids, timeout_seconds):
+    """
+    Wait until every order in order_ids has reached a final status or timeout_seconds
+    pass. Returns {order_id: resolved entry} of the orders that resolved in time.
+    """
+    order_ids = [str(order_id) for order_id in order_ids]
+    deadline = time.time() + timeout_seconds
+    while True:
+        resolved = get_resolved_orders()
+        if all(order_id in resolved for order_id in order_ids) or time.time() >= deadline:
+            return {order_id: resolved[order_id] for order_id in order_ids if order_id in resolved}
+        time.sleep(min(FILL_TRACKER_POLL_SECONDS / 2, max(0, deadline - time.time())))
+
+
+def _fill_latency_seconds(order):
+    if order.filled_at is None or order.submitted_at is None:
+        return None
+    return round((order.filled_at - order.submitted_at).total_seconds(), 3)
+
+
+def fetch_orders(pending):
+    """
+    Fetch the recent orders of the pending orders' symbols, newest first, paging
+    back with `until` until every pending order was seen or the window is exhausted.
+    """
+    from alpaca.trading.requests import GetOrdersRequest
+    from alpaca.trading.enums import QueryOrderStatus
+
+    oldest = min(order["tracked_at"] for order in pending.values())
+    after = datetime.fromtimestamp(oldest, timezone.utc) - timedelta(minutes=1)
+    symbols = sorted({order["symbol"] for order in pending.values()})
+    orders = {}
+    until = None
+    while True:
+        page = get_trading_client().get_orders(filter=GetOrdersRequest(
+            status=QueryOrderStatus.ALL, after=after, until=until,
+            symbols=symbols, limit=ORDERS_PAGE_SIZE,
+        ))
+        for order in page:
+            orders[str(order.id)] = order
+        if len(page) < ORDERS_PAGE_SIZE or pending.keys() <= orders.keys():
+            return list(orders.values())
+        # `until` is exclusive; one microsecond past the page's oldest order keeps its ties
+        next_until = min(order.submitted_at for order in page) + timedelta(microseconds=1)
+        if until is not None and next_until >= until:
+            # A whole page submitted at the same instant: move past it
+            next_until = until - timedelta(microseconds=1)
+        until = next_until
+
+
+def poll_fills():
+    """
+    Fetch every pending order with batched get_orders calls and record the ones
+    that have reached a final status. Returns the number of orders resolved.
+    """
+    pending = get_pending_orders()
+    if not pending:
+        return 0
+
+    orders = fetch_orders(pending)
+
+    resolved = 0
+    for order in orders:
+        order_id = str(order.id)
+        if order_id not in pending:
+            continue
+        status = order.status.value
+        filled_qty = float(order.filled_qty) if order.filled_qty else 0.0
+        filled_avg_price = float(order.filled_avg_price) if order.filled_avg_price else None
+        fill_latency = _fill_latency_seconds(order)
+
+        if status not in FINAL_STATUSES:
+            continue
+        update_trade_fill(order_id, status, filled_qty, filled_avg_price, order.filled_at, fill_latency)
+        with _lock:
+            _pending.pop(order_id, None)
+            _resolved[order_id] = {
+                "status": status, "filled_qty": filled_qty,
+                "filled_avg_price": filled_avg_price, "fill_latency_seconds": fill_latency,
+            }
+        resolved += 1
+
+        tracked = pending[order_id]
+        if status == "filled":
+            log_info(f"{tracked['symbol']} > {tracked['side'].capitalize()} filled: {filled_qty:.6f} @ ${filled_avg_price:.2f} in {fill_latency}s")
+        else:
+            log_warning(f"{tracked['symbol']} > {tracked['side'].capitalize()} order {status}, filled {filled_qty:.6f}")
+
+    # Give up on orders that never show up or never finish (e.g. the API lost them)
+    now = time.time()
+    with _lock:
+        for order_id, order in list(_pending.items()):
+            if now - order["tracked_at"] > FILL_TRACKER_MAX_AGE_SECONDS:
+                log_warning(f"{order['symbol']} > Stopped tracking order {order_id} after {FILL_TRACKER_MAX_AGE_SECONDS}s")
+                del _pending[order_id]
+    return resolved
+
+
+def _run():
+    while True:
+        time.sleep(FILL_TRACKER_POLL_SECONDS)
+        try:
+            poll_fills()
+        except Exception as e:
+            log_error(f"Fill tracker error: {e}")
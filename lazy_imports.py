@@ -0,0 +1,22 @@
+import importlib.util
+import sys
+
+
+def lazy_module(name):
+    """
+    Return a module object whose import is deferred until the first attribute access.
+    Use for heavy top-level dependencies (yfinance, pandas, ...) so that importing
+    the bot doesn't pay for libraries a given run never touches.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -1,5 +1,5 @@
 from datetime import datetime
-from config import LOG_LEVEL
+from config import LOG_LEVEL, LOG_PREFIX
 
 # Print log message
 def log(level, msg):
@@ -15,7 +15,7 @@ def log(level, msg):
     if log_levels.get(level, 2) >= log_levels.get(LOG_LEVEL, 2):
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         level_space = " " * (8 - len(level))
-        print(f"{timestamp_color_code}[{timestamp}] {level_color_codes[level]}[{level}]{reset_color_code}{level_space}{msg}")
+        print(f"{timestamp_color_code}[{timestamp}] {level_color_codes[level]}[{level}]{reset_color_code}{level_space}{LOG_PREFIX}{msg}")
 
 
 # Print debug log message
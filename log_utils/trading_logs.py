@@ -10,6 +10,19 @@ DB_PATH = os.path.join(SCRIPT_DIR, 'trading_logs.db')
 BACKUP_ENABLED = True
 BACKUP_INTERVAL_HOURS = 24
 
+# Set once init_db() has run; the schema is created lazily on first write
+_db_initialized = False
+
+# Execution columns filled in by the fill tracker, added to older databases on init
+FILL_COLUMNS = {
+    "order_id": "TEXT",
+    "status": "TEXT",
+    "filled_qty": "REAL",
+    "filled_avg_price": "REAL",
+    "filled_at": "DATETIME",
+    "fill_latency_seconds": "REAL",
+}
+
 def init_db():
     """Initialize the database with the correct schema."""
     conn = sqlite3.connect(DB_PATH)
@@ -25,10 +38,25 @@ def init_db():
         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
     )
     ''')
+
+    existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(trading_logs)")}
+    for column, column_type in FILL_COLUMNS.items():
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE trading_logs ADD COLUMN {column} {column_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS trading_logs_order_id ON trading_logs (order_id)")
     
     conn.commit()
     return conn, cursor
 
+def ensure_db():
+    """Initialize the database once, on the first write of this process."""
+    global _db_initialized
+    if _db_initialized:
+        return
+    conn, _ = init_db()
+    conn.close()
+    _db_initialized = True
+
 def backup_db():
     """Create a backup of the database if enabled."""
     if not BACKUP_ENABLED:
@@ -60,7 +88,7 @@ def backup_db():
     except Exception as e:
         print(f"Error creating database backup: {e}")
 
-def log_trade_to_db(symbol, decision, amount):
+def log_trade_to_db(symbol, decision, amount, order_id=None):
     """
     Log a trade to the database with amount in USD.
     
@@ -68,17 +96,21 @@ def log_trade_to_db(symbol, decision, amount):
         symbol (str): The stock symbol
         decision (str): The trade decision (buy/sell)
         amount (float): The dollar amount of the trade
+        order_id (str): The Alpaca order ID, used to record the fill later
     """
+    conn = None
     try:
+        ensure_db()
+
         # Create a backup before logging new trade
         backup_db()
         
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         cursor.execute('''
-        INSERT INTO trading_logs (symbol, decision, amount)
-        VALUES (?, ?, ?)
-        ''', (symbol, decision, float(amount)))
+        INSERT INTO trading_logs (symbol, decision, amount, order_id, status)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (symbol, decision, float(amount), str(order_id) if order_id else None, "submitted" if order_id else None))
         conn.commit()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
@@ -86,5 +118,32 @@ def log_trade_to_db(symbol, decision, amount):
         if conn:
             conn.close()
 
-# Create the database and table if they don't exist
-init_db()
+def update_trade_fill(order_id, status, filled_qty, filled_avg_price, filled_at, fill_latency_seconds):
+    """
+    Record the execution of a logged trade.
+    
+    Args:
+        order_id (str): The Alpaca order ID the trade was logged with
+        status (str): The final order status (filled, canceled, ...)
+        filled_qty (float): The executed quantity
+        filled_avg_price (float): The average fill price
+        filled_at (datetime): When the order was filled
+        fill_latency_seconds (float): Seconds from submission to fill
+    """
+    conn = None
+    try:
+        ensure_db()
+
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+        UPDATE trading_logs
+        SET status = ?, filled_qty = ?, filled_avg_price = ?, filled_at = ?, fill_latency_seconds = ?
+        WHERE order_id = ?
+        ''', (status, filled_qty, filled_avg_price, str(filled_at) if filled_at else None, fill_latency_seconds, str(order_id)))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        if conn:
+            conn.close()
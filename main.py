@@ -1,34 +1,85 @@
-from openai import OpenAI
 import time
-from datetime import datetime
 import json
+import threading
 import re
 from config import *
 from log import *
 from alpacaFunctions import *
 from trading_logs import *
-
-
-# Initialize session and login
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-# Make AI request to OpenAI API
-def make_ai_request(prompt):
-    ai_resp = openai_client.chat.completions.create(
-        model=OPENAI_MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return ai_resp
+from market_calendar import seconds_until_next_boundary
+from event_scheduler import wait_for_next_cycle
+from watchlist_index import get_watchlist_index
+from universe_rotation import rank_symbols, mark_evaluated
+from deadline_fetch import get_fetch_stats
+from fill_tracker import track_order, get_resolved_orders, wait_for_orders
+from pretrade_validator import take_snapshot
+from allocation_solver import solve_allocation
+from risk_exits import start_risk_exits
+from openai_requests import make_ai_request, get_usage_totals
+from triage import triage_symbols, compact_holding
+from materiality_gate import build_fingerprint, check_materiality, record_evaluated, record_skipped, get_skip_stats
+from prefetch import start_prefetch, schedule_quote_refresh
+from portfolio_risk import get_risk_summary
+from cycle_profiler import profile_cycle
+from cassette import cassette_cycle
+from cycle_archive import archive_cycle, archive_record, archive_symbols
+from warmup import wait_for_warmup, report_first_cycle
+
+
+# Held while a full trading cycle runs, so risk exits never trade at the same time
+_cycle_lock = threading.Lock()
+
+# Messages of the current cycle's decision conversation (system, user, assistant, ...)
+_conversation = []
+
+# Trading results already sent to the AI in the current conversation, by symbol
+_sent_results = {}
+
+# Static instructions sent first in every request, so the provider can cache the prompt prefix
+DECISIONS_SYSTEM_PROMPT = (
+    "**Decision-Making AI Prompt:**\n\n"
+    "**Context:**\n"
+    f"You are an investment advisor managing a stock portfolio and watchlist. Every {RUN_INTERVAL_SECONDS} seconds, you analyze market conditions to make informed investment decisions.{chr(10)}{chr(10)}"
+    "**Task:**\n"
+    "Analyze the provided portfolio and watchlist data to recommend:\n"
+    "1. Stocks to sell, prioritizing those that maximize buying power and profit potential.\n"
+    "2. Stocks to buy that align with available funds and current market conditions.\n"
+    "3. Consider existing open orders and unrealized P/L when making decisions.\n"
+    "4. When a portfolio risk summary is provided, weigh concentration, correlation, volatility, beta and VaR: prefer trades that lower risk concentration.\n\n"
+    "**Important Considerations:**\n"
+    "- DO NOT make new orders for stocks that have pending orders (check 'open_orders' field)\n"
+    "- If a stock has a pending BUY order, do not place another buy order\n"
+    "- If a stock has a pending SELL order, do not place another sell order\n"
+    "- Consider unrealized P/L and P/L percentage when deciding to take profits or cut losses\n"
+    "- Current value and unrealized P/L can help determine position sizing\n"
+    "- Pending orders may show $0.00 or small amounts if placed after hours\n"
+    "- Portfolio stocks marked 'triaged' were screened as needing no action this cycle; keep them unless selling one is needed to fund a better trade\n\n"
+    "**Response Format:**\n"
+    "Return your decisions in a JSON array with this structure:\n"
+    "```json\n"
+    "[\n"
+    '  {"symbol": "<symbol>", "decision": "<decision>", "amount": <dollar_amount>},\n'
+    "  ...\n"
+    "]\n"
+    "```\n"
+    "- `symbol`: Stock ticker symbol.\n"
+    "- `decision`: One of `buy`, `sell`, or `hold`.\n"
+    "- `amount`: Dollar amount to trade (e.g. 500.50 for $500.50).\n\n"
+    "**Instructions:**\n"
+    "- Provide only the JSON output with no additional text.\n"
+    "- Return an empty array if no actions are necessary.\n"
+    "- Specify amounts in USD (e.g. 500.50 for $500.50).\n"
+    "- Fractional shares are supported, so exact dollar amounts can be used.\n"
+    "- IMPORTANT: Skip ANY stock that already has a pending order, regardless of the order amount."
+)
 
 
 # Parse AI response
-def parse_ai_response(ai_response):
+def parse_ai_response(ai_content):
     try:
-        ai_content = re.sub(r'```json|```', '', ai_response.choices[0].message.content.strip())
-        decisions = json.loads(ai_content)
+        decisions = json.loads(re.sub(r'```json|```', '', ai_content.strip()))
     except json.JSONDecodeError as e:
-        raise Exception("Invalid JSON response from OpenAI: " + ai_response.choices[0].message.content.strip())
+        raise Exception("Invalid JSON response from OpenAI: " + ai_content.strip())
     return decisions
 
 
@@ -51,8 +102,8 @@ def get_ai_amount_guidelines():
     return sell_guidelines, buy_guidelines
 
 
-# Make AI-based decisions on stock portfolio and watchlist
-def make_ai_decisions(buying_power, portfolio_overview, watchlist_overview):
+# Get the constraints section shared by the decision and adjustment prompts
+def get_ai_constraints(buying_power):
     sell_guidelines, buy_guidelines = get_ai_amount_guidelines()
     symbols_under_limit = get_stocks_from_db_under_day_trade_limit() if PDT_PROTECTION else []
 
@@ -68,23 +119,14 @@ def make_ai_decisions(buying_power, portfolio_overview, watchlist_overview):
         constraints.append(f"- Stocks under PDT Limit: {', '.join(symbols_under_limit)}")
     if len(TRADE_EXCEPTIONS) > 0:
         constraints.append(f"- Trade Exceptions (exclude from trading in any decisions): {', '.join(TRADE_EXCEPTIONS)}")
+    return constraints
+
+
+# Make AI-based decisions on stock portfolio and watchlist
+def make_ai_decisions(buying_power, portfolio_overview, watchlist_overview, risk_summary=None):
+    constraints = get_ai_constraints(buying_power)
 
     ai_prompt = (
-        "**Decision-Making AI Prompt:**\n\n"
-        "**Context:**\n"
-        f"You are an investment advisor managing a stock portfolio and watchlist. Every {RUN_INTERVAL_SECONDS} seconds, you analyze market conditions to make informed investment decisions.{chr(10)}{chr(10)}"
-        "**Task:**\n"
-        "Analyze the provided portfolio and watchlist data to recommend:\n"
-        "1. Stocks to sell, prioritizing those that maximize buying power and profit potential.\n"
-        "2. Stocks to buy that align with available funds and current market conditions.\n"
-        "3. Consider existing open orders and unrealized P/L when making decisions.\n\n"
-        "**Important Considerations:**\n"
-        "- DO NOT make new orders for stocks that have pending orders (check 'open_orders' field)\n"
-        "- If a stock has a pending BUY order, do not place another buy order\n"
-        "- If a stock has a pending SELL order, do not place another sell order\n"
-        "- Consider unrealized P/L and P/L percentage when deciding to take profits or cut losses\n"
-        "- Current value and unrealized P/L can help determine position sizing\n"
-        "- Pending orders may show $0.00 or small amounts if placed after hours\n\n"
         "**Constraints:**\n"
         f"{chr(10).join(constraints)}"
         "\n\n"
@@ -95,49 +137,68 @@ def make_ai_decisions(buying_power, portfolio_overview, watchlist_overview):
         "**Watchlist Overview:**\n"
         "```json\n"
         f"{json.dumps(watchlist_overview, indent=1)}{chr(10)}"
-        "```\n\n"
-        "**Response Format:**\n"
-        "Return your decisions in a JSON array with this structure:\n"
-        "```json\n"
-        "[\n"
-        '  {"symbol": "<symbol>", "decision": "<decision>", "amount": <dollar_amount>},\n'
-        "  ...\n"
-        "]\n"
-        "```\n"
-        "- `symbol`: Stock ticker symbol.\n"
-        "- `decision`: One of `buy`, `sell`, or `hold`.\n"
-        "- `amount`: Dollar amount to trade (e.g. 500.50 for $500.50).\n\n"
-        "**Instructions:**\n"
-        "- Provide only the JSON output with no additional text.\n"
-        "- Return an empty array if no actions are necessary.\n"
-        "- Specify amounts in USD (e.g. 500.50 for $500.50).\n"
-        "- Fractional shares are supported, so exact dollar amounts can be used.\n"
-        "- IMPORTANT: Skip ANY stock that already has a pending order, regardless of the order amount."
+        "```"
     )
+    if risk_summary:
+        ai_prompt += (
+            "\n\n"
+            f"**Portfolio Risk (last {risk_summary['window_days']} daily returns):**\n"
+            "```json\n"
+            f"{json.dumps({key: value for key, value in risk_summary.items() if key != 'window_days'}, separators=(',', ':'))}{chr(10)}"
+            "```"
+        )
+    _conversation[:] = [
+        {"role": "system", "content": DECISIONS_SYSTEM_PROMPT},
+        {"role": "user", "content": ai_prompt},
+    ]
+    _sent_results.clear()
+
     log_debug(f"AI making-decisions prompt:{chr(10)}{ai_prompt}")
-    ai_response = make_ai_request(ai_prompt)
-    log_debug(f"AI making-decisions response:{chr(10)}{ai_response.choices[0].message.content.strip()}")
-    decisions = parse_ai_response(ai_response)
+    ai_content = make_ai_request(_conversation, "making-decisions")
+    log_debug(f"AI making-decisions response:{chr(10)}{ai_content.strip()}")
+    _conversation.append({"role": "assistant", "content": ai_content})
+    decisions = parse_ai_response(ai_content)
     return decisions
 
 
-# Make post-decisions adjustment based on trading results
+# Make post-decisions adjustment by continuing the decision conversation with what changed since the last round
 def make_ai_post_decisions_adjustment(buying_power, trading_results):
-    sell_guidelines, buy_guidelines = get_ai_amount_guidelines()
-    symbols_under_limit = get_stocks_from_db_under_day_trade_limit() if PDT_PROTECTION else []
+    if not AI_DELTA_FOLLOWUPS or not _conversation:
+        return make_ai_full_post_decisions_adjustment(buying_power, trading_results)
+
+    # Attach the executed fill to submitted orders the fill tracker has resolved
+    resolved_orders = get_resolved_orders()
+    current_results = {}
+    for symbol, result in trading_results.items():
+        details = result.get('details')
+        if isinstance(details, dict) and details.get('order_id') in resolved_orders:
+            result = {**result, 'fill': resolved_orders[details['order_id']]}
+        current_results[symbol] = result
+    changed_results = {symbol: result for symbol, result in current_results.items() if _sent_results.get(symbol) != result}
+    ai_prompt = (
+        "**Update Since Your Last Decisions:**\n"
+        f"- Buying Power: {buying_power} USD now.\n\n"
+        "**New Trading Results (submitted and filled orders, rejections and errors):**\n"
+        "```json\n"
+        f"{json.dumps(changed_results, indent=1, default=str)}{chr(10)}"
+        "```\n\n"
+        "Resolve the errors and rejections, and use any freed buying power. "
+        "Return only the additional decisions to execute now, in the same JSON format."
+    )
+    _conversation.append({"role": "user", "content": ai_prompt})
+    _sent_results.update(changed_results)
 
-    constraints = [
-        f"- Maintain a portfolio size of fewer than {PORTFOLIO_LIMIT} stocks.",
-        f"- Total Buying Power: {buying_power} USD initially."
-    ]
-    if sell_guidelines:
-        constraints.append(f"- Sell Amounts Guidelines: {sell_guidelines}")
-    if buy_guidelines:
-        constraints.append(f"- Buy Amounts Guidelines: {buy_guidelines}")
-    if len(symbols_under_limit) > 0:
-        constraints.append(f"- Stocks under PDT Limit: {', '.join(symbols_under_limit)}")
-    if len(TRADE_EXCEPTIONS) > 0:
-        constraints.append(f"- Trade Exceptions (exclude from trading in any decisions): {', '.join(TRADE_EXCEPTIONS)}")
+    log_debug(f"AI post-decisions-adjustment prompt:{chr(10)}{ai_prompt}")
+    ai_content = make_ai_request(_conversation, "post-decisions-adjustment (delta)")
+    log_debug(f"AI post-decisions-adjustment response:{chr(10)}{ai_content.strip()}")
+    _conversation.append({"role": "assistant", "content": ai_content})
+    decisions = parse_ai_response(ai_content)
+    return decisions
+
+
+# Make post-decisions adjustment from a standalone prompt with the full trading results
+def make_ai_full_post_decisions_adjustment(buying_power, trading_results):
+    constraints = get_ai_constraints(buying_power)
 
     ai_prompt = (
         "**Post-Decision Adjustments AI Prompt:**\n\n"
@@ -172,64 +233,59 @@ def make_ai_post_decisions_adjustment(buying_power, trading_results):
         "- Fractional shares are supported, so exact dollar amounts can be used."
     )
     log_debug(f"AI post-decisions-adjustment prompt:{chr(10)}{ai_prompt}")
-    ai_response = make_ai_request(ai_prompt)
-    log_debug(f"AI post-decisions-adjustment response:{chr(10)}{ai_response.choices[0].message.content.strip()}")
-    decisions = parse_ai_response(ai_response)
+    ai_content = make_ai_request(ai_prompt, "post-decisions-adjustment (full)")
+    log_debug(f"AI post-decisions-adjustment response:{chr(10)}{ai_content.strip()}")
+    decisions = parse_ai_response(ai_content)
     return decisions
 
 
-# Limit watchlist stocks based on the current week number
-def limit_watchlist_stocks(watchlist_stocks, limit):
-    if len(watchlist_stocks) <= limit:
-        return watchlist_stocks
-
-    # Sort watchlist stocks by symbol
-    watchlist_stocks = sorted(watchlist_stocks, key=lambda x: x['symbol'])
-
-    # Get the current month number
-    current_month = datetime.now().month
+# Rank watchlist stocks by priority, without marking them as evaluated yet
+def rank_watchlist_symbols(limit, exclude=()):
+    try:
+        return rank_symbols(get_watchlist_index()["sorted_symbols"], limit, exclude)
+    except Exception as e:
+        log_error(f"Error ranking watchlist stocks: {e}")
+        return []
 
-    # Calculate the number of parts
-    num_parts = (len(watchlist_stocks) + limit - 1) // limit  # Ceiling division
 
-    # Determine the part to return based on the current month number
-    part_index = (current_month - 1) % num_parts
-    start_index = part_index * limit
-    end_index = min(start_index + limit, len(watchlist_stocks))
+# Limit watchlist stocks to the ranked ones for this cycle, priced from the cycle's batched quotes
+def limit_watchlist_stocks(symbols, prices):
+    index = get_watchlist_index()
+    mark_evaluated(symbols)
 
-    return watchlist_stocks[start_index:end_index]
+    watchlist_stocks = []
+    for symbol in symbols:
+        current_price = prices.get(symbol)
+        watchlist_stocks.append({**index["by_symbol"][symbol], 'price': round(current_price, 2) if current_price else 0})
+    return watchlist_stocks
 
 
-def get_watchlist_stocks(name):
+def get_watchlist_symbols():
     """
-    Loads watchlist data from local JSON, which might contain multiple watchlists.
+    Returns the symbols of all configured watchlists, without fetching prices.
     """
     try:
-        with open(WATCHLIST_FILE, "r") as file:
-            watchlists = json.load(file)
-        if name not in watchlists:
-            log_warning(f"Watchlist '{name}' not found in {WATCHLIST_FILE}")
-            return []
-        
-        # Add current prices to watchlist stocks
-        watchlist_stocks = watchlists[name]
-        for stock in watchlist_stocks:
-            current_price = get_current_price(stock['symbol'])
-            stock['price'] = round(current_price, 2) if current_price else 0
-        
-        return watchlist_stocks
+        return get_watchlist_index()["symbols"]
     except Exception as e:
-        log_error(f"Error loading watchlist {name}: {e}")
+        log_error(f"Error loading watchlists: {e}")
         return []
 
 
 # Main trading bot function
 def trading_bot():
+    gathering_started_at = time.time()
     log_info("Getting portfolio stocks...")
-    portfolio_stocks = get_portfolio_stocks()
+    positions, open_orders = get_positions_and_orders()
+    held_symbols = [position.symbol for position in positions if float(position.qty) != 0]
+    # Held, ordered and candidate watchlist stocks are all priced with one batched request
+    ranked_symbols = rank_watchlist_symbols(WATCHLIST_OVERVIEW_LIMIT, exclude=held_symbols)
+    prices = get_current_prices([position.symbol for position in positions] + list(open_orders) + ranked_symbols)
+    portfolio_stocks = get_portfolio_stocks(positions, open_orders, prices)
 
     # Get and display account information
     account_info = get_account_info()
+    archive_record("input", "account", account_info)
+    archive_symbols("position", portfolio_stocks)
     log_info(f"Account Status:")
     log_info(f"  Portfolio Value: ${account_info['portfolio_value']:,.2f}")
     log_info(f"  Buying Power: ${account_info['buying_power']:,.2f}")
@@ -253,6 +309,21 @@ def trading_bot():
     
     log_info(f"Portfolio stocks to proceed: {', '.join(portfolio) if portfolio else 'None'}")
 
+    fingerprint = None
+    if MATERIALITY_GATE_ENABLED:
+        try:
+            fingerprint = build_fingerprint(portfolio_stocks, account_info, prices)
+            material, reason = check_materiality(fingerprint)
+            if not material:
+                record_skipped()
+                log_info(f"Nothing material changed since the last evaluated cycle ({reason}), skipping enrichment and AI-based decision-making...")
+                return {}
+            log_info(f"Cycle is material: {reason}")
+        except Exception as e:
+            fingerprint = None
+            log_error(f"Error checking cycle materiality: {e}")
+    evaluation_started_at = time.time()
+
     log_info("Prepare portfolio stocks for AI analysis...")
     portfolio_overview = {}
     for symbol, stock_data in portfolio_stocks.items():
@@ -261,27 +332,18 @@ def trading_bot():
         portfolio_overview[symbol] = enrich_with_analyst_ratings(portfolio_overview[symbol], symbol)
 
     log_info("Getting watchlist stocks...")
-    watchlist_stocks = []
-    for watchlist_name in WATCHLIST_NAMES:
-        try:
-            new_stocks = get_watchlist_stocks(watchlist_name)
-            log_debug(f"Found {len(new_stocks)} stocks in watchlist {watchlist_name}")
-            watchlist_stocks.extend(new_stocks)
-            # Remove duplicates while preserving order
-            seen = set()
-            watchlist_stocks = [x for x in watchlist_stocks if not (x['symbol'] in seen or seen.add(x['symbol']))]
-        except Exception as e:
-            log_error(f"Error getting watchlist stocks for {watchlist_name}: {e}")
+    try:
+        watchlist_size = len(get_watchlist_index()["symbols"])
+    except Exception as e:
+        log_error(f"Error getting watchlist stocks: {e}")
+        watchlist_size = 0
 
-    log_debug(f"Total watchlist stocks found: {len(watchlist_stocks)}")
+    log_debug(f"Total watchlist stocks found: {watchlist_size}")
 
     watchlist_overview = {}
-    if len(watchlist_stocks) > 0:
-        log_debug(f"Limiting watchlist stocks to overview limit of {WATCHLIST_OVERVIEW_LIMIT}...")
-        watchlist_stocks = limit_watchlist_stocks(watchlist_stocks, WATCHLIST_OVERVIEW_LIMIT)
-
-        log_debug(f"Removing stocks with active positions from watchlist...")
-        watchlist_stocks = [stock for stock in watchlist_stocks if not portfolio_stocks.get(stock['symbol']) or portfolio_stocks[stock['symbol']]['quantity'] == 0]
+    if watchlist_size > 0:
+        log_debug(f"Selecting watchlist stocks by priority up to overview limit of {WATCHLIST_OVERVIEW_LIMIT}, excluding active positions...")
+        watchlist_stocks = limit_watchlist_stocks(ranked_symbols, prices)
 
         log_info(f"Watchlist stocks to proceed: {', '.join([stock['symbol'] for stock in watchlist_stocks])}")
 
@@ -294,8 +356,43 @@ def trading_bot():
 
     if len(portfolio_overview) == 0 and len(watchlist_overview) == 0:
         log_warning("No stocks to analyze, skipping AI-based decision-making...")
+        if fingerprint:
+            record_evaluated(fingerprint, time.time() - evaluation_started_at)
         return {}
 
+    log_debug(f"Data gathering took {time.time() - gathering_started_at:.2f}s")
+
+    # The AI and order stages mostly wait on the network; use that time to warm the next cycle's data
+    if PREFETCH_ENABLED:
+        start_prefetch([symbol for symbol, stock in portfolio_stocks.items() if stock['quantity'] != 0])
+
+    archive_symbols("portfolio_overview", portfolio_overview)
+    archive_symbols("watchlist_overview", watchlist_overview)
+
+    if TRIAGE_ENABLED:
+        log_info(f"Triaging {len(portfolio_overview) + len(watchlist_overview)} stocks with {TRIAGE_MODEL_NAME}...")
+        flagged_symbols = triage_symbols(portfolio_overview, watchlist_overview)
+        # Unflagged holdings stay in the prompt as a compact line: position sizing needs the whole portfolio
+        portfolio_overview = {
+            symbol: data if symbol in flagged_symbols else compact_holding(data)
+            for symbol, data in portfolio_overview.items()
+        }
+        watchlist_overview = {symbol: data for symbol, data in watchlist_overview.items() if symbol in flagged_symbols}
+        log_info(f"Stocks flagged for review: {', '.join(sorted(flagged_symbols)) if flagged_symbols else 'None'}")
+        if not flagged_symbols:
+            log_info("Triage found nothing to review, skipping AI-based decision-making...")
+            if fingerprint:
+                record_evaluated(fingerprint, time.time() - evaluation_started_at)
+            return {}
+
+    risk_summary = None
+    if RISK_SUMMARY_ENABLED:
+        try:
+            risk_summary = get_risk_summary(portfolio_stocks, list(watchlist_overview))
+            archive_record("input", "risk_summary", risk_summary)
+        except Exception as e:
+            log_error(f"Error computing portfolio risk: {e}")
+
     decisions_data = []
     trading_results = {}
     post_decisions_adjustment_count = 0
@@ -303,15 +400,38 @@ def trading_bot():
     try:
         log_info("Making AI-based decision...")
         buying_power = get_buying_power()
-        decisions_data = make_ai_decisions(buying_power, portfolio_overview, watchlist_overview)
+        decisions_data = make_ai_decisions(buying_power, portfolio_overview, watchlist_overview, risk_summary)
     except Exception as e:
         log_error(f"Error making AI-based decision: {e}")
+        # Don't let the gate skip the next cycle when this one never got a decision
+        fingerprint = None
 
 
+    replanning_deferred = False
     while len(decisions_data) > 0:
+        archive_record("decisions", f"round {post_decisions_adjustment_count}{' deferred buys' if replanning_deferred else ''}", decisions_data)
         log_debug(f"Total decisions: {len(decisions_data)}")
         log_debug(f"Decisions:{chr(10)}{json.dumps(decisions_data, indent=1)}")
 
+        snapshot = None
+        plan_feasible = True
+        deferred_buys = []
+        sell_order_ids = []
+        try:
+            snapshot = take_snapshot()
+            plan = solve_allocation(decisions_data, snapshot)
+            decisions_data = plan['decisions']
+            deferred_buys = plan['deferred']
+            plan_feasible = plan['feasible']
+            log_debug(f"Allocation plan: {len(plan['decisions'])} trades, {len(deferred_buys)} deferred until sells fill, {len(plan['rejected'])} rejected, ${plan['buying_power']:.2f} buying power left")
+            for rejection in plan['rejected']:
+                symbol = rejection['symbol']
+                details = f"{rejection['reason']}: {rejection['details']}"
+                trading_results[symbol] = {"symbol": symbol, "amount": rejection['amount'], "decision": rejection['decision'], "result": "rejected", "details": details}
+                log_warning(f"{symbol} > Decision rejected before submission: {details}")
+        except Exception as e:
+            log_error(f"Error validating decisions: {e}")
+
         log_info("Executing decisions...")
         for decision_data in decisions_data:
             symbol = decision_data['symbol']
@@ -326,7 +446,7 @@ def trading_bot():
 
             if decision == "sell":
                 try:
-                    sell_resp = sell_stock(symbol, amount)
+                    sell_resp = sell_stock(symbol, amount, snapshot=snapshot)
                     if sell_resp and 'id' in sell_resp:
                         if sell_resp['id'] == "demo":
                             trading_results[symbol] = {"symbol": symbol, "amount": amount, "decision": "sell", "result": "success", "details": "Demo mode"}
@@ -337,7 +457,9 @@ def trading_bot():
                         else:
                             details = extract_sell_response_data(sell_resp)
                             trading_results[symbol] = {"symbol": symbol, "amount": amount, "decision": "sell", "result": "success", "details": details}
-                            log_trade_to_db(symbol, "sell", amount)
+                            log_trade_to_db(symbol, "sell", amount, order_id=sell_resp['id'])
+                            track_order(sell_resp['id'], symbol, "sell", amount)
+                            sell_order_ids.append(sell_resp['id'])
                             log_info(f"{symbol} > Sold ${amount:.2f}")
                     elif sell_resp and 'error' in sell_resp:
                         trading_results[symbol] = {"symbol": symbol, "amount": amount, "decision": "sell", "result": "error", "details": sell_resp['error']}
@@ -363,7 +485,8 @@ def trading_bot():
                         else:
                             details = extract_buy_response_data(buy_resp)
                             trading_results[symbol] = {"symbol": symbol, "amount": amount, "decision": "buy", "result": "success", "details": details}
-                            log_trade_to_db(symbol, "buy", amount)
+                            log_trade_to_db(symbol, "buy", amount, order_id=buy_resp['id'])
+                            track_order(buy_resp['id'], symbol, "buy", amount)
                             log_info(f"{symbol} > Bought ${amount:.2f}")
                     elif buy_resp and 'error' in buy_resp:
                         trading_results[symbol] = {"symbol": symbol, "amount": amount, "decision": "buy", "result": "error", "details": buy_resp['error']}
@@ -376,10 +499,33 @@ def trading_bot():
                     trading_results[symbol] = {"symbol": symbol, "amount": amount, "decision": "buy", "result": "error", "details": str(e)}
                     log_error(f"{symbol} > Error buying: {e}")
 
+        # Buys funded by this round's sells are planned again once the sells have filled
+        replanning_deferred = False
+        if deferred_buys:
+            log_info(f"Waiting up to {ALLOCATION_SELL_FILL_WAIT_SECONDS}s for {len(sell_order_ids)} sells to fill before buying {', '.join(buy['symbol'] for buy in deferred_buys)}...")
+            fills = wait_for_orders(sell_order_ids, ALLOCATION_SELL_FILL_WAIT_SECONDS) if sell_order_ids else {}
+            if sell_order_ids and len(fills) == len(sell_order_ids):
+                decisions_data = deferred_buys
+                replanning_deferred = True
+                continue
+            for buy in deferred_buys:
+                symbol = buy['symbol']
+                details = "sells_not_filled: The sells funding this buy did not fill in time"
+                trading_results[symbol] = {"symbol": symbol, "amount": buy['amount'], "decision": "buy", "result": "rejected", "details": details}
+                log_warning(f"{symbol} > Deferred buy dropped: {details}")
+
         if (MAX_POST_DECISIONS_ADJUSTMENTS is False
                 or post_decisions_adjustment_count >= MAX_POST_DECISIONS_ADJUSTMENTS):
             break
 
+        # The allocation solver already resolved what it could locally; only an infeasible
+        # plan or broker errors need another AI round
+        submission_errors = [decision_data['symbol'] for decision_data in decisions_data
+                             if trading_results.get(decision_data['symbol'], {}).get('result') == "error"]
+        if plan_feasible and not submission_errors:
+            log_debug("Allocation plan was feasible and submitted without errors, skipping post-decision adjustment")
+            break
+
         try:
             post_decisions_adjustment_count += 1
             log_info(f"Making AI-based post-decision analysis, attempt: {post_decisions_adjustment_count}/{MAX_POST_DECISIONS_ADJUSTMENTS}...")
@@ -390,46 +536,113 @@ def trading_bot():
             log_error(f"Error making post-decision analysis: {e}")
             break
 
+    archive_record("results", "trading_results", trading_results)
+    if fingerprint:
+        record_evaluated(fingerprint, time.time() - evaluation_started_at)
     return trading_results
 
 
+# Log a summary of the trading results
+def log_trading_results(trading_results):
+    sold_stocks = [f"{result['symbol']} ({result['amount']:.2f})" for result in trading_results.values() if result['decision'] == "sell" and result['result'] == "success"]
+    bought_stocks = [f"{result['symbol']} ({result['amount']:.2f})" for result in trading_results.values() if result['decision'] == "buy" and result['result'] == "success"]
+    errors = [f"{result['symbol']} ({result['details']})" for result in trading_results.values() if result['result'] == "error"]
+    rejected = [f"{result['symbol']} ({result['details']})" for result in trading_results.values() if result['result'] == "rejected"]
+    log_info(f"Sold: {'None' if len(sold_stocks) == 0 else ', '.join(sold_stocks)}")
+    log_info(f"Bought: {'None' if len(bought_stocks) == 0 else ', '.join(bought_stocks)}")
+    log_info(f"Errors: {'None' if len(errors) == 0 else ', '.join(errors)}")
+    log_info(f"Rejected: {'None' if len(rejected) == 0 else ', '.join(rejected)}")
+
+
+def log_materiality_stats():
+    stats = get_skip_stats()
+    log_info(f"Materiality gate: skipped {stats['skipped']} of {stats['evaluated'] + stats['skipped']} cycles ({stats['skip_ratio']:.0%}), saved ~{stats['estimated_seconds_saved']}s of enrichment and AI calls")
+
+
+def log_ai_usage():
+    for model, totals in get_usage_totals().items():
+        log_debug(f"AI usage {model}: {totals.get('requests', 0)} requests, {totals.get('prompt_tokens', 0)} prompt tokens ({totals.get('cached_tokens', 0)} cached), {totals.get('completion_tokens', 0)} completion tokens, {totals.get('seconds', 0):.1f}s")
+
+
+def log_fetch_stats():
+    for source, stats in get_fetch_stats().items():
+        latency = f"p50 {stats['p50']}s, p95 {stats['p95']}s, p99 {stats['p99']}s" if 'p50' in stats else "no successful calls"
+        counters = ', '.join(f"{name} {value}" for name, value in stats.items() if name not in ('p50', 'p95', 'p99', 'circuit_open'))
+        log_debug(f"Fetch {source}: {latency} ({counters}){' - circuit open' if stats['circuit_open'] else ''}")
+
+
+# Get the number of seconds to wait before the next run
+def get_run_interval_seconds(market_status):
+    max_interval_seconds = EVENT_MAX_INTERVAL_SECONDS if SCHEDULER_MODE == "event" else RUN_INTERVAL_SECONDS
+    if BYPASS_MARKET_HOURS:
+        return max_interval_seconds
+
+    try:
+        # Wake up exactly at the close or at the next open rather than polling
+        seconds_until_boundary = seconds_until_next_boundary()
+    except Exception as e:
+        log_error(f"Error computing next market boundary: {e}")
+        return max_interval_seconds
+
+    if market_status:
+        return max(1, min(max_interval_seconds, int(seconds_until_boundary) + 1))
+    return max(1, int(seconds_until_boundary) + 1)
+
+
 # Run trading bot in a loop
 def main():
+    if CASSETTE_MODE == "replay":
+        # A replayed cycle would persist its rotation state and journal and track its orders
+        raise Exception('CASSETTE_MODE = "replay" is not supported in the main loop, use python cassette.py replay <cassette>')
+    if RISK_EXITS_ENABLED:
+        log_info(f"Starting risk exits, checking positions every {RISK_EXIT_POLL_SECONDS} seconds...")
+        start_risk_exits(_cycle_lock)
+
     while True:
+        cycle_started_at = time.time()
+        market_status = False
         try:
             market_status = is_market_open()
             log_info(f"Market status check returned: {market_status}")
-            
+
             if market_status:
-                run_interval_seconds = RUN_INTERVAL_SECONDS
                 log_info(f"Market is open, running trading bot in {'paper' if PAPER_TRADING else 'live'} trading mode...")
 
-                trading_results = trading_bot()
-
-                sold_stocks = [f"{result['symbol']} ({result['amount']:.2f})" for result in trading_results.values() if result['decision'] == "sell" and result['result'] == "success"]
-                bought_stocks = [f"{result['symbol']} ({result['amount']:.2f})" for result in trading_results.values() if result['decision'] == "buy" and result['result'] == "success"]
-                errors = [f"{result['symbol']} ({result['details']})" for result in trading_results.values() if result['result'] == "error"]
-                log_info(f"Sold: {'None' if len(sold_stocks) == 0 else ', '.join(sold_stocks)}")
-                log_info(f"Bought: {'None' if len(bought_stocks) == 0 else ', '.join(bought_stocks)}")
-                log_info(f"Errors: {'None' if len(errors) == 0 else ', '.join(errors)}")
+                with _cycle_lock, cassette_cycle(), archive_cycle():
+                    trading_results = profile_cycle(trading_bot)
+                if WARMUP_ENABLED:
+                    report_first_cycle(time.time() - cycle_started_at)
+                log_trading_results(trading_results)
+                if MATERIALITY_GATE_ENABLED:
+                    log_materiality_stats()
+                log_fetch_stats()
+                log_ai_usage()
             else:
-                run_interval_seconds = RUN_INTERVAL_SECONDS
-                log_info(f"Market is closed, running trading bot in {'paper' if PAPER_TRADING else 'live'} trading mode...")
-
-                trading_results = trading_bot()
-
-                sold_stocks = [f"{result['symbol']} ({result['amount']:.2f})" for result in trading_results.values() if result['decision'] == "sell" and result['result'] == "success"]
-                bought_stocks = [f"{result['symbol']} ({result['amount']:.2f})" for result in trading_results.values() if result['decision'] == "buy" and result['result'] == "success"]
-                errors = [f"{result['symbol']} ({result['details']})" for result in trading_results.values() if result['result'] == "error"]
-                log_info(f"Sold: {'None' if len(sold_stocks) == 0 else ', '.join(sold_stocks)}")
-                log_info(f"Bought: {'None' if len(bought_stocks) == 0 else ', '.join(bought_stocks)}")
-                log_info(f"Errors: {'None' if len(errors) == 0 else ', '.join(errors)}")
-                # run_interval_seconds = 60
-                # log_info("Market is closed, waiting for next run...")
+                log_info("Market is closed, waiting for next open...")
+
+            run_interval_seconds = get_run_interval_seconds(market_status)
         except Exception as e:
             run_interval_seconds = 60
             log_error(f"Trading bot error: {e}")
 
+        if SCHEDULER_MODE == "event" and market_status:
+            log_info(f"Watching prices for up to {run_interval_seconds} seconds...")
+            try:
+                wait_for_next_cycle(get_watchlist_symbols(), cycle_started_at, run_interval_seconds)
+                continue
+            except Exception as e:
+                run_interval_seconds = 60
+                log_error(f"Price watch error: {e}")
+
+        if PREFETCH_ENABLED and market_status:
+            schedule_quote_refresh(run_interval_seconds)
+
+        if WARMUP_ENABLED and not market_status:
+            try:
+                run_interval_seconds = wait_for_warmup(run_interval_seconds)
+            except Exception as e:
+                log_error(f"Warm-up error: {e}")
+
         log_info(f"Waiting for {run_interval_seconds} seconds...")
         time.sleep(run_interval_seconds)
 
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from config import MARKET_CALENDAR_FILE, MARKET_CALENDAR_DAYS_AHEAD
+from lazy_imports import lazy_module
+from log_utils.log import log_debug, log_warning
+
+pytz = lazy_module("pytz")
+
+MARKET_TIMEZONE_NAME = "America/New_York"
+
+# Trading sessions as sorted (open_ts, close_ts) epoch-second pairs, plus the
+# date range they were fetched for. Filled from disk or Alpaca on first use.
+_calendar = {
+    "start": None,
+    "end": None,
+    "sessions": [],
+    "opens": [],
+}
+
+
+def _session_to_epoch(session_date, hhmm):
+    """
+    Convert a calendar date and an "HH:MM" market-local time to epoch seconds.
+    """
+    local = datetime.strptime(f"{session_date} {hhmm}", "%Y-%m-%d %H:%M")
+    return pytz.timezone(MARKET_TIMEZONE_NAME).localize(local).timestamp()
+
+
+def _set_sessions(start, end, days):
+    """
+    Replace the in-memory calendar with the given list of trading days.
+    """
+    sessions = sorted(
+        (_session_to_epoch(day["date"], day["open"]), _session_to_epoch(day["date"], day["close"]))
+        for day in days
+    )
+    _calendar["start"] = start
+    _calendar["end"] = end
+    _calendar["sessions"] = sessions
+    _calendar["opens"] = [session[0] for session in sessions]
+
+
+def _load_calendar_file():
+    """
+    Load the cached calendar from disk. Returns False if it's missing or unreadable.
+    """
+    if not os.path.exists(MARKET_CALENDAR_FILE):
+        return False
+    try:
+        with open(MARKET_CALENDAR_FILE, "r") as file:
+            cached = json.load(file)
+        _set_sessions(
+            date.fromisoformat(cached["start"]),
+            date.fromisoformat(cached["end"]),
+            cached["days"],
+        )
+        return True
+    except Exception as e:
+        log_warning(f"Ignoring unreadable market calendar cache {MARKET_CALENDAR_FILE}: {e}")
+        return False
+
+
+def _fetch_calendar(start, end):
+    """
+    Fetch trading days for [start, end] from Alpaca and persist them to disk.
+    """
+    from alpaca.trading.requests import GetCalendarRequest
+    from alpacaFunctions import get_trading_client
+
+    calendar = get_trading_client().get_calendar(filters=GetCalendarRequest(start=start, end=end))
+    days = [
+        {
+            "date": day.date.isoformat(),
+            "open": day.open.strftime("%H:%M"),
+            "close": day.close.strftime("%H:%M"),
+        }
+        for day in calendar
+    ]
+    with open(MARKET_CALENDAR_FILE, "w") as file:
+        json.dump({"start": start.isoformat(), "end": end.isoformat(), "days": days}, file)
+    _set_sessions(start, end, days)
+    log_debug(f"Fetched market calendar {start} - {end} ({len(days)} trading days)")
+
+
+def _ensure_calendar(now):
+    """
+    Make sure the cached calendar covers today and at least the following week,
+    refetching from Alpaca only when it doesn't.
+    """
+    today = datetime.fromtimestamp(now, pytz.timezone(MARKET_TIMEZONE_NAME)).date()
+    if _calendar["start"] is None:
+        _load_calendar_file()
+    if (_calendar["start"] is not None
+            and _calendar["start"] <= today
+            and _calendar["end"] >= today + timedelta(days=7)):
+        return
+    _fetch_calendar(today - timedelta(days=7), today + timedelta(days=MARKET_CALENDAR_DAYS_AHEAD))
+
+
+def _current_or_next_session(now):
+    """
+    Return the session containing `now`, or else the next one to open.
+    """
+    index = bisect_right(_calendar["opens"], now) - 1
+    if index >= 0 and now < _calendar["sessions"][index][1]:
+        return _calendar["sessions"][index]
+    if index + 1 < len(_calendar["sessions"]):
+        return _calendar["sessions"][index + 1]
+    return None
+
+
+def get_market_session(now=None):
+    """
+    Return (is_open, next_open, next_close) as epoch seconds for the given time,
+    computed from the cached calendar without an API call.
+    """
+    now = time.time() if now is None else now
+    _ensure_calendar(now)
+    session = _current_or_next_session(now)
+    if session is None:
+        raise Exception("Market calendar has no upcoming sessions")
+    open_ts, close_ts = session
+    if open_ts <= now < close_ts:
+        following = _current_or_next_session(close_ts)
+        return True, (following[0] if following else None), close_ts
+    return False, open_ts, close_ts
+
+
+def is_market_open_at(now=None):
+    """
+    Check if the market is open at the given time (defaults to now).
+    """
+    return get_market_session(now)[0]
+
+
+def seconds_until_next_boundary(now=None):
+    """
+    Seconds until the market next changes state: the close if it's open,
+    otherwise the next open.
+    """
+    now = time.time() if now is None else now
+    is_open, next_open, next_close = get_market_session(now)
+    boundary = next_close if is_open else next_open
+    return max(0, boundary - now)
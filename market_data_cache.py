@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import (
+    MARKET_DATA_CACHE_ENABLED, MARKET_DATA_CACHE_DB, MARKET_DATA_CACHE_MAX_AGE,
+    MARKET_DATA_MEMORY_CACHE_MAX_ENTRIES, PREFETCH_ENABLED, WARMUP_ENABLED, SCHEDULER_MODE
+)
+from log_utils.log import log_error
+
+# One connection per process; SQLite in WAL mode lets any number of bot processes
+# read while the shared fetcher writes
+_conn = None
+
+# In-process tier: (kind, key) -> (fetched_at, JSON value), least recently used
+# first. Lets data fetched ahead of time (prefetch, warm-up, the event scheduler's
+# price watch) be reused by the same process without sharing it; on only when one
+# of those or the shared cache is enabled
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def is_memory_tier_enabled():
+    """
+    Return whether fetched market data is cached in this process at all.
+    """
+    return PREFETCH_ENABLED or WARMUP_ENABLED or SCHEDULER_MODE == "event" or MARKET_DATA_CACHE_ENABLED
+
+
+def _get_connection():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(MARKET_DATA_CACHE_DB, timeout=10, isolation_level=None)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute('''
+        CREATE TABLE IF NOT EXISTS market_data (
+            kind TEXT,
+            key TEXT,
+            fetched_at REAL,
+            value TEXT,
+            PRIMARY KEY (kind, key)
+        )
+        ''')
+    return _conn
+
+
+def cache_get(kind, key, max_age_seconds=None):
+    """
+    Return the cached value for (kind, key) if it is newer than max_age_seconds
+    (defaults to MARKET_DATA_CACHE_MAX_AGE[kind]), otherwise None. Checks this
+    process first, then the shared SQLite cache when enabled. Always None when
+    the in-process tier is off (see is_memory_tier_enabled).
+    """
+    if max_age_seconds is None:
+        max_age_seconds = MARKET_DATA_CACHE_MAX_AGE[kind]
+    if not is_memory_tier_enabled():
+        return None
+    with _memory_lock:
+        cached = _memory.get((kind, key))
+        if cached:
+            _memory.move_to_end((kind, key))
+    if cached and cached[0] >= time.time() - max_age_seconds:
+        return json.loads(cached[1])
+    if not MARKET_DATA_CACHE_ENABLED:
+        return None
+    try:
+        row = _get_connection().execute(
+            "SELECT value FROM market_data WHERE kind = ? AND key = ? AND fetched_at >= ?",
+            (kind, key, time.time() - max_age_seconds)
+        ).fetchone()
+    except sqlite3.Error as e:
+        log_error(f"Market data cache read error: {e}")
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def cache_put_many(kind, values):
+    """
+    Store a {key: value} mapping of JSON-serializable values in one transaction.
+    """
+    if not values or not is_memory_tier_enabled():
+        return
+    fetched_at = time.time()
+    rows = [(kind, key, fetched_at, json.dumps(value, default=str)) for key, value in values.items()]
+    with _memory_lock:
+        for row in rows:
+            _memory[(kind, row[1])] = (fetched_at, row[3])
+            _memory.move_to_end((kind, row[1]))
+        while len(_memory) > MARKET_DATA_MEMORY_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+    if not MARKET_DATA_CACHE_ENABLED:
+        return
+    try:
+        conn = _get_connection()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO market_data (kind, key, fetched_at, value) VALUES (?, ?, ?, ?)",
+                rows
+            )
+    except sqlite3.Error as e:
+        log_error(f"Market data cache write error: {e}")
+
+
+def cache_put(kind, key, value):
+    """
+    Store a single JSON-serializable value.
+    """
+    cache_put_many(kind, {key: value})
+
@@ -0,0 +1,270 @@
+"""
+Pluggable market data providers. Every provider answers the same batched
+questions (latest quotes, daily bars, snapshots) for a list of symbols and returns
+the typed records below, so callers don't care where prices come from:
+
+    yfinance - Yahoo Finance via yf.download (default)
+    alpaca   - Alpaca's StockHistoricalDataClient (multi-symbol bars/trades/snapshots)
+    fixture  - a local JSON file, for tests and offline runs
+
+Select one with MARKET_DATA_PROVIDER in config.py.
+"""
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from config import (
+    MARKET_DATA_PROVIDER, MARKET_DATA_FIXTURE_FILE, ALPACA_DATA_FEED,
+    ALPACA_API_KEY, ALPACA_SECRET_KEY, FETCH_SOURCES
+)
+from lazy_imports import lazy_module
+
+yf = lazy_module("yfinance")
+pd = lazy_module("pandas")
+
+# Calendar days covered by the yfinance-style period strings callers use
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731}
+
+
+@dataclass(frozen=True)
+class Quote:
+    symbol: str
+    price: float
+    volume: float           # Volume of the latest intraday bar
+    avg_volume: float       # Average intraday bar volume today
+    timestamp: float        # Epoch seconds of the latest trade/bar
+
+
+@dataclass(frozen=True)
+class Bar:
+    timestamp: float        # Epoch seconds of the bar's open
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    symbol: str
+    price: float
+    previous_close: float
+    day_open: float
+    day_high: float
+    day_low: float
+    day_volume: float
+    timestamp: float
+
+
+def _bars_from_frame(frame):
+    """
+    Convert a yfinance OHLCV DataFrame into a list of Bars, skipping empty rows.
+    """
+    frame = frame.dropna(subset=["Close"])
+    return [
+        Bar(
+            timestamp=index.timestamp(),
+            open=float(row["Open"]), high=float(row["High"]), low=float(row["Low"]),
+            close=float(row["Close"]), volume=float(row["Volume"]),
+        )
+        for index, row in frame.iterrows()
+    ]
+
+
+def _snapshots_from_bars(daily_bars, quotes):
+    """
+    Build snapshots from each symbol's last two daily bars plus its latest quote.
+    """
+    snapshots = {}
+    for symbol, bars in daily_bars.items():
+        if not bars:
+            continue
+        today = bars[-1]
+        quote = quotes.get(symbol)
+        snapshots[symbol] = Snapshot(
+            symbol=symbol,
+            price=quote.price if quote else today.close,
+            previous_close=bars[-2].close if len(bars) >= 2 else today.open,
+            day_open=today.open, day_high=today.high, day_low=today.low,
+            day_volume=today.volume,
+            timestamp=quote.timestamp if quote else today.timestamp,
+        )
+    return snapshots
+
+
+###############################################################################
+# YFINANCE
+###############################################################################
+class YFinanceProvider:
+    name = "yfinance"
+
+    def _download(self, symbols, source, **kwargs):
+        # Bounded by the source's fetch budget, so attempts abandoned by deadline_fetch end too
+        data = yf.download(sorted(symbols), group_by="ticker", progress=False, threads=True,
+                           auto_adjust=False, timeout=FETCH_SOURCES[source]["budget_seconds"], **kwargs)
+        frames = {}
+        for symbol in symbols:
+            try:
+                frames[symbol] = data[symbol] if isinstance(data.columns, pd.MultiIndex) else data
+            except KeyError:
+                continue
+        return frames
+
+    def get_quotes(self, symbols):
+        quotes = {}
+        for symbol, frame in self._download(symbols, "market_data_quotes", period="1d", interval="5m").items():
+            bars = _bars_from_frame(frame)
+            if not bars:
+                continue
+            quotes[symbol] = Quote(
+                symbol=symbol, price=bars[-1].close, volume=bars[-1].volume,
+                avg_volume=sum(bar.volume for bar in bars) / len(bars),
+                timestamp=bars[-1].timestamp,
+            )
+        return quotes
+
+    def get_bars(self, symbols, period="1mo"):
+        bars = {}
+        for symbol, frame in self._download(symbols, "market_data_bars", period=period, interval="1d").items():
+            symbol_bars = _bars_from_frame(frame)
+            if symbol_bars:
+                bars[symbol] = symbol_bars
+        return bars
+
+    def get_snapshots(self, symbols):
+        return _snapshots_from_bars(self.get_bars(symbols, period="5d"), self.get_quotes(symbols))
+
+
+###############################################################################
+# ALPACA MARKET DATA
+###############################################################################
+class AlpacaProvider:
+    name = "alpaca"
+
+    def __init__(self):
+        from alpaca.data.historical import StockHistoricalDataClient
+        self.client = StockHistoricalDataClient(ALPACA_API_KEY, ALPACA_SECRET_KEY)
+
+    def _bar(self, bar):
+        return Bar(
+            timestamp=bar.timestamp.timestamp(), open=float(bar.open), high=float(bar.high),
+            low=float(bar.low), close=float(bar.close), volume=float(bar.volume),
+        )
+
+    def get_quotes(self, symbols):
+        from alpaca.data.requests import StockSnapshotRequest
+
+        snapshots = self.client.get_stock_snapshot(
+            StockSnapshotRequest(symbol_or_symbols=sorted(symbols), feed=ALPACA_DATA_FEED)
+        )
+        quotes = {}
+        for symbol, snapshot in snapshots.items():
+            if snapshot is None or snapshot.latest_trade is None:
+                continue
+            minute_volume = float(snapshot.minute_bar.volume) if snapshot.minute_bar else 0.0
+            avg_volume = minute_volume
+            if snapshot.daily_bar and snapshot.minute_bar:
+                minutes = max(1.0, (snapshot.minute_bar.timestamp - snapshot.daily_bar.timestamp).total_seconds() / 60)
+                avg_volume = float(snapshot.daily_bar.volume) / minutes
+            quotes[symbol] = Quote(
+                symbol=symbol, price=float(snapshot.latest_trade.price),
+                volume=minute_volume, avg_volume=avg_volume,
+                timestamp=snapshot.latest_trade.timestamp.timestamp(),
+            )
+        return quotes
+
+    def get_bars(self, symbols, period="1mo"):
+        from alpaca.data.requests import StockBarsRequest
+        from alpaca.data.timeframe import TimeFrame
+
+        start = datetime.now(timezone.utc) - timedelta(days=PERIOD_DAYS[period])
+        bar_set = self.client.get_stock_bars(StockBarsRequest(
+            symbol_or_symbols=sorted(symbols), timeframe=TimeFrame.Day,
+            start=start, feed=ALPACA_DATA_FEED
+        ))
+        return {symbol: [self._bar(bar) for bar in bars] for symbol, bars in bar_set.data.items() if bars}
+
+    def get_snapshots(self, symbols):
+        from alpaca.data.requests import StockSnapshotRequest
+
+        snapshots = self.client.get_stock_snapshot(
+            StockSnapshotRequest(symbol_or_symbols=sorted(symbols), feed=ALPACA_DATA_FEED)
+        )
+        result = {}
+        for symbol, snapshot in snapshots.items():
+            if snapshot is None or snapshot.daily_bar is None:
+                continue
+            daily_bar = snapshot.daily_bar
+            result[symbol] = Snapshot(
+                symbol=symbol,
+                price=float(snapshot.latest_trade.price) if snapshot.latest_trade else float(daily_bar.close),
+                previous_close=float(snapshot.previous_daily_bar.close) if snapshot.previous_daily_bar else float(daily_bar.open),
+                day_open=float(daily_bar.open), day_high=float(daily_bar.high), day_low=float(daily_bar.low),
+                day_volume=float(daily_bar.volume),
+                timestamp=(snapshot.latest_trade or daily_bar).timestamp.timestamp(),
+            )
+        return result
+
+
+###############################################################################
+# FIXTURE
+###############################################################################
+class FixtureProvider:
+    """
+    Serves data from a JSON file shaped like:
+        {"quotes": {"AAPL": {"price": 190.1, "volume": 1200, "avg_volume": 1000}},
+         "bars": {"AAPL": [{"timestamp": 1700000000, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}]}}
+    Bars must be oldest first.
+    """
+    name = "fixture"
+
+    def __init__(self, path=MARKET_DATA_FIXTURE_FILE):
+        with open(path, "r") as file:
+            self.data = json.load(file)
+
+    def get_quotes(self, symbols):
+        quotes = {}
+        for symbol in symbols:
+            quote = self.data.get("quotes", {}).get(symbol)
+            if quote:
+                quotes[symbol] = Quote(
+                    symbol=symbol, price=float(quote["price"]),
+                    volume=float(quote.get("volume", 0)), avg_volume=float(quote.get("avg_volume", 0)),
+                    timestamp=float(quote.get("timestamp", time.time())),
+                )
+        return quotes
+
+    def get_bars(self, symbols, period="1mo"):
+        # Fixtures are static, so the period selects a number of trading days rather than dates
+        num_bars = max(1, PERIOD_DAYS[period] * 252 // 366)
+        bars = {}
+        for symbol in symbols:
+            symbol_bars = [Bar(**bar) for bar in self.data.get("bars", {}).get(symbol, [])[-num_bars:]]
+            if symbol_bars:
+                bars[symbol] = symbol_bars
+        return bars
+
+    def get_snapshots(self, symbols):
+        return _snapshots_from_bars(self.get_bars(symbols, period="5d"), self.get_quotes(symbols))
+
+
+PROVIDERS = {
+    "yfinance": YFinanceProvider,
+    "alpaca": AlpacaProvider,
+    "fixture": FixtureProvider,
+}
+
+_provider = None
+
+
+def get_market_data_provider():
+    """
+    Return the provider selected by MARKET_DATA_PROVIDER, creating it on first use.
+    """
+    global _provider
+    if _provider is None:
+        if MARKET_DATA_PROVIDER not in PROVIDERS:
+            raise Exception(f"Unknown MARKET_DATA_PROVIDER '{MARKET_DATA_PROVIDER}', expected one of {', '.join(PROVIDERS)}")
+        _provider = PROVIDERS[MARKET_DATA_PROVIDER]()
+    return _provider
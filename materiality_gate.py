@@ -0,0 +1,116 @@
+"""
+Cycle-level materiality gate. Before enrichment and the AI call, the decision-relevant
+inputs (prices, positions, open orders, buying power) are reduced to a
+fingerprint and compared with the one of the last evaluated cycle. When nothing
+moved beyond the configured tolerances, the rest of the cycle is skipped.
+"""
+import hashlib
+import json
+import math
+import time
+from config import (
+    MATERIALITY_PRICE_MOVE_PCT, MATERIALITY_BUYING_POWER_USD, MATERIALITY_MAX_SKIP_SECONDS
+)
+
+# Fingerprint of the last evaluated cycle, and skip statistics since start
+_state = {
+    "last": None,
+    "last_evaluated_at": 0,
+    "evaluated": 0,
+    "skipped": 0,
+    "evaluated_seconds": 0.0,
+}
+
+
+def _price_bucket(price):
+    # Log-scale buckets one tolerance wide, so equal buckets mean a move of at most one tolerance
+    if not price or price <= 0:
+        return None
+    return math.floor(math.log(price) / math.log1p(MATERIALITY_PRICE_MOVE_PCT / 100))
+
+
+def build_fingerprint(portfolio_stocks, account_info, prices):
+    """
+    Return the cycle's decision-relevant inputs plus a digest of their bucketed
+    values, from the prices the cycle already fetched for its held and ranked
+    candidate symbols.
+    """
+    held_symbols = sorted(symbol for symbol, stock in portfolio_stocks.items() if stock['quantity'] != 0)
+    prices = {symbol: price for symbol, price in prices.items() if price}
+    for symbol in held_symbols:
+        prices.setdefault(symbol, portfolio_stocks[symbol]['price'])
+
+    fingerprint = {
+        "prices": prices,
+        "positions": {symbol: round(portfolio_stocks[symbol]['quantity'], 6) for symbol in held_symbols},
+        "open_orders": sorted(
+            (symbol, order['side'], order['status'], round(order['notional'], 2))
+            for symbol, order in account_info['open_orders'].items()
+        ),
+        "buying_power": account_info['buying_power'],
+    }
+    bucketed = {
+        **fingerprint,
+        "prices": {symbol: _price_bucket(price) for symbol, price in prices.items()},
+        "buying_power": math.floor(fingerprint["buying_power"] / MATERIALITY_BUYING_POWER_USD) if MATERIALITY_BUYING_POWER_USD else fingerprint["buying_power"],
+    }
+    fingerprint["digest"] = hashlib.sha1(json.dumps(bucketed, sort_keys=True, default=str).encode()).hexdigest()
+    return fingerprint
+
+
+def check_materiality(fingerprint):
+    """
+    Return (is_material, reason) for a fingerprint against the last evaluated one.
+    """
+    last = _state["last"]
+    if last is None:
+        return True, "first cycle"
+    if time.time() - _state["last_evaluated_at"] >= MATERIALITY_MAX_SKIP_SECONDS:
+        return True, f"not evaluated for {MATERIALITY_MAX_SKIP_SECONDS}s"
+    if fingerprint["digest"] == last["digest"]:
+        return False, "fingerprint unchanged"
+
+    if fingerprint["positions"] != last["positions"]:
+        return True, "positions changed"
+    if fingerprint["open_orders"] != last["open_orders"]:
+        return True, "open orders changed"
+    if abs(fingerprint["buying_power"] - last["buying_power"]) > MATERIALITY_BUYING_POWER_USD:
+        return True, f"buying power changed by ${fingerprint['buying_power'] - last['buying_power']:,.2f}"
+    for symbol, price in fingerprint["prices"].items():
+        last_price = last["prices"].get(symbol)
+        if not last_price:
+            # A candidate the rotation ranked since the last evaluation; only moves count
+            continue
+        move_pct = (price - last_price) / last_price * 100
+        if abs(move_pct) > MATERIALITY_PRICE_MOVE_PCT:
+            return True, f"{symbol} moved {move_pct:+.2f}%"
+    return False, "all changes within tolerances"
+
+
+def record_evaluated(fingerprint, seconds):
+    """
+    Make a fingerprint the baseline after a fully evaluated cycle that took `seconds`.
+    """
+    _state["last"] = fingerprint
+    _state["last_evaluated_at"] = time.time()
+    _state["evaluated"] += 1
+    _state["evaluated_seconds"] += seconds
+
+
+def record_skipped():
+    _state["skipped"] += 1
+
+
+def get_skip_stats():
+    """
+    Return cycle counts, the skip ratio and the estimated seconds saved (skipped
+    cycles times the average duration of an evaluated cycle).
+    """
+    total = _state["evaluated"] + _state["skipped"]
+    average_seconds = _state["evaluated_seconds"] / _state["evaluated"] if _state["evaluated"] else 0.0
+    return {
+        "evaluated": _state["evaluated"],
+        "skipped": _state["skipped"],
+        "skip_ratio": _state["skipped"] / total if total else 0.0,
+        "estimated_seconds_saved": round(_state["skipped"] * average_seconds, 1),
+    }
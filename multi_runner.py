@@ -0,0 +1,193 @@
+"""
+Runs several strategy profiles (config.STRATEGY_PROFILES) side by side. Each profile
+gets its own worker process, config overrides, Alpaca client, journal and rotation
+state, while this process runs a single shared fetcher that keeps the market data
+cache warm for the union of all profiles' symbols.
+
+Usage: python multi_runner.py
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+# Workers and the fetcher share market data through the SQLite cache, so it must be
+# enabled before any module copies the setting out of config
+import config
+config.MARKET_DATA_CACHE_ENABLED = True
+
+# main.py imports the log utilities as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_utils"))
+
+from log_utils.log import log_info, log_error, log_warning
+
+
+def get_profile_config(profile):
+    """
+    Resolve a profile into the full set of config overrides it runs with.
+    """
+    name = profile["name"]
+    overrides = {key: value for key, value in profile.items() if key != "name"}
+    paper_trading = overrides.get("PAPER_TRADING", config.PAPER_TRADING)
+    if "ALPACA_API_KEY" not in overrides:
+        overrides["ALPACA_API_KEY"] = overrides.get(
+            "ALPACA_PAPER_API_KEY" if paper_trading else "ALPACA_LIVE_API_KEY",
+            config.ALPACA_PAPER_API_KEY if paper_trading else config.ALPACA_LIVE_API_KEY
+        )
+    if "ALPACA_SECRET_KEY" not in overrides:
+        overrides["ALPACA_SECRET_KEY"] = overrides.get(
+            "ALPACA_PAPER_SECRET_KEY" if paper_trading else "ALPACA_LIVE_SECRET_KEY",
+            config.ALPACA_PAPER_SECRET_KEY if paper_trading else config.ALPACA_LIVE_SECRET_KEY
+        )
+    overrides.setdefault("ROTATION_STATE_FILE", f"rotation_state_{name}.json")
+    overrides.setdefault("RISK_HIGH_WATER_FILE", f"risk_high_water_{name}.json")
+    overrides.setdefault("JOURNAL_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_utils", f"trading_logs_{name}.db"))
+    overrides.setdefault("LOG_PREFIX", f"[{name}] ")
+    overrides["MARKET_DATA_CACHE_ENABLED"] = True
+    return overrides
+
+
+def run_profile(profile):
+    """
+    Worker process entry point: apply the profile's config overrides, then run the
+    regular bot loop.
+    """
+    import log_utils.log
+
+    overrides = get_profile_config(profile)
+    for key, value in overrides.items():
+        setattr(config, key, value)
+
+    # The logger was imported before the overrides were applied
+    log_utils.log.LOG_LEVEL = config.LOG_LEVEL
+    log_utils.log.LOG_PREFIX = config.LOG_PREFIX
+
+    import trading_logs
+    trading_logs.DB_PATH = overrides["JOURNAL_DB_PATH"]
+
+    import main
+    main.main()
+
+
+def get_profile_symbols(profile):
+    """
+    Return the watchlist and held symbols of a profile.
+    """
+    from alpaca.trading.client import TradingClient
+    from watchlist_index import get_watchlist_index
+
+    overrides = get_profile_config(profile)
+    names = overrides.get("WATCHLIST_NAMES", config.WATCHLIST_NAMES)
+    symbols = set(get_watchlist_index(names)["symbols"])
+    try:
+        client = TradingClient(
+            overrides["ALPACA_API_KEY"], overrides["ALPACA_SECRET_KEY"],
+            paper=overrides.get("PAPER_TRADING", config.PAPER_TRADING),
+            url_override=overrides.get("ALPACA_TRADING_URL_OVERRIDE", config.ALPACA_TRADING_URL_OVERRIDE)
+        )
+        symbols.update(position.symbol for position in client.get_all_positions())
+    except Exception as e:
+        log_error(f"Error getting positions for profile {profile['name']}: {e}")
+    return symbols
+
+
+# Shared memory segment published by the fetcher, recreated when the symbol set changes
+_segment = {"shm": None, "symbols": None}
+
+
+def publish_shared_segment(symbols, quotes, bars_by_symbol):
+    """
+    Publish quotes and daily closes to the shared memory segment.
+    """
+    from shm_market_data import create_segment, publish
+
+    if _segment["symbols"] != symbols:
+        if _segment["shm"] is not None:
+            _segment["shm"].close()
+        _segment["shm"] = create_segment(symbols)
+        _segment["symbols"] = symbols
+    publish(
+        _segment["shm"], quotes=quotes,
+        bars={symbol: bars["closes"] for symbol, bars in bars_by_symbol.items()}
+    )
+
+
+def prefetch_market_data(symbols):
+    """
+    Populate the shared cache (and shared memory segment, if enabled) with quotes,
+    daily bars and moving averages for all symbols using batched requests.
+    """
+    from alpacaFunctions import moving_averages_from_closes
+    from market_data_cache import cache_put_many
+    from yfinance_functions import get_batch_quotes, get_batch_daily_bars
+
+    quotes = get_batch_quotes(symbols)
+
+    # Daily history changes once a day; only expired symbols are downloaded again
+    bars_by_symbol = get_batch_daily_bars(symbols, period="1y")
+    cache_put_many("moving_averages", {
+        f"{symbol}:50:200": moving_averages_from_closes(bars["closes"])
+        for symbol, bars in bars_by_symbol.items()
+    })
+    cache_put_many("daily_bars", {
+        f"{symbol}:1mo": {"closes": bars["closes"][-21:], "volumes": bars["volumes"][-21:]}
+        for symbol, bars in bars_by_symbol.items()
+    })
+
+    if config.MARKET_DATA_SHM_ENABLED:
+        publish_shared_segment(symbols, quotes, bars_by_symbol)
+
+
+def run_shared_fetcher(profiles):
+    """
+    Refresh market data for the union of all profiles' symbols every
+    MARKET_DATA_FETCH_INTERVAL_SECONDS.
+    """
+    while True:
+        started_at = time.time()
+        try:
+            symbols = set()
+            for profile in profiles:
+                symbols.update(get_profile_symbols(profile))
+            prefetch_market_data(sorted(symbols))
+            log_info(f"Shared fetcher refreshed {len(symbols)} symbols for {len(profiles)} profiles in {time.time() - started_at:.1f}s")
+        except Exception as e:
+            log_error(f"Shared fetcher error: {e}")
+        time.sleep(max(0, config.MARKET_DATA_FETCH_INTERVAL_SECONDS - (time.time() - started_at)))
+
+
+def main():
+    profiles = config.STRATEGY_PROFILES
+    if not profiles:
+        log_warning("No STRATEGY_PROFILES configured, nothing to run")
+        return
+    names = [profile["name"] for profile in profiles]
+    if len(set(names)) != len(names):
+        raise Exception(f"Strategy profile names must be unique: {names}")
+
+    # Warm the cache once so the first cycle of every profile starts from it
+    symbols = set()
+    for profile in profiles:
+        symbols.update(get_profile_symbols(profile))
+    prefetch_market_data(sorted(symbols))
+
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for profile in profiles:
+        worker = context.Process(target=run_profile, args=(profile,), name=f"profile-{profile['name']}", daemon=True)
+        worker.start()
+        workers.append(worker)
+        log_info(f"Started profile {profile['name']} (pid {worker.pid})")
+
+    try:
+        run_shared_fetcher(profiles)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        if _segment["shm"] is not None:
+            _segment["shm"].close()
+            _segment["shm"].unlink()
+
+
+if __name__ == '__main__':
+    main()
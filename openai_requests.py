@@ -0,0 +1,91 @@
+"""
+OpenAI chat requests shared by the decision and triage tiers. Any
+OpenAI-compatible endpoint works (OPENAI_BASE_URL / TRIAGE_BASE_URL), including
+stub_openai_server.py for local runs. Every request logs its token usage and
+latency, and running totals are kept per model. Prompts and responses go to the
+cycle archive when it is enabled.
+"""
+import time
+from collections import Counter, defaultdict
+from config import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL_NAME, OPENAI_STREAM_RESPONSES
+from log import log_info
+from cycle_archive import archive_ai_exchange
+
+# OpenAI clients by (base_url, api_key), created on first use by get_openai_client()
+_openai_clients = {}
+
+# model -> requests/prompt_tokens/cached_tokens/completion_tokens/seconds
+_usage_totals = defaultdict(Counter)
+
+
+def get_openai_client(base_url=None, api_key=None):
+    """
+    Return the shared OpenAI client for an endpoint, initializing it on first use.
+    """
+    key = (base_url or OPENAI_BASE_URL, api_key or OPENAI_API_KEY)
+    if key not in _openai_clients:
+        from openai import OpenAI
+        _openai_clients[key] = OpenAI(base_url=key[0], api_key=key[1])
+    return _openai_clients[key]
+
+
+def make_ai_request(messages, label, model=None, base_url=None, api_key=None):
+    """
+    Send a chat request and return the response text, logging its token usage,
+    time to first token (when streaming) and total time.
+    """
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    model = model or OPENAI_MODEL_NAME
+    client = get_openai_client(base_url, api_key)
+
+    started_at = time.perf_counter()
+    first_token_at = None
+    usage = None
+    if OPENAI_STREAM_RESPONSES:
+        content = []
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                content.append(chunk.choices[0].delta.content)
+        content = "".join(content)
+    else:
+        ai_resp = client.chat.completions.create(
+            model=model,
+            messages=messages
+        )
+        usage = ai_resp.usage
+        content = ai_resp.choices[0].message.content
+    finished_at = time.perf_counter()
+
+    totals = _usage_totals[model]
+    totals["requests"] += 1
+    totals["seconds"] += finished_at - started_at
+    ttft = f"{first_token_at - started_at:.2f}s" if first_token_at else "n/a"
+    if usage:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        totals["prompt_tokens"] += usage.prompt_tokens
+        totals["cached_tokens"] += cached_tokens
+        totals["completion_tokens"] += usage.completion_tokens
+        log_info(f"AI {label} [{model}]: {usage.prompt_tokens} prompt tokens ({cached_tokens} cached), {usage.completion_tokens} completion tokens, TTFT {ttft}, total {finished_at - started_at:.2f}s")
+    else:
+        log_info(f"AI {label} [{model}]: TTFT {ttft}, total {finished_at - started_at:.2f}s")
+    archive_ai_exchange(label, model, messages, content)
+    return content
+
+
+def get_usage_totals():
+    """
+    Return the request count, token usage and seconds spent per model since start.
+    """
+    return {model: dict(totals) for model, totals in _usage_totals.items()}
@@ -0,0 +1,563 @@
+"""
+Local Alpaca-compatible paper exchange for load testing the order path without
+Alpaca paper's limits. Serves the trading REST endpoints the bot uses:
+
+    GET    /v2/account
+    GET    /v2/positions, /v2/positions/<symbol>
+    GET    /v2/orders (status, symbols, after, until, limit), /v2/orders/<id>
+    POST   /v2/orders (market orders by notional or qty)
+    DELETE /v2/orders/<id>
+    GET    /v2/clock, /v2/calendar
+
+Market orders fill --fill-delay-ms after submission at the stored price of the symbol
+(from --prices-file, shaped like the "fixture" market data provider's file, or a
+deterministic price for unknown symbols) plus --slippage-bps. Every request waits
+--latency-ms (+ up to --jitter-ms), fails with a 500 at --error-rate, and is
+limited to --rate-limit requests per minute like Alpaca (429 beyond it).
+
+Usage: python paper_exchange.py serve [--port 8090] [--latency-ms 50] [--rate-limit 200] ...
+       Then set ALPACA_TRADING_URL_OVERRIDE to http://127.0.0.1:8090.
+       python paper_exchange.py loadtest [--orders 500] [--concurrency 8] [--url URL]
+       Drives buy_stock/sell_stock/get_open_orders/get_account_info against an
+       in-process exchange (or --url) and reports orders/s and latency percentiles.
+       The in-process exchange takes the same options, without a rate limit by default.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+OPEN_STATUSES = {"new", "accepted", "pending_new", "partially_filled"}
+# Quantities below this are treated as zero (Alpaca trades up to 9 decimals)
+QTY_EPSILON = 1e-9
+
+_settings = {
+    "latency_ms": 50, "jitter_ms": 0, "error_rate": 0.0, "rate_limit": 200,
+    "fill_delay_ms": 0, "slippage_bps": 0.0, "market_open": True, "cash": 100000.0,
+}
+_prices = {}
+_lock = threading.Lock()
+_state = {
+    "cash": 100000.0,
+    "positions": {},                        # symbol -> {"qty", "cost_basis"}
+    "orders": {},                           # order id -> order, in submission order
+    "open_orders": OrderedDict(),           # order id -> open order, in submission order
+    "open_by_symbol": defaultdict(dict),    # symbol -> {order id: open order}
+    "reserved_buy": 0.0,                    # Cash reserved by open buys, the sum of their "reserved"
+    "tokens": 200.0,                        # Rate limit bucket
+    "refilled_at": time.monotonic(),
+    "stats": Counter(),
+}
+_account_id = str(uuid.uuid4())
+_created_at = datetime.now(timezone.utc)
+
+
+def _iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _asset_id(symbol):
+    # Stable per symbol, like Alpaca's asset ids
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{symbol}.paper-exchange"))
+
+
+def get_price(symbol):
+    """
+    Return the stored price of a symbol, or a deterministic one for unknown symbols.
+    """
+    if symbol not in _prices:
+        _prices[symbol] = 20.0 + zlib.crc32(symbol.encode()) % 48000 / 100
+    return _prices[symbol]
+
+
+def load_prices(path):
+    """
+    Load prices from a market data fixture file: quote prices, else the last bar close.
+    """
+    with open(path, "r") as file:
+        data = json.load(file)
+    for symbol, bars in data.get("bars", {}).items():
+        if bars:
+            _prices[symbol] = float(bars[-1]["close"])
+    for symbol, quote in data.get("quotes", {}).items():
+        _prices[symbol] = float(quote["price"])
+
+
+###############################################################################
+# MATCHING ENGINE
+###############################################################################
+def _open_order(order):
+    """
+    Add a new order to the open order indexes, reserving cash for a buy.
+    """
+    if order["side"] == "buy":
+        order["reserved"] = order["notional"] if order["notional"] is not None else order["qty"] * get_price(order["symbol"])
+        _state["reserved_buy"] += order["reserved"]
+    _state["open_orders"][order["id"]] = order
+    _state["open_by_symbol"][order["symbol"]][order["id"]] = order
+
+
+def _close_order(order):
+    """
+    Remove a filled or canceled order from the open order indexes, releasing its reservation.
+    """
+    del _state["open_orders"][order["id"]]
+    symbol_orders = _state["open_by_symbol"][order["symbol"]]
+    del symbol_orders[order["id"]]
+    if not symbol_orders:
+        del _state["open_by_symbol"][order["symbol"]]
+    if order["side"] == "buy":
+        _state["reserved_buy"] -= order["reserved"]
+        if not _state["open_orders"]:
+            # Drop the rounding error the running total picked up
+            _state["reserved_buy"] = 0.0
+
+
+def _reserved_qty(symbol, side):
+    return sum(
+        order["qty"] if order["qty"] is not None else order["notional"] / get_price(symbol)
+        for order in _state["open_by_symbol"].get(symbol, {}).values()
+        if order["side"] == side
+    )
+
+
+def _buying_power():
+    return _state["cash"] - _state["reserved_buy"]
+
+
+def _fill(order, now):
+    direction = 1 if order["side"] == "buy" else -1
+    price = get_price(order["symbol"]) * (1 + direction * _settings["slippage_bps"] / 10000)
+    qty = order["qty"] if order["qty"] is not None else order["notional"] / price
+    position = _state["positions"].setdefault(order["symbol"], {"qty": 0.0, "cost_basis": 0.0})
+    if order["side"] == "buy":
+        position["qty"] += qty
+        position["cost_basis"] += qty * price
+        _state["cash"] -= qty * price
+    else:
+        qty = min(qty, position["qty"])
+        position["cost_basis"] -= position["cost_basis"] * qty / position["qty"] if position["qty"] else 0
+        position["qty"] -= qty
+        _state["cash"] += qty * price
+        if position["qty"] <= QTY_EPSILON:
+            del _state["positions"][order["symbol"]]
+    order.update(status="filled", filled_qty=qty, filled_avg_price=price, filled_at=now, updated_at=now)
+    _close_order(order)
+    _state["stats"]["filled"] += 1
+
+
+def match(now=None):
+    """
+    Fill the open orders that have waited at least the fill delay. Called under _lock.
+    """
+    now = now or time.time()
+    # Every order waits the same delay, so they come due in submission order
+    while _state["open_orders"]:
+        order = next(iter(_state["open_orders"].values()))
+        if now - order["submitted_at"] < _settings["fill_delay_ms"] / 1000:
+            break
+        _fill(order, now)
+
+
+def submit_order(request):
+    """
+    Validate and queue a market order. Returns (status, body).
+    """
+    symbol = str(request.get("symbol", "")).upper()
+    side = request.get("side")
+    notional = float(request["notional"]) if request.get("notional") is not None else None
+    qty = float(request["qty"]) if request.get("qty") is not None else None
+    if not symbol or side not in ("buy", "sell") or (notional is None) == (qty is None):
+        return 422, {"code": 40010001, "message": "symbol, side and exactly one of qty or notional are required"}
+    if request.get("type", "market") != "market":
+        return 422, {"code": 40010001, "message": "only market orders are supported"}
+    if side == "buy":
+        cost = notional if notional is not None else qty * get_price(symbol)
+        if cost > _buying_power() + QTY_EPSILON:
+            return 403, {"code": 40310000, "message": "insufficient buying power"}
+    else:
+        held = _state["positions"].get(symbol, {}).get("qty", 0.0)
+        sell_qty = qty if qty is not None else notional / get_price(symbol)
+        if sell_qty > held - _reserved_qty(symbol, "sell") + QTY_EPSILON:
+            return 403, {"code": 40310000, "message": f"insufficient qty available for order (requested: {sell_qty:.9f}, available: {max(held - _reserved_qty(symbol, 'sell'), 0):.9f})"}
+
+    now = time.time()
+    order = {
+        "id": str(uuid.uuid4()), "client_order_id": request.get("client_order_id") or str(uuid.uuid4()),
+        "symbol": symbol, "side": side, "notional": notional, "qty": qty,
+        "time_in_force": request.get("time_in_force", "day"), "status": "accepted",
+        "submitted_at": now, "updated_at": now, "filled_at": None, "canceled_at": None,
+        "filled_qty": 0.0, "filled_avg_price": None,
+    }
+    _state["orders"][order["id"]] = order
+    _open_order(order)
+    _state["stats"]["orders"] += 1
+    match(now)
+    return 200, order_json(order)
+
+
+###############################################################################
+# RESPONSES
+###############################################################################
+def order_json(order):
+    return {
+        "id": order["id"], "client_order_id": order["client_order_id"],
+        "created_at": _iso(order["submitted_at"]), "updated_at": _iso(order["updated_at"]),
+        "submitted_at": _iso(order["submitted_at"]), "filled_at": _iso(order["filled_at"]),
+        "expired_at": None, "expires_at": None, "canceled_at": _iso(order["canceled_at"]), "failed_at": None,
+        "replaced_at": None, "replaced_by": None, "replaces": None,
+        "asset_id": _asset_id(order["symbol"]), "symbol": order["symbol"], "asset_class": "us_equity",
+        "notional": str(order["notional"]) if order["notional"] is not None else None,
+        "qty": str(order["qty"]) if order["qty"] is not None else None,
+        "filled_qty": str(order["filled_qty"]),
+        "filled_avg_price": str(order["filled_avg_price"]) if order["filled_avg_price"] is not None else None,
+        "order_class": "simple", "order_type": "market", "type": "market", "side": order["side"],
+        "time_in_force": order["time_in_force"], "limit_price": None, "stop_price": None,
+        "status": order["status"], "extended_hours": False, "legs": None,
+        "trail_percent": None, "trail_price": None, "hwm": None, "position_intent": None,
+    }
+
+
+def position_json(symbol, position):
+    price = get_price(symbol)
+    market_value = position["qty"] * price
+    unrealized_pl = market_value - position["cost_basis"]
+    return {
+        "asset_id": _asset_id(symbol), "symbol": symbol, "exchange": "NASDAQ", "asset_class": "us_equity",
+        "asset_marginable": True, "avg_entry_price": str(position["cost_basis"] / position["qty"]),
+        "qty": str(position["qty"]), "qty_available": str(position["qty"] - _reserved_qty(symbol, "sell")),
+        "side": "long", "market_value": str(market_value), "cost_basis": str(position["cost_basis"]),
+        "unrealized_pl": str(unrealized_pl),
+        "unrealized_plpc": str(unrealized_pl / position["cost_basis"] if position["cost_basis"] else 0),
+        "unrealized_intraday_pl": str(unrealized_pl),
+        "unrealized_intraday_plpc": str(unrealized_pl / position["cost_basis"] if position["cost_basis"] else 0),
+        "current_price": str(price), "lastday_price": str(price), "change_today": "0",
+    }
+
+
+def account_json():
+    long_market_value = sum(position["qty"] * get_price(symbol) for symbol, position in _state["positions"].items())
+    equity = _state["cash"] + long_market_value
+    buying_power = str(max(_buying_power(), 0))
+    return {
+        "id": _account_id, "account_number": "PA0000000000", "status": "ACTIVE", "crypto_status": "INACTIVE",
+        "currency": "USD", "buying_power": buying_power, "regt_buying_power": buying_power,
+        "daytrading_buying_power": "0", "non_marginable_buying_power": buying_power,
+        "cash": str(_state["cash"]), "accrued_fees": "0", "pending_transfer_in": "0", "pending_transfer_out": "0",
+        "portfolio_value": str(equity), "equity": str(equity), "last_equity": str(_settings["cash"]),
+        "long_market_value": str(long_market_value), "short_market_value": "0",
+        "initial_margin": "0", "maintenance_margin": "0", "last_maintenance_margin": "0", "sma": "0",
+        "multiplier": "1", "daytrade_count": 0, "pattern_day_trader": False, "shorting_enabled": False,
+        "trading_blocked": False, "transfers_blocked": False, "account_blocked": False,
+        "trade_suspended_by_user": False, "created_at": _created_at.isoformat().replace("+00:00", "Z"),
+    }
+
+
+def clock_json():
+    # The emulated market is open or closed for the whole run; the next boundary is an hour away
+    now = datetime.now(timezone.utc)
+    boundary = now + timedelta(hours=1)
+    next_open = now + timedelta(days=1) if _settings["market_open"] else boundary
+    next_close = boundary if _settings["market_open"] else boundary + timedelta(hours=6, minutes=30)
+    return {
+        "timestamp": now.isoformat(), "is_open": _settings["market_open"],
+        "next_open": next_open.isoformat(), "next_close": next_close.isoformat(),
+    }
+
+
+def calendar_json(start, end):
+    # Regular sessions on weekdays; holidays are not emulated
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            days.append({"date": day.isoformat(), "open": "09:30", "close": "16:00",
+                         "session_open": "0400", "session_close": "2000", "settlement_date": (day + timedelta(days=1)).isoformat()})
+        day += timedelta(days=1)
+    return days
+
+
+###############################################################################
+# HTTP SERVER
+###############################################################################
+def _take_token():
+    """
+    Consume one request from the per-minute rate limit bucket. Called under _lock.
+    """
+    if not _settings["rate_limit"]:
+        return True
+    now = time.monotonic()
+    _state["tokens"] = min(_settings["rate_limit"], _state["tokens"] + (now - _state["refilled_at"]) * _settings["rate_limit"] / 60)
+    _state["refilled_at"] = now
+    if _state["tokens"] < 1:
+        return False
+    _state["tokens"] -= 1
+    return True
+
+
+class ExchangeHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        # 204 (canceled order) has no body
+        data = json.dumps(body).encode() if status != 204 else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        time.sleep((_settings["latency_ms"] + random.uniform(0, _settings["jitter_ms"])) / 1000)
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+        with _lock:
+            _state["stats"]["requests"] += 1
+            if not _take_token():
+                _state["stats"]["rate_limited"] += 1
+                self._send_json(429, {"code": 42910000, "message": "rate limit exceeded"}, {
+                    "X-RateLimit-Limit": str(_settings["rate_limit"]), "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": str(int(time.time()) + 1),
+                })
+                return
+            if random.random() < _settings["error_rate"]:
+                _state["stats"]["injected_errors"] += 1
+                self._send_json(500, {"code": 50010000, "message": "internal server error (injected)"})
+                return
+            match()
+            status, response = self._route(method, url.path.rstrip("/"), query, json.loads(body) if body else {})
+        self._send_json(status, response)
+
+    def _route(self, method, path, query, request):
+        """
+        Return (status, body) for a request. Called under _lock.
+        """
+        if method == "GET" and path == "/v2/account":
+            return 200, account_json()
+        if method == "GET" and path == "/v2/clock":
+            return 200, clock_json()
+        if method == "GET" and path == "/v2/calendar":
+            start = date.fromisoformat(query.get("start", date.today().isoformat()))
+            end = date.fromisoformat(query.get("end", (start + timedelta(days=30)).isoformat()))
+            return 200, calendar_json(start, end)
+        if method == "GET" and path == "/v2/positions":
+            return 200, [position_json(symbol, position) for symbol, position in sorted(_state["positions"].items())]
+        position_match = re.fullmatch(r"/v2/positions/([^/]+)", path)
+        if method == "GET" and position_match:
+            symbol = position_match.group(1).upper()
+            if symbol not in _state["positions"]:
+                return 404, {"code": 40410000, "message": "position does not exist"}
+            return 200, position_json(symbol, _state["positions"][symbol])
+        if method == "POST" and path == "/v2/orders":
+            return submit_order(request)
+        if method == "GET" and path == "/v2/orders":
+            return 200, self._list_orders(query)
+        order_match = re.fullmatch(r"/v2/orders/([^/]+)", path)
+        if order_match:
+            order = _state["orders"].get(order_match.group(1))
+            if order is None:
+                return 404, {"code": 40410000, "message": "order not found"}
+            if method == "GET":
+                return 200, order_json(order)
+            if method == "DELETE":
+                if order["status"] not in OPEN_STATUSES:
+                    return 422, {"code": 42210000, "message": f"order is already in \"{order['status']}\" state"}
+                order.update(status="canceled", canceled_at=time.time(), updated_at=time.time())
+                _close_order(order)
+                return 204, None
+        return 404, {"code": 40410000, "message": f"endpoint not found: {method} {path}"}
+
+    def _list_orders(self, query):
+        status = query.get("status", "open")
+        symbols = set(query["symbols"].split(",")) if query.get("symbols") else None
+        after = datetime.fromisoformat(query["after"].replace("Z", "+00:00")).timestamp() if query.get("after") else None
+        until = datetime.fromisoformat(query["until"].replace("Z", "+00:00")).timestamp() if query.get("until") else None
+        candidates = _state["open_orders"] if status == "open" else _state["orders"]
+        orders = [
+            order for order in candidates.values()
+            if (status == "all" or (order["status"] in OPEN_STATUSES) == (status == "open"))
+            and (symbols is None or order["symbol"] in symbols)
+            and (after is None or order["submitted_at"] > after)
+            and (until is None or order["submitted_at"] < until)
+        ]
+        # Newest first, like Alpaca's default direction
+        orders.reverse()
+        return [order_json(order) for order in orders[:min(int(query.get("limit", 50)), 500)]]
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class ExchangeServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under concurrent load (1s SYN retries)
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def create_server(host="127.0.0.1", port=0):
+    """
+    Reset the account to the starting cash and return the exchange's HTTP server.
+    """
+    _state["cash"] = _settings["cash"]
+    _state["tokens"] = float(_settings["rate_limit"])
+    return ExchangeServer((host, port), ExchangeHandler)
+
+
+###############################################################################
+# LOAD TEST
+###############################################################################
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def run_loadtest(url, orders, concurrency, symbols, amount, sell_ratio):
+    """
+    Place `orders` orders from `concurrency` threads through the bot's own order
+    functions, each followed by the open orders and account reads a cycle makes.
+    Returns (seconds, {operation: [latencies]}, {operation: errors}).
+    """
+    import sys
+    import config
+
+    # alpacaFunctions copies these out of config when imported
+    config.ALPACA_TRADING_URL_OVERRIDE = url
+    config.ALPACA_API_KEY = config.ALPACA_API_KEY or "paper-exchange"
+    config.ALPACA_SECRET_KEY = config.ALPACA_SECRET_KEY or "paper-exchange"
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_utils"))
+    from alpacaFunctions import buy_stock, sell_stock, get_open_orders, get_account_info
+
+    latencies = {"buy_stock": [], "sell_stock": [], "get_open_orders": [], "get_account_info": []}
+    errors = Counter()
+    results_lock = threading.Lock()
+    next_order = iter(range(orders))
+
+    def timed(operation, function, *args):
+        started_at = time.perf_counter()
+        try:
+            result = function(*args)
+            failed = isinstance(result, dict) and "error" in result
+        except Exception:
+            failed = True
+        with results_lock:
+            latencies[operation].append(time.perf_counter() - started_at)
+            errors[operation] += failed
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while True:
+            with results_lock:
+                index = next(next_order, None)
+            if index is None:
+                return
+            symbol = symbols[index % len(symbols)]
+            if rng.random() < sell_ratio:
+                timed("sell_stock", sell_stock, symbol, amount)
+            else:
+                timed("buy_stock", buy_stock, symbol, amount)
+            timed("get_open_orders", get_open_orders)
+            timed("get_account_info", get_account_info)
+
+    # Client creation and lazy imports are not part of the order path
+    get_account_info()
+    started_at = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started_at, latencies, errors
+
+
+def print_loadtest_report(seconds, latencies, errors, concurrency):
+    placed = len(latencies["buy_stock"]) + len(latencies["sell_stock"])
+    failed = errors["buy_stock"] + errors["sell_stock"]
+    print(f"{placed} orders ({failed} failed) in {seconds:.2f}s with {concurrency} threads: {placed / seconds:.1f} orders/s")
+    print(f"{'operation':<18} {'calls':>6} {'errors':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for operation, samples in latencies.items():
+        if samples:
+            print(f"{operation:<18} {len(samples):>6} {errors[operation]:>6} "
+                  f"{_percentile(samples, 50) * 1000:>8.1f} {_percentile(samples, 90) * 1000:>8.1f} "
+                  f"{_percentile(samples, 99) * 1000:>8.1f} {max(samples) * 1000:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Alpaca-compatible paper exchange")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="run the exchange")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8090)
+    loadtest_parser = subparsers.add_parser("loadtest", help="load test the order path against the exchange")
+    loadtest_parser.add_argument("--url", help="exchange to test (default: an in-process one with the options below)")
+    loadtest_parser.add_argument("--orders", type=int, default=500)
+    loadtest_parser.add_argument("--concurrency", type=int, default=8)
+    loadtest_parser.add_argument("--symbols", default="AAPL,MSFT,NVDA,AMZN,GOOGL,META,TSLA,AMD")
+    loadtest_parser.add_argument("--amount", type=float, default=100.0, help="notional of each order")
+    loadtest_parser.add_argument("--sell-ratio", type=float, default=0.3, help="share of orders that are sells")
+    for subparser in (serve_parser, loadtest_parser):
+        subparser.add_argument("--latency-ms", type=float, default=50, help="delay added to every request")
+        subparser.add_argument("--jitter-ms", type=float, default=0, help="extra random delay up to this much")
+        subparser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with a 500")
+        subparser.add_argument("--rate-limit", type=int, default=200, help="requests per minute (0 - unlimited)")
+        subparser.add_argument("--fill-delay-ms", type=float, default=0, help="time from submission to fill")
+        subparser.add_argument("--slippage-bps", type=float, default=0.0, help="fill price offset against the order")
+        subparser.add_argument("--cash", type=float, default=100000.0, help="starting cash")
+        subparser.add_argument("--market-closed", action="store_true", help="report the market as closed")
+        subparser.add_argument("--prices-file", help="market data fixture file with the stored prices")
+    # The load test looks for the bot's own limits, not Alpaca's
+    loadtest_parser.set_defaults(rate_limit=0)
+    args = parser.parse_args()
+
+    _settings.update(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, fill_delay_ms=args.fill_delay_ms, slippage_bps=args.slippage_bps,
+        cash=args.cash, market_open=not args.market_closed,
+    )
+    if args.prices_file:
+        load_prices(args.prices_file)
+
+    if args.command == "serve":
+        server = create_server(args.host, args.port)
+        print(f"Paper exchange listening on http://{args.host}:{args.port}")
+        server.serve_forever()
+        return
+
+    server = None
+    url = args.url
+    if not url:
+        server = create_server()
+        threading.Thread(target=server.serve_forever, name="paper-exchange", daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+    symbols = [symbol.strip().upper() for symbol in args.symbols.split(",") if symbol.strip()]
+    seconds, latencies, errors = run_loadtest(url, args.orders, args.concurrency, symbols, args.amount, args.sell_ratio)
+    print_loadtest_report(seconds, latencies, errors, args.concurrency)
+    if server:
+        stats = _state["stats"]
+        print(f"Exchange: {stats['requests']} requests ({stats['requests'] / seconds:.1f}/s), {stats['rate_limited']} rate limited, "
+              f"{stats['injected_errors']} injected errors, {stats['filled']} fills")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
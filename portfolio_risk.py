@@ -0,0 +1,133 @@
+"""
+Portfolio risk from the daily history already downloaded for moving averages.
+A matrix of the last RISK_RETURNS_WINDOW daily returns is built for held and
+candidate symbols plus RISK_BENCHMARK_SYMBOL, and covariance, volatility, beta,
+VaR and marginal risk contributions are computed from it with NumPy in a few
+milliseconds even for hundreds of symbols (see benchmarks/portfolio_risk.py).
+The compact summary is sent with the decision prompt.
+"""
+import math
+import time
+from statistics import NormalDist
+from config import RISK_RETURNS_WINDOW, RISK_BENCHMARK_SYMBOL, RISK_VAR_CONFIDENCE
+from log import log_debug
+from lazy_imports import lazy_module
+from yfinance_functions import get_batch_daily_bars
+
+np = lazy_module("numpy")
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _day(timestamp):
+    # Days since the epoch (UTC); daily bars of one provider share the same time of day
+    return int(timestamp // 86400)
+
+
+def build_returns(bars_by_symbol, symbols):
+    """
+    Return (days, symbols, returns) for the last RISK_RETURNS_WINDOW days of the
+    benchmark's calendar. Symbols missing any of those days are left out.
+    """
+    benchmark = bars_by_symbol.get(RISK_BENCHMARK_SYMBOL)
+    if not benchmark or not benchmark.get('timestamps') or len(benchmark['closes']) <= RISK_RETURNS_WINDOW:
+        return [], [], None
+    window_timestamps = benchmark['timestamps'][-(RISK_RETURNS_WINDOW + 1):]
+    days = [_day(timestamp) for timestamp in window_timestamps]
+
+    columns = {}
+    for symbol in symbols:
+        bars = bars_by_symbol.get(symbol)
+        if not bars or not bars.get('timestamps'):
+            continue
+        # Usually the symbol traded on exactly the benchmark's days
+        if bars['timestamps'][-len(days):] == window_timestamps and all(bars['closes'][-len(days):]):
+            columns[symbol] = bars['closes'][-len(days):]
+            continue
+        # Otherwise align by day; only the tail can cover the window, a few extra bars absorb gaps
+        tail = len(days) + 10
+        closes_by_day = dict(zip(map(_day, bars['timestamps'][-tail:]), bars['closes'][-tail:]))
+        closes = [closes_by_day.get(day) for day in days]
+        if all(closes):
+            columns[symbol] = closes
+    if not columns:
+        return [], [], None
+
+    included = list(columns)
+    closes = np.array([columns[symbol] for symbol in included], dtype=float).T
+    return days[1:], included, closes[1:] / closes[:-1] - 1
+
+
+def compute_risk(positions, candidates=()):
+    """
+    Compute risk for held positions ({symbol: market value}) and candidate symbols.
+    Returns None when the benchmark history is unavailable.
+    """
+    held = [symbol for symbol, value in positions.items() if value > 0]
+    symbols = sorted(set(held) | set(candidates) | {RISK_BENCHMARK_SYMBOL})
+    days, included, returns = build_returns(get_batch_daily_bars(symbols, period="1y"), symbols)
+    if returns is None or RISK_BENCHMARK_SYMBOL not in included:
+        return None
+
+    covariance = np.cov(returns, rowvar=False)
+    index = {symbol: i for i, symbol in enumerate(included)}
+    volatility = np.sqrt(np.clip(np.diag(covariance), 0, None))
+    benchmark = index[RISK_BENCHMARK_SYMBOL]
+    betas = covariance[:, benchmark] / covariance[benchmark, benchmark]
+
+    held = [symbol for symbol in held if symbol in index]
+    held_index = [index[symbol] for symbol in held]
+    total_value = sum(positions[symbol] for symbol in held)
+    risk = {"portfolio": {}, "positions": {}, "candidates": {}, "window_days": len(days)}
+    portfolio_volatility = 0.0
+    if held and total_value > 0:
+        weights = np.array([positions[symbol] / total_value for symbol in held])
+        held_covariance = covariance[np.ix_(held_index, held_index)]
+        portfolio_variance = float(weights @ held_covariance @ weights)
+        portfolio_volatility = math.sqrt(max(portfolio_variance, 0.0))
+        # Marginal contribution of each position to portfolio volatility, and its share
+        marginal = held_covariance @ weights / portfolio_volatility if portfolio_volatility else np.zeros(len(held))
+        contribution = weights * marginal / portfolio_volatility if portfolio_volatility else np.zeros(len(held))
+        correlation = held_covariance / np.outer(volatility[held_index], volatility[held_index])
+        upper = np.triu_indices(len(held), 1)
+
+        z = NormalDist().inv_cdf(RISK_VAR_CONFIDENCE)
+        risk["portfolio"] = {
+            "value": round(total_value, 2),
+            "volatility_pct": round(portfolio_volatility * math.sqrt(TRADING_DAYS_PER_YEAR) * 100, 1),
+            "beta": round(float(weights @ betas[held_index]), 2),
+            "var_1d_usd": round(z * portfolio_volatility * total_value, 2),
+            "var_confidence": RISK_VAR_CONFIDENCE,
+            "largest_weight_pct": round(float(weights.max()) * 100, 1),
+            "avg_correlation": round(float(correlation[upper].mean()), 2) if len(held) > 1 else None,
+        }
+        for i, symbol in enumerate(held):
+            risk["positions"][symbol] = {
+                "weight_pct": round(float(weights[i]) * 100, 1),
+                "volatility_pct": round(float(volatility[held_index[i]]) * math.sqrt(TRADING_DAYS_PER_YEAR) * 100, 1),
+                "beta": round(float(betas[held_index[i]]), 2),
+                "risk_contribution_pct": round(float(contribution[i]) * 100, 1),
+            }
+        portfolio_covariance = covariance[:, held_index] @ weights
+    for symbol in candidates:
+        if symbol not in index or symbol in risk["positions"]:
+            continue
+        i = index[symbol]
+        risk["candidates"][symbol] = {
+            "volatility_pct": round(float(volatility[i]) * math.sqrt(TRADING_DAYS_PER_YEAR) * 100, 1),
+            "beta": round(float(betas[i]), 2),
+        }
+        if portfolio_volatility and volatility[i]:
+            risk["candidates"][symbol]["correlation_to_portfolio"] = round(float(portfolio_covariance[i] / (volatility[i] * portfolio_volatility)), 2)
+    return risk
+
+
+def get_risk_summary(portfolio_stocks, candidate_symbols):
+    """
+    Return the compact risk summary for the decision prompt, or None.
+    """
+    started_at = time.perf_counter()
+    positions = {symbol: stock['current_value'] for symbol, stock in portfolio_stocks.items() if stock['quantity'] > 0}
+    risk = compute_risk(positions, candidate_symbols)
+    log_debug(f"Portfolio risk for {len(positions) + len(candidate_symbols)} symbols computed in {(time.perf_counter() - started_at) * 1000:.1f}ms")
+    return risk
@@ -0,0 +1,105 @@
+"""
+Next-cycle prefetch. While a cycle waits on the AI and the broker, a background
+thread refreshes the moving averages the next cycle gathers - for the held
+symbols and the watchlist symbols the rotation will pick next - and, in interval
+mode, their quotes are refreshed PREFETCH_QUOTE_LEAD_SECONDS before the next
+cycle starts. The next cycle then reads them from the caches instead of fetching
+them on its critical path.
+"""
+import threading
+import time
+from config import (
+    WATCHLIST_OVERVIEW_LIMIT, PREFETCH_MAX_STALENESS_SECONDS, PREFETCH_QUOTE_LEAD_SECONDS,
+    RISK_SUMMARY_ENABLED, RISK_BENCHMARK_SYMBOL
+)
+from log import log_debug, log_error
+from alpacaFunctions import calculate_batch_moving_averages
+from watchlist_index import get_watchlist_index
+from universe_rotation import rank_symbols
+from yfinance_functions import get_batch_quotes
+
+# Symbols of the last prefetch, the running prefetch thread and the pending quote refresh
+_state = {
+    "symbols": [],
+    "thread": None,
+    "timer": None,
+}
+
+
+def get_next_cycle_symbols(held_symbols):
+    """
+    Return the held symbols plus the watchlist symbols the rotation would pick
+    next, given that this cycle's picks were already marked as evaluated.
+    """
+    symbols = sorted(set(held_symbols))
+    try:
+        symbols += rank_symbols(get_watchlist_index()["sorted_symbols"], WATCHLIST_OVERVIEW_LIMIT, exclude=symbols)
+    except Exception as e:
+        log_error(f"Error ranking next cycle's watchlist stocks: {e}")
+    return symbols
+
+
+def prefetch_symbols(symbols):
+    """
+    Refresh the moving averages of the given symbols (one batched request) when
+    they are older than PREFETCH_MAX_STALENESS_SECONDS.
+    """
+    started_at = time.time()
+    fetched_moving_averages = 0
+    try:
+        # The risk summary reuses the same daily bars and also needs the benchmark's
+        history_symbols = symbols + [RISK_BENCHMARK_SYMBOL] if RISK_SUMMARY_ENABLED else symbols
+        fetched_moving_averages = calculate_batch_moving_averages(history_symbols, max_age_seconds=PREFETCH_MAX_STALENESS_SECONDS)
+    except Exception as e:
+        log_error(f"Error prefetching moving averages: {e}")
+    log_debug(f"Prefetched next cycle's data for {len(symbols)} symbols in {time.time() - started_at:.1f}s ({fetched_moving_averages} moving averages fetched)")
+
+
+def start_prefetch(held_symbols):
+    """
+    Start prefetching the next cycle's data in the background, unless the previous
+    prefetch is still running. Returns the thread, or None when skipped.
+    """
+    thread = _state["thread"]
+    if thread and thread.is_alive():
+        log_debug("Previous prefetch is still running, not starting another")
+        return None
+
+    def run():
+        try:
+            symbols = get_next_cycle_symbols(held_symbols)
+            _state["symbols"] = symbols
+            prefetch_symbols(symbols)
+        except Exception as e:
+            log_error(f"Prefetch error: {e}")
+
+    thread = threading.Thread(target=run, name="prefetch", daemon=True)
+    _state["thread"] = thread
+    thread.start()
+    return thread
+
+
+def schedule_quote_refresh(seconds_until_next_cycle):
+    """
+    Refresh the quotes of the last prefetched symbols PREFETCH_QUOTE_LEAD_SECONDS
+    before the next cycle, replacing any refresh still pending.
+    """
+    if _state["timer"]:
+        _state["timer"].cancel()
+    delay_seconds = seconds_until_next_cycle - PREFETCH_QUOTE_LEAD_SECONDS
+    if delay_seconds <= 0 or not _state["symbols"]:
+        return None
+
+    def run():
+        try:
+            started_at = time.time()
+            quotes = get_batch_quotes(_state["symbols"])
+            log_debug(f"Prefetched {len(quotes)} quotes for the next cycle in {time.time() - started_at:.1f}s")
+        except Exception as e:
+            log_error(f"Quote prefetch error: {e}")
+
+    timer = threading.Timer(delay_seconds, run)
+    timer.daemon = True
+    _state["timer"] = timer
+    timer.start()
+    return timer
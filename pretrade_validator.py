@@ -0,0 +1,118 @@
+"""
+Pre-trade validation of decisions against one account snapshot, used by
+allocation_solver for the whole decision list. Amounts are clamped to what can
+actually be traded (position value, pending sells, buying power, min/max trade
+sizes), and decisions that can't be submitted at all are rejected locally with a
+structured reason instead of failing at the broker one round trip at a time.
+"""
+from config import (
+    TRADE_EXCEPTIONS,
+    MIN_BUYING_AMOUNT_USD, MAX_BUYING_AMOUNT_USD,
+    MIN_SELLING_AMOUNT_USD, MAX_SELLING_AMOUNT_USD
+)
+from alpacaFunctions import get_trading_client, get_open_orders
+
+
+def take_snapshot():
+    """
+    Fetch positions, open orders and buying power once for a validation pass.
+    """
+    client = get_trading_client()
+    positions = {
+        position.symbol: {
+            "qty": float(position.qty),
+            "price": float(position.current_price),
+        }
+        for position in client.get_all_positions()
+    }
+    account = client.get_account()
+    return {
+        "positions": positions,
+        "open_orders": get_open_orders(),
+        "buying_power": round(float(account.buying_power), 2),
+    }
+
+
+def reject_decision(decision_data, reason, details):
+    """
+    Return the decision annotated with a machine-readable reason and a message.
+    """
+    return {**decision_data, "reason": reason, "details": details}
+
+
+def _clamp(amount, min_amount, max_amount):
+    if min_amount is not False:
+        amount = max(amount, min_amount)
+    if max_amount is not False:
+        amount = min(amount, max_amount)
+    return round(amount, 2)
+
+
+def validate_sell(decision_data, snapshot):
+    """
+    Return (decision, None) with a clamped amount, or (None, rejection).
+    """
+    symbol = decision_data["symbol"]
+    position = snapshot["positions"].get(symbol)
+    if position is None or position["qty"] <= 0:
+        return None, reject_decision(decision_data, "no_position", f"No position exists for {symbol}")
+
+    pending_sell_value = 0
+    order = snapshot["open_orders"].get(symbol)
+    if order and order["side"] == "sell":
+        pending_sell_value = order["notional"]
+    available_value = position["qty"] * position["price"] - pending_sell_value
+
+    amount = min(decision_data["amount"], available_value)
+    if MIN_SELLING_AMOUNT_USD is not False and available_value < MIN_SELLING_AMOUNT_USD:
+        return None, reject_decision(decision_data, "below_minimum", f"Available position value (${available_value:.2f}) is below minimum selling amount")
+    amount = _clamp(amount, MIN_SELLING_AMOUNT_USD, MAX_SELLING_AMOUNT_USD)
+    if amount <= 0:
+        return None, reject_decision(decision_data, "amount_too_small", "Sell amount too small")
+    return {**decision_data, "amount": amount}, None
+
+
+def validate_buy(decision_data, snapshot, remaining_buying_power):
+    """
+    Return (decision, None) with a clamped amount, or (None, rejection).
+    """
+    symbol = decision_data["symbol"]
+    order = snapshot["open_orders"].get(symbol)
+    if order and order["side"] == "buy":
+        return None, reject_decision(decision_data, "pending_order", f"A buy order for {symbol} is already pending")
+
+    amount = _clamp(decision_data["amount"], MIN_BUYING_AMOUNT_USD, MAX_BUYING_AMOUNT_USD)
+    amount = round(min(amount, remaining_buying_power), 2)
+    if amount <= 0 or (MIN_BUYING_AMOUNT_USD is not False and amount < MIN_BUYING_AMOUNT_USD):
+        return None, reject_decision(decision_data, "insufficient_buying_power", f"Remaining buying power (${remaining_buying_power:.2f}) is below the buy amount")
+    return {**decision_data, "amount": amount}, None
+
+
+def screen_decisions(decisions):
+    """
+    Drop holds and reject decisions that are invalid regardless of the account
+    (bad amount, trade exception, repeated symbol). Returns (intents, rejected).
+    """
+    intents = []
+    rejected = []
+    seen_symbols = set()
+    for decision_data in decisions:
+        symbol = decision_data.get("symbol")
+        if decision_data.get("decision") not in ("buy", "sell"):
+            continue
+        try:
+            decision_data = {**decision_data, "amount": float(decision_data.get("amount"))}
+        except (TypeError, ValueError):
+            rejected.append(reject_decision(decision_data, "invalid_amount", f"Amount is not a number: {decision_data.get('amount')}"))
+            continue
+        if decision_data["amount"] <= 0:
+            rejected.append(reject_decision(decision_data, "invalid_amount", "Amount must be positive"))
+        elif symbol in TRADE_EXCEPTIONS:
+            rejected.append(reject_decision(decision_data, "trade_exception", "Trade exception"))
+        elif symbol in seen_symbols:
+            rejected.append(reject_decision(decision_data, "duplicate_symbol", f"More than one decision for {symbol}"))
+        else:
+            seen_symbols.add(symbol)
+            intents.append(decision_data)
+    return intents, rejected
+
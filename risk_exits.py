@@ -0,0 +1,191 @@
+"""
+Local risk exits between AI cycles. A background thread re-evaluates all open
+positions every RISK_EXIT_POLL_SECONDS against stop-loss, trailing-stop and
+take-profit rules (global, with per-symbol overrides from RISK_SYMBOL_RULES) and
+sells the whole available quantity of triggered positions in one order, without
+waiting for the next cycle or an AI round trip.
+
+The trailing stop only arms once its level (the highest price since entry minus
+trailing_stop_pct) is above the entry price, so it locks in gains while losses
+below entry are left to the stop-loss. The highest prices are persisted to
+RISK_HIGH_WATER_FILE, so trailing stops survive a restart.
+"""
+import json
+import os
+import threading
+import time
+from config import (
+    RISK_EXIT_POLL_SECONDS, RISK_STOP_LOSS_PCT, RISK_TRAILING_STOP_PCT,
+    RISK_TAKE_PROFIT_PCT, RISK_SYMBOL_RULES, RISK_HIGH_WATER_FILE,
+    QUOTE_CACHE_SECONDS, TRADE_EXCEPTIONS
+)
+from log import log_info, log_warning, log_error
+from lazy_imports import lazy_module
+from alpacaFunctions import get_trading_client, is_market_open, sell_shares
+from yfinance_functions import get_cached_quote
+from trading_logs import log_trade_to_db
+from fill_tracker import track_order
+
+np = lazy_module("numpy")
+
+RULES = ("stop_loss_pct", "trailing_stop_pct", "take_profit_pct")
+
+# Highest price seen per held symbol, the reference of the trailing stop; persisted
+# to RISK_HIGH_WATER_FILE
+_high_water = None
+
+
+def _load_high_water():
+    """
+    Load the highest prices from disk once per process.
+    """
+    global _high_water
+    if _high_water is not None:
+        return
+    _high_water = {}
+    if os.path.exists(RISK_HIGH_WATER_FILE):
+        try:
+            with open(RISK_HIGH_WATER_FILE, "r") as file:
+                _high_water = json.load(file)
+        except Exception as e:
+            log_warning(f"Ignoring unreadable risk high-water marks {RISK_HIGH_WATER_FILE}: {e}")
+
+
+def _save_high_water():
+    try:
+        with open(RISK_HIGH_WATER_FILE, "w") as file:
+            json.dump(_high_water, file)
+    except Exception as e:
+        log_warning(f"Error saving risk high-water marks: {e}")
+
+
+def get_rules(symbol):
+    """
+    Return the exit rules of a symbol, applying any per-symbol overrides.
+    False disables a rule.
+    """
+    rules = {
+        "stop_loss_pct": RISK_STOP_LOSS_PCT,
+        "trailing_stop_pct": RISK_TRAILING_STOP_PCT,
+        "take_profit_pct": RISK_TAKE_PROFIT_PCT,
+    }
+    rules.update(RISK_SYMBOL_RULES.get(symbol, {}))
+    return rules
+
+
+def get_positions_snapshot():
+    """
+    Return held positions as {symbol: {"qty", "qty_available", "entry", "price"}},
+    preferring a fresh batched quote over the position's own price.
+    """
+    positions = {}
+    for position in get_trading_client().get_all_positions():
+        qty = float(position.qty)
+        if qty <= 0:
+            continue
+        quote = get_cached_quote(position.symbol, QUOTE_CACHE_SECONDS)
+        positions[position.symbol] = {
+            "qty": qty,
+            # Shares not already held for pending sell orders
+            "qty_available": float(position.qty_available) if position.qty_available is not None else qty,
+            "entry": float(position.avg_entry_price),
+            "price": quote["price"] if quote else float(position.current_price),
+        }
+    return positions
+
+
+def evaluate_exits(positions):
+    """
+    Evaluate every rule for every position at once. Returns a list of
+    (symbol, rule, value_pct) for triggered exits, at most one per symbol
+    (stop-loss first, then trailing stop, then take-profit).
+    """
+    if not positions:
+        return []
+    symbols = list(positions)
+    prices = np.array([positions[symbol]["price"] for symbol in symbols], dtype=float)
+    entries = np.array([positions[symbol]["entry"] for symbol in symbols], dtype=float)
+    highs = np.array([max((_high_water or {}).get(symbol, 0.0), positions[symbol]["entry"]) for symbol in symbols], dtype=float)
+
+    # Disabled rules become NaN, which never compares true
+    thresholds = np.array([
+        [np.nan if rules[rule] is False else float(rules[rule]) for rule in RULES]
+        for rules in map(get_rules, symbols)
+    ], dtype=float).reshape(len(symbols), len(RULES))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pl_pct = (prices / entries - 1) * 100
+        drawdown_pct = (1 - prices / highs) * 100
+        trailing_armed = highs * (1 - thresholds[:, 1] / 100) > entries
+    triggered = np.column_stack([
+        pl_pct <= -thresholds[:, 0],
+        trailing_armed & (drawdown_pct >= thresholds[:, 1]),
+        pl_pct >= thresholds[:, 2],
+    ])
+    values = np.column_stack([pl_pct, -drawdown_pct, pl_pct])
+
+    exits = []
+    for i in np.flatnonzero(triggered.any(axis=1)):
+        rule_index = int(np.argmax(triggered[i]))
+        exits.append((symbols[i], RULES[rule_index], round(float(values[i, rule_index]), 2)))
+    return exits
+
+
+def check_risk_exits():
+    """
+    Refresh positions, update trailing-stop highs and sell every position that
+    hit an exit rule. Returns the list of triggered exits.
+    """
+    positions = get_positions_snapshot()
+    _load_high_water()
+    high_water = {
+        symbol: max(_high_water.get(symbol, position["entry"]), position["price"])
+        for symbol, position in positions.items()
+    }
+    if high_water != _high_water:
+        _high_water.clear()
+        _high_water.update(high_water)
+        _save_high_water()
+
+    exits = evaluate_exits(positions)
+    for symbol, rule, value in exits:
+        if symbol in TRADE_EXCEPTIONS:
+            continue
+        qty = positions[symbol]["qty_available"]
+        if qty <= 0:
+            # A sell is already pending for the whole position
+            log_warning(f"{symbol} > Risk exit: {rule} triggered at {value:+.2f}%, all shares already held for pending sells")
+            continue
+        amount = round(qty * positions[symbol]["price"], 2)
+        log_warning(f"{symbol} > Risk exit: {rule} triggered at {value:+.2f}%, selling {qty:.6f} shares (${amount:.2f})")
+        sell_resp = sell_shares(symbol, qty, positions[symbol]["price"])
+        if sell_resp and 'id' in sell_resp:
+            log_trade_to_db(symbol, "sell", amount, order_id=sell_resp['id'])
+            track_order(sell_resp['id'], symbol, "sell", amount)
+            log_info(f"{symbol} > Risk exit sold ${amount:.2f}")
+        else:
+            log_warning(f"{symbol} > Risk exit not placed: {sell_resp.get('error') if sell_resp else 'Unknown error'}")
+    return exits
+
+
+def start_risk_exits(cycle_lock):
+    """
+    Start the risk exit thread. Ticks are skipped while cycle_lock is held by a
+    full trading cycle, so both never sell the same position at once.
+    """
+    def run():
+        while True:
+            time.sleep(RISK_EXIT_POLL_SECONDS)
+            if not cycle_lock.acquire(blocking=False):
+                continue
+            try:
+                if is_market_open():
+                    check_risk_exits()
+            except Exception as e:
+                log_error(f"Risk exit error: {e}")
+            finally:
+                cycle_lock.release()
+
+    thread = threading.Thread(target=run, name="risk-exits", daemon=True)
+    thread.start()
+    return thread
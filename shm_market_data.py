@@ -0,0 +1,295 @@
+"""
+Shared-memory market data segment. One publisher writes the latest quotes and
+aligned daily-bar closes for a fixed symbol set into a named
+multiprocessing.shared_memory block; any number of processes attach to it and
+read without pickling or refetching.
+
+Layout (all little-endian):
+    header   : magic (8s), sequence (Q), num_symbols (Q), num_bars (Q), published_at (d)
+    symbols  : num_symbols x 16-byte ASCII, NUL padded
+    quotes   : num_symbols x QUOTE_FIELDS float64 (price, volume, avg_volume, updated_at)
+    bars     : num_symbols x num_bars float64 daily closes, oldest first, NaN padded
+
+The sequence counter works as a seqlock: the publisher makes it odd while writing
+and even when done, and readers retry whenever it was odd or changed under them.
+"""
+import atexit
+import math
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from config import (
+    MARKET_DATA_CACHE_MAX_AGE, MARKET_DATA_SHM_NAME, MARKET_DATA_SHM_BARS, MARKET_DATA_SHM_READ_TIMEOUT_SECONDS
+)
+
+MAGIC = b"MKTDATA1"
+HEADER = struct.Struct("<8sQQQd")
+SYMBOL_SIZE = 16
+QUOTE_FIELDS = ("price", "volume", "avg_volume", "updated_at")
+FLOAT_SIZE = 8
+SEQUENCE_OFFSET = 8
+PUBLISHED_AT_OFFSET = HEADER.size - FLOAT_SIZE
+# Backoff between seqlock retries while a publish is in progress
+RETRY_SLEEP_SECONDS = 0.0005
+MAX_RETRY_SLEEP_SECONDS = 0.01
+
+# Segments created by this process (still tracked for cleanup by its resource tracker)
+_created = set()
+
+
+def _segment_size(num_symbols, num_bars):
+    return HEADER.size + num_symbols * (SYMBOL_SIZE + FLOAT_SIZE * (len(QUOTE_FIELDS) + num_bars))
+
+
+def _offsets(num_symbols, num_bars):
+    symbols_offset = HEADER.size
+    quotes_offset = symbols_offset + num_symbols * SYMBOL_SIZE
+    bars_offset = quotes_offset + num_symbols * len(QUOTE_FIELDS) * FLOAT_SIZE
+    return symbols_offset, quotes_offset, bars_offset
+
+
+def _read_sequence(buf):
+    return struct.unpack_from("<Q", buf, SEQUENCE_OFFSET)[0]
+
+
+def _write_sequence(buf, sequence):
+    struct.pack_into("<Q", buf, SEQUENCE_OFFSET, sequence)
+
+
+###############################################################################
+# PUBLISHER
+###############################################################################
+def create_segment(symbols, num_bars=MARKET_DATA_SHM_BARS, name=MARKET_DATA_SHM_NAME):
+    """
+    Create (or replace) the shared segment for a fixed, ordered list of symbols.
+    Returns the SharedMemory handle; the publisher must keep it open.
+    """
+    symbols = list(symbols)
+    try:
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+    except FileNotFoundError:
+        pass
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=_segment_size(len(symbols), num_bars))
+    _created.add(shm._name)
+    buf = shm.buf
+    HEADER.pack_into(buf, 0, MAGIC, 0, len(symbols), num_bars, 0.0)
+    symbols_offset, quotes_offset, _ = _offsets(len(symbols), num_bars)
+    for i, symbol in enumerate(symbols):
+        struct.pack_into(f"{SYMBOL_SIZE}s", buf, symbols_offset + i * SYMBOL_SIZE, symbol.encode("ascii"))
+
+    # Nothing published yet: every quote and bar starts as NaN
+    size = _segment_size(len(symbols), num_bars)
+    buf[quotes_offset:size] = struct.pack("<d", math.nan) * ((size - quotes_offset) // FLOAT_SIZE)
+    return shm
+
+
+def publish(shm, quotes=None, bars=None):
+    """
+    Write quotes ({symbol: {"price", "volume", "avg_volume"}}) and daily closes
+    ({symbol: [close, ...]}) for symbols present in the segment, under the seqlock.
+    """
+    buf = shm.buf
+    _, _, num_symbols, num_bars, _ = HEADER.unpack_from(buf, 0)
+    symbols_offset, quotes_offset, bars_offset = _offsets(num_symbols, num_bars)
+    index = _read_symbol_index(buf, num_symbols, symbols_offset)
+
+    sequence = _read_sequence(buf)
+    _write_sequence(buf, sequence + 1)
+    try:
+        now = time.time()
+        quote_values = buf[quotes_offset:bars_offset].cast("d")
+        for symbol, quote in (quotes or {}).items():
+            i = index.get(symbol)
+            if i is None:
+                continue
+            base = i * len(QUOTE_FIELDS)
+            quote_values[base] = quote.get("price", math.nan)
+            quote_values[base + 1] = quote.get("volume", math.nan)
+            quote_values[base + 2] = quote.get("avg_volume", math.nan)
+            quote_values[base + 3] = now
+        quote_values.release()
+
+        bar_values = buf[bars_offset:bars_offset + num_symbols * num_bars * FLOAT_SIZE].cast("d")
+        for symbol, closes in (bars or {}).items():
+            i = index.get(symbol)
+            if i is None:
+                continue
+            closes = list(closes)[-num_bars:]
+            padded = [math.nan] * (num_bars - len(closes)) + closes
+            bar_values[i * num_bars:(i + 1) * num_bars] = memoryview(struct.pack(f"<{num_bars}d", *padded)).cast("d")
+        bar_values.release()
+
+        struct.pack_into("<d", buf, PUBLISHED_AT_OFFSET, now)
+    finally:
+        _write_sequence(buf, sequence + 2)
+
+
+###############################################################################
+# READERS
+###############################################################################
+def _read_symbol_index(buf, num_symbols, symbols_offset):
+    index = {}
+    for i in range(num_symbols):
+        raw = bytes(buf[symbols_offset + i * SYMBOL_SIZE:symbols_offset + (i + 1) * SYMBOL_SIZE])
+        index[raw.rstrip(b"\0").decode("ascii")] = i
+    return index
+
+
+def attach(name=MARKET_DATA_SHM_NAME):
+    """
+    Attach to a published segment. Returns a reader dict holding the handle, the
+    symbol index and zero-copy float64 views of the quote and bar arrays.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    if shm._name not in _created:
+        # Before Python 3.13 every attaching process registers the segment with its
+        # resource tracker, which would unlink it when that reader exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+    buf = shm.buf
+    magic, _, num_symbols, num_bars, _ = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        shm.close()
+        raise Exception(f"Shared memory segment {name} is not a market data segment")
+    symbols_offset, quotes_offset, bars_offset = _offsets(num_symbols, num_bars)
+    return {
+        "shm": shm,
+        "index": _read_symbol_index(buf, num_symbols, symbols_offset),
+        "num_bars": num_bars,
+        "quotes": buf[quotes_offset:bars_offset].cast("d"),
+        "bars": buf[bars_offset:bars_offset + num_symbols * num_bars * FLOAT_SIZE].cast("d"),
+    }
+
+
+def detach(reader):
+    """
+    Release the reader's views and close its handle (the segment stays alive).
+    """
+    reader["quotes"].release()
+    reader["bars"].release()
+    reader["shm"].close()
+
+
+def read_consistent(reader, read, timeout_seconds=MARKET_DATA_SHM_READ_TIMEOUT_SECONDS):
+    """
+    Run read(reader) under the seqlock, retrying with backoff while a publish is in
+    progress or happened during the read. Returns read's result, or None when no
+    consistent snapshot could be read within timeout_seconds.
+    """
+    buf = reader["shm"].buf
+    deadline = time.monotonic() + timeout_seconds
+    sleep_seconds = 0
+    while True:
+        before = _read_sequence(buf)
+        if not before % 2:
+            result = read(reader)
+            if _read_sequence(buf) == before:
+                return result
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(sleep_seconds)
+        sleep_seconds = min(max(sleep_seconds * 2, RETRY_SLEEP_SECONDS), MAX_RETRY_SLEEP_SECONDS)
+
+
+def read_published_at(reader):
+    """
+    Return the time of the segment's last publish (0 if never published).
+    """
+    return struct.unpack_from("<d", reader["shm"].buf, PUBLISHED_AT_OFFSET)[0]
+
+
+def read_quote(reader, symbol):
+    """
+    Return a consistent {"price", "volume", "avg_volume", "updated_at"} copy for a
+    symbol, or None if it isn't in the segment, hasn't been published yet or a
+    publish kept it from being read consistently.
+    """
+    i = reader["index"].get(symbol)
+    if i is None:
+        return None
+    base = i * len(QUOTE_FIELDS)
+    values = read_consistent(reader, lambda r: r["quotes"][base:base + len(QUOTE_FIELDS)].tolist())
+    if values is None or math.isnan(values[0]):
+        return None
+    return dict(zip(QUOTE_FIELDS, values))
+
+
+def bars_view(reader, symbol):
+    """
+    Return a zero-copy float64 view of a symbol's daily closes (NaN padded, oldest
+    first), or None. Wrap it with numpy.frombuffer for vectorized math; callers that
+    need a consistent snapshot should read it inside read_consistent().
+    """
+    i = reader["index"].get(symbol)
+    if i is None:
+        return None
+    num_bars = reader["num_bars"]
+    return reader["bars"][i * num_bars:(i + 1) * num_bars]
+
+
+###############################################################################
+# CACHED READER
+###############################################################################
+# Reader attached by this process, re-attached when a symbol is missing or stale
+# (the publisher recreates the segment when its symbol set changes)
+_reader = {"reader": None, "attached_at": 0}
+REATTACH_INTERVAL_SECONDS = 10
+
+
+def _detach_cached_reader():
+    if _reader["reader"] is not None:
+        detach(_reader["reader"])
+        _reader["reader"] = None
+
+
+atexit.register(_detach_cached_reader)
+
+
+def _get_reader(force_reattach=False):
+    now = time.time()
+    if _reader["reader"] is not None and not force_reattach:
+        return _reader["reader"]
+    if now - _reader["attached_at"] < REATTACH_INTERVAL_SECONDS:
+        return _reader["reader"]
+    _reader["attached_at"] = now
+    _detach_cached_reader()
+    try:
+        _reader["reader"] = attach()
+    except FileNotFoundError:
+        pass
+    return _reader["reader"]
+
+
+def get_shared_quote(symbol, max_age_seconds):
+    """
+    Return the published quote for a symbol if it's newer than max_age_seconds.
+    """
+    reader = _get_reader()
+    quote = read_quote(reader, symbol) if reader else None
+    if quote is None or time.time() - quote["updated_at"] > max_age_seconds:
+        reader = _get_reader(force_reattach=True)
+        quote = read_quote(reader, symbol) if reader else None
+    if quote is None or time.time() - quote["updated_at"] > max_age_seconds:
+        return None
+    return quote
+
+
+def get_shared_closes(symbol, max_age_seconds=MARKET_DATA_CACHE_MAX_AGE["daily_bars"]):
+    """
+    Return a consistent copy of a symbol's published daily closes (oldest first),
+    or None if the symbol isn't published, the segment wasn't published within
+    max_age_seconds or it couldn't be read consistently.
+    """
+    def is_fresh(reader):
+        return reader is not None and symbol in reader["index"] and time.time() - read_published_at(reader) <= max_age_seconds
+
+    reader = _get_reader()
+    if not is_fresh(reader):
+        reader = _get_reader(force_reattach=True)
+    if not is_fresh(reader):
+        return None
+    closes = read_consistent(reader, lambda r: bars_view(r, symbol).tolist())
+    closes = [close for close in closes or [] if not math.isnan(close)]
+    return closes or None
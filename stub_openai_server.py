@@ -0,0 +1,157 @@
+"""
+Local OpenAI-compatible stub for running the decision pipeline without an API key
+or network. Serves POST /v1/chat/completions (plain and SSE streaming, with usage
+and a simulated prompt-prefix cache) and GET /v1/models.
+
+    Triage requests   -> {"review": [...]}, flagging a deterministic --review-ratio share of symbols
+    Other requests    -> "[]" (no trades), or the contents of --decisions-file
+
+Usage: python stub_openai_server.py [--port 8089] [--latency-ms 200] [--review-ratio 0.2]
+Then set OPENAI_BASE_URL (and TRIAGE_BASE_URL) to http://127.0.0.1:8089/v1.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Providers only cache prefixes of at least this many tokens
+MIN_CACHED_TOKENS = 1024
+
+_settings = {"latency_ms": 200, "review_ratio": 0.2, "decisions": "[]"}
+_seen_prefixes = set()
+_lock = threading.Lock()
+
+
+def count_tokens(text):
+    # Rough estimate, close enough for comparing prompt sizes
+    return max(1, len(text) // 4)
+
+
+def build_reply(messages):
+    """
+    Return the assistant content for a request.
+    """
+    if messages and "Triage AI Prompt" in messages[0].get("content", ""):
+        lines = messages[-1].get("content", "").splitlines()
+        symbols = [line.split()[0] for line in lines if line.strip()]
+        flagged = [symbol for symbol in symbols if zlib.crc32(symbol.encode()) % 1000 < _settings["review_ratio"] * 1000]
+        return json.dumps({"review": flagged})
+    return _settings["decisions"]
+
+
+def build_usage(messages, content):
+    """
+    Count prompt and completion tokens. Like provider-side prompt caching, the longest
+    run of leading messages already seen in an earlier request counts as cached.
+    """
+    message_tokens = [count_tokens(message.get("content", "")) for message in messages]
+    prefix_keys = [
+        hashlib.sha1(json.dumps(messages[:length], sort_keys=True).encode()).hexdigest()
+        for length in range(1, len(messages) + 1)
+    ]
+    with _lock:
+        cached_length = max((length for length, key in enumerate(prefix_keys, 1) if key in _seen_prefixes), default=0)
+        _seen_prefixes.update(prefix_keys)
+    prefix_tokens = sum(message_tokens[:cached_length])
+    cached_tokens = prefix_tokens if prefix_tokens >= MIN_CACHED_TOKENS else 0
+
+    prompt_tokens = sum(message_tokens)
+    completion_tokens = count_tokens(content)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = request.get("messages", [])
+        model = request.get("model", "stub")
+        content = build_reply(messages)
+        usage = build_usage(messages, content)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        time.sleep(_settings["latency_ms"] / 1000)
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send_chunk(choices, usage=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices}
+            if usage is not None:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+        for i, piece in enumerate(pieces):
+            delta = {"content": piece}
+            if i == 0:
+                delta["role"] = "assistant"
+            send_chunk([{"index": 0, "delta": delta, "finish_reason": None}])
+        send_chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if request.get("stream_options", {}).get("include_usage"):
+            send_chunk([], usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=int, default=200, help="delay before the first token")
+    parser.add_argument("--review-ratio", type=float, default=0.2, help="share of symbols flagged by triage")
+    parser.add_argument("--decisions-file", help="JSON decisions returned to non-triage requests")
+    args = parser.parse_args()
+
+    _settings["latency_ms"] = args.latency_ms
+    _settings["review_ratio"] = args.review_ratio
+    if args.decisions_file:
+        with open(args.decisions_file, "r") as file:
+            _settings["decisions"] = file.read()
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub OpenAI server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+First decision tier: a fast, cheap model screens every symbol from a minimal
+feature line and flags the ones that need a decision. Flagged symbols are sent,
+fully enriched, to the primary model in make_ai_decisions; unflagged holdings stay
+in its portfolio overview as a compact line, so it still sees the whole portfolio
+when sizing trades.
+"""
+import json
+import re
+from config import (
+    TRIAGE_MODEL_NAME, TRIAGE_BASE_URL, TRIAGE_API_KEY, TRIAGE_BATCH_SIZE
+)
+from log import log_debug, log_error
+from openai_requests import make_ai_request
+
+TRIAGE_SYSTEM_PROMPT = (
+    "**Triage AI Prompt:**\n\n"
+    "You screen stocks for an investment advisor. For each stock line below, decide whether "
+    "it clearly needs no action this cycle (hold) or deserves a full review for a buy or sell.\n"
+    "Flag a stock for review when, for example, a held position shows a large gain or loss, the price "
+    "crosses or strays far from its moving averages, or a watchlist stock looks like a buying opportunity. "
+    "Stocks with a pending order never need review.\n\n"
+    "Each line: SYMBOL held=<0|1> price=<price> pl_pct=<unrealized P/L %> sma50=<50-day average> "
+    "sma200=<200-day average> order=<pending order side or none>\n\n"
+    "Return only a JSON object with the symbols to review, e.g. {\"review\": [\"AAPL\", \"MSFT\"]}."
+)
+
+
+def _feature_line(symbol, stock_data, held):
+    order = stock_data.get("open_orders")
+    return (
+        f"{symbol} held={1 if held else 0} price={stock_data.get('price', 0)} "
+        f"pl_pct={stock_data.get('unrealized_plpc', 0) if held else 'n/a'} "
+        f"sma50={stock_data.get('50_day_mavg_price', 'n/a')} sma200={stock_data.get('200_day_mavg_price', 'n/a')} "
+        f"order={order['side'] if order else 'none'}"
+    )
+
+
+def compact_holding(stock_data):
+    """
+    Return the compact prompt entry of a holding triage didn't flag.
+    """
+    data = {
+        "current_value": stock_data.get("current_value", 0),
+        "unrealized_plpc": stock_data.get("unrealized_plpc", 0),
+        "triaged": "no review needed",
+    }
+    order = stock_data.get("open_orders")
+    if order:
+        data["open_orders"] = {"side": order["side"], "notional": order["notional"]}
+    return data
+
+
+def parse_triage_response(ai_content, symbols):
+    """
+    Return the flagged symbols of a triage response, ignoring unknown ones.
+    """
+    flagged = json.loads(re.sub(r'```json|```', '', ai_content.strip())).get("review", [])
+    return {symbol for symbol in flagged if symbol in symbols}
+
+
+def triage_symbols(portfolio_overview, watchlist_overview):
+    """
+    Screen every portfolio and watchlist symbol with the triage model in batches of
+    TRIAGE_BATCH_SIZE. Returns the set of symbols that need a full review; a batch
+    that fails is flagged entirely, so errors never hide a symbol from review.
+    """
+    lines = {symbol: _feature_line(symbol, stock_data, True) for symbol, stock_data in portfolio_overview.items()}
+    lines.update({
+        symbol: _feature_line(symbol, stock_data, False)
+        for symbol, stock_data in watchlist_overview.items() if symbol not in lines
+    })
+    symbols = list(lines)
+
+    flagged = set()
+    for start in range(0, len(symbols), TRIAGE_BATCH_SIZE):
+        batch = symbols[start:start + TRIAGE_BATCH_SIZE]
+        ai_prompt = "\n".join(lines[symbol] for symbol in batch)
+        try:
+            ai_content = make_ai_request(
+                [{"role": "system", "content": TRIAGE_SYSTEM_PROMPT}, {"role": "user", "content": ai_prompt}],
+                f"triage ({len(batch)} symbols)",
+                model=TRIAGE_MODEL_NAME, base_url=TRIAGE_BASE_URL, api_key=TRIAGE_API_KEY
+            )
+            log_debug(f"AI triage response:{chr(10)}{ai_content.strip()}")
+            flagged.update(parse_triage_response(ai_content, batch))
+        except Exception as e:
+            log_error(f"Error triaging {len(batch)} symbols, sending all of them to review: {e}")
+            flagged.update(batch)
+    return flagged
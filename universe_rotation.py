@@ -0,0 +1,142 @@
+import heapq
+import json
+import math
+import os
+import time
+from config import (
+    ROTATION_STATE_FILE, ROTATION_SIGNALS_TTL_SECONDS,
+    ROTATION_MAX_STALENESS_SECONDS, ROTATION_WEIGHTS
+)
+from log_utils.log import log_debug, log_warning
+from yfinance_functions import get_batch_daily_bars, get_cached_news_count
+
+# Last evaluation time per symbol (epoch seconds), or the time it was first seen if it
+# was never evaluated; persisted to ROTATION_STATE_FILE
+_last_evaluated = None
+
+# Cheap per-symbol signals derived from one batched daily-bars download
+_signals = {
+    "fetched_at": 0,
+    "symbols": frozenset(),
+    "by_symbol": {},
+}
+
+
+def _load_state():
+    """
+    Load last evaluation times from disk once per process.
+    """
+    global _last_evaluated
+    if _last_evaluated is not None:
+        return
+    _last_evaluated = {}
+    if os.path.exists(ROTATION_STATE_FILE):
+        try:
+            with open(ROTATION_STATE_FILE, "r") as file:
+                _last_evaluated = json.load(file)
+        except Exception as e:
+            log_warning(f"Ignoring unreadable rotation state {ROTATION_STATE_FILE}: {e}")
+
+
+def _save_state():
+    try:
+        with open(ROTATION_STATE_FILE, "w") as file:
+            json.dump(_last_evaluated, file)
+    except Exception as e:
+        log_warning(f"Error saving rotation state: {e}")
+
+
+def compute_signals(bars):
+    """
+    Compute 5-day return, daily volatility and volume spike (all in %/ratios)
+    from a symbol's daily closes and volumes.
+    """
+    closes = bars["closes"]
+    volumes = bars["volumes"]
+    signals = {"return_pct": 0.0, "volatility_pct": 0.0, "volume_spike": 1.0}
+    if len(closes) >= 2:
+        base = closes[-6] if len(closes) >= 6 else closes[0]
+        if base:
+            signals["return_pct"] = (closes[-1] - base) / base * 100
+        returns = [(b - a) / a for a, b in zip(closes, closes[1:]) if a]
+        if len(returns) >= 2:
+            mean = sum(returns) / len(returns)
+            signals["volatility_pct"] = math.sqrt(sum((r - mean) ** 2 for r in returns) / (len(returns) - 1)) * 100
+    if len(volumes) >= 2:
+        average_volume = sum(volumes[:-1]) / (len(volumes) - 1)
+        if average_volume > 0:
+            signals["volume_spike"] = volumes[-1] / average_volume
+    return signals
+
+
+def refresh_signals(symbols):
+    """
+    Refresh the cached signals with one batched request when they are older than
+    ROTATION_SIGNALS_TTL_SECONDS or new symbols appeared.
+    """
+    symbols = frozenset(symbols)
+    is_fresh = time.time() - _signals["fetched_at"] < ROTATION_SIGNALS_TTL_SECONDS
+    if is_fresh and symbols <= _signals["symbols"]:
+        return
+    bars_by_symbol = get_batch_daily_bars(symbols)
+    _signals["by_symbol"] = {symbol: compute_signals(bars) for symbol, bars in bars_by_symbol.items()}
+    _signals["symbols"] = symbols
+    _signals["fetched_at"] = time.time()
+    log_debug(f"Refreshed rotation signals for {len(bars_by_symbol)}/{len(symbols)} symbols")
+
+
+def score_symbol(symbol, now):
+    """
+    Return (is_starved, score) for a symbol. Starved symbols, not evaluated within
+    ROTATION_MAX_STALENESS_SECONDS, always rank above the rest, oldest first.
+    """
+    age_seconds = now - _last_evaluated.get(symbol, now)
+    if age_seconds >= ROTATION_MAX_STALENESS_SECONDS:
+        return True, age_seconds
+
+    signals = _signals["by_symbol"].get(symbol, {})
+    score = (
+        ROTATION_WEIGHTS["age_hours"] * age_seconds / 3600
+        + ROTATION_WEIGHTS["abs_return_pct"] * abs(signals.get("return_pct", 0.0))
+        + ROTATION_WEIGHTS["volatility_pct"] * signals.get("volatility_pct", 0.0)
+        + ROTATION_WEIGHTS["volume_spike"] * max(0.0, signals.get("volume_spike", 1.0) - 1)
+        + ROTATION_WEIGHTS["news_count"] * get_cached_news_count(symbol)
+    )
+    return False, score
+
+
+def rank_symbols(symbols, limit, exclude=()):
+    """
+    Return the `limit` highest-priority symbols without marking them as evaluated.
+    Uses a bounded heap, so cost is O(n log limit). Ties keep the order of `symbols`.
+    """
+    _load_state()
+    exclude = set(exclude)
+    candidates = [symbol for symbol in symbols if symbol not in exclude]
+    if not candidates:
+        return []
+
+    try:
+        refresh_signals(candidates)
+    except Exception as e:
+        log_warning(f"Error refreshing rotation signals, ranking by age only: {e}")
+
+    now = time.time()
+    for symbol in candidates:
+        _last_evaluated.setdefault(symbol, now)
+
+    # nlargest is stable, so ties (e.g. never-evaluated symbols) keep the input order
+    return heapq.nlargest(limit, candidates, key=lambda symbol: score_symbol(symbol, now))
+
+
+def mark_evaluated(symbols):
+    """
+    Mark symbols picked with rank_symbols() as evaluated this cycle.
+    """
+    if not symbols:
+        return
+    _load_state()
+    now = time.time()
+    for symbol in symbols:
+        _last_evaluated[symbol] = now
+    _save_state()
@@ -0,0 +1,119 @@
+"""
+Pre-market warm-up. WARMUP_LEAD_SECONDS before the next open (from the market
+calendar), the bot backfills what the decision cycle reads: a year of bars and
+the moving averages derived from them for every held and watchlist symbol (plus
+the risk benchmark when the risk summary is on), and the rotation signals,
+writing all of it to the market data cache. The opening cycle then only needs
+fresh quotes. The warm-up duration and the latency of the first cycle after it
+are logged.
+
+Usage: python warmup.py (runs one warm-up now, persisting to the SQLite cache)
+"""
+import os
+import sys
+import time
+
+# alpacaFunctions imports the log utilities as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_utils"))
+
+from config import WARMUP_LEAD_SECONDS, RISK_SUMMARY_ENABLED, RISK_BENCHMARK_SYMBOL
+from log_utils.log import log_info, log_warning, log_error
+import market_data_cache
+from market_calendar import get_market_session
+from watchlist_index import get_watchlist_index
+from universe_rotation import refresh_signals
+from alpacaFunctions import get_trading_client, calculate_batch_moving_averages
+from yfinance_functions import get_batch_daily_bars
+
+# Open the last warm-up ran for, its duration, and whether the first cycle after it is still to be reported
+_state = {
+    "warmed_for_open": None,
+    "seconds": None,
+    "first_cycle_pending": False,
+}
+
+
+def get_universe_symbols():
+    """
+    Return the held symbols plus every symbol of the configured watchlists.
+    """
+    symbols = set(get_watchlist_index()["symbols"])
+    try:
+        symbols.update(position.symbol for position in get_trading_client().get_all_positions())
+    except Exception as e:
+        log_error(f"Error getting positions for the warm-up: {e}")
+    return sorted(symbols)
+
+
+def run_warmup(symbols=None):
+    """
+    Backfill bars, moving averages and rotation signals for the given symbols
+    (defaults to the full universe). Returns the warm-up duration in seconds.
+    """
+    started_at = time.time()
+    symbols = get_universe_symbols() if symbols is None else sorted(set(symbols))
+    log_info(f"Warming up market data for {len(symbols)} symbols...")
+    if not market_data_cache.MARKET_DATA_CACHE_ENABLED:
+        log_warning("MARKET_DATA_CACHE_ENABLED is off, warm-up data is kept in this process only")
+
+    step_started_at = time.time()
+    try:
+        # The risk summary reads the same year of bars and also needs the benchmark's
+        history_symbols = symbols + [RISK_BENCHMARK_SYMBOL] if RISK_SUMMARY_ENABLED else symbols
+        bars_by_symbol = get_batch_daily_bars(history_symbols, period="1y")
+        calculate_batch_moving_averages(symbols)
+        log_info(f"  Bars and moving averages: {len(bars_by_symbol)} symbols in {time.time() - step_started_at:.1f}s")
+    except Exception as e:
+        log_error(f"Error backfilling bars: {e}")
+
+    step_started_at = time.time()
+    try:
+        refresh_signals(get_watchlist_index()["symbols"])
+        log_info(f"  Rotation signals: {time.time() - step_started_at:.1f}s")
+    except Exception as e:
+        log_error(f"Error refreshing rotation signals: {e}")
+
+    seconds = time.time() - started_at
+    _state["seconds"] = seconds
+    _state["first_cycle_pending"] = True
+    log_info(f"Warm-up finished in {seconds:.1f}s")
+    return seconds
+
+
+def wait_for_warmup(seconds_until_next_cycle):
+    """
+    When the warm-up for the next open is due before the next cycle, sleep until
+    WARMUP_LEAD_SECONDS before the open and run it (right away if that time has
+    passed), once per open. Returns the seconds left until the next cycle.
+    """
+    now = time.time()
+    is_open, next_open, _ = get_market_session(now)
+    if is_open or next_open is None or _state["warmed_for_open"] == next_open:
+        return seconds_until_next_cycle
+    next_cycle_at = now + seconds_until_next_cycle
+    warmup_at = next_open - WARMUP_LEAD_SECONDS
+    if warmup_at > next_cycle_at:
+        return seconds_until_next_cycle
+
+    if warmup_at > now:
+        log_info(f"Waiting {warmup_at - now:.0f} seconds for the pre-market warm-up...")
+        time.sleep(warmup_at - now)
+    _state["warmed_for_open"] = next_open
+    run_warmup()
+    return max(1, int(next_cycle_at - time.time()))
+
+
+def report_first_cycle(seconds):
+    """
+    Log the latency of the first cycle after a warm-up; later cycles are ignored.
+    """
+    if not _state["first_cycle_pending"]:
+        return
+    _state["first_cycle_pending"] = False
+    log_info(f"First cycle after the warm-up took {seconds:.1f}s (warm-up took {_state['seconds']:.1f}s)")
+
+
+if __name__ == '__main__':
+    # Without the shared cache the warmed data would be lost when this process exits
+    market_data_cache.MARKET_DATA_CACHE_ENABLED = True
+    run_warmup()
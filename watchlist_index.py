@@ -0,0 +1,60 @@
+import json
+import os
+from config import WATCHLIST_FILE, WATCHLIST_NAMES
+from log_utils.log import log_debug, log_warning
+
+# Merged view of the configured watchlists, rebuilt only when the file changes
+_index = {
+    "key": None,             # (mtime_ns, size, names) the index was built from
+    "stocks": [],            # Merged, de-duplicated stock entries in watchlist order
+    "symbols": [],           # Symbols of `stocks`, same order
+    "sorted_symbols": [],    # Symbols sorted alphabetically, for rotation selection
+    "by_symbol": {},         # Symbol -> stock entry
+}
+
+
+def _build_index(key, watchlists, names):
+    """
+    Merge the named watchlists in order, keeping the first entry of each symbol.
+    """
+    stocks = []
+    by_symbol = {}
+    for name in names:
+        if name not in watchlists:
+            log_warning(f"Watchlist '{name}' not found in {WATCHLIST_FILE}")
+            continue
+        for stock in watchlists[name]:
+            symbol = stock['symbol']
+            if symbol not in by_symbol:
+                by_symbol[symbol] = stock
+                stocks.append(stock)
+        log_debug(f"Found {len(watchlists[name])} stocks in watchlist {name}")
+
+    symbols = [stock['symbol'] for stock in stocks]
+    _index["key"] = key
+    _index["stocks"] = stocks
+    _index["symbols"] = symbols
+    _index["sorted_symbols"] = sorted(symbols)
+    _index["by_symbol"] = by_symbol
+
+
+def get_watchlist_index(names=None):
+    """
+    Return the merged watchlist index, re-parsing WATCHLIST_FILE only when its
+    modification time, size or the requested watchlist names change.
+    """
+    names = tuple(WATCHLIST_NAMES if names is None else names)
+    try:
+        stat = os.stat(WATCHLIST_FILE)
+    except OSError as e:
+        log_warning(f"Watchlist file unavailable: {e}")
+        _build_index(None, {}, ())
+        return _index
+
+    key = (stat.st_mtime_ns, stat.st_size, names)
+    if key != _index["key"]:
+        with open(WATCHLIST_FILE, "r") as file:
+            watchlists = json.load(file)
+        _build_index(key, watchlists, names)
+    return _index
+
@@ -1,44 +1,67 @@
-import yfinance as yf
-import pandas as pd
-from textblob import TextBlob
 from datetime import datetime
-import requests
+import time
+from lazy_imports import lazy_module
+from market_data_cache import cache_get, cache_put, cache_put_many
+from shm_market_data import get_shared_quote
+from market_data_providers import get_market_data_provider
+from deadline_fetch import fetch_with_deadline
+from config import MARKET_DATA_SHM_ENABLED, FETCH_SOURCES
+
+yf = lazy_module("yfinance")
+pd = lazy_module("pandas")
+requests = lazy_module("requests")
+textblob = lazy_module("textblob")
+
+# Number of news articles last returned per symbol, as (fetched_at, count) pairs
+_news_counts = {}
+
+def get_ticker_info(symbol):
+    """Get yfinance ticker info within the yfinance_info deadline."""
+    return fetch_with_deadline('yfinance_info', symbol, lambda: yf.Ticker(symbol).info)
+
+def fetch_yahoo_news(symbol):
+    """Request and parse the Yahoo Finance news search for a stock."""
+    url = f"https://query2.finance.yahoo.com/v1/finance/search?q={symbol}&newsCount=5"
+    headers = {
+        'User-Agent': 'Mozilla/5.0'
+    }
+    response = requests.get(url, headers=headers, timeout=FETCH_SOURCES['yahoo_news']['budget_seconds'])
+    response.raise_for_status()
+
+    news_items = []
+    data = response.json()
+    if 'news' in data:
+        for item in data['news']:
+            news_items.append({
+                'title': item.get('title', ''),
+                'snippet': '',  # Will be populated from the article if needed
+                'publisher': item.get('publisher', ''),
+                'link': item.get('link', ''),
+                'published_date': datetime.fromtimestamp(item.get('providerPublishTime', 0)).strftime('%Y-%m-%d %H:%M:%S') if item.get('providerPublishTime') else ''
+            })
+    return news_items
 
 def get_stock_news(symbol):
     """Get news for a stock using Yahoo Finance API."""
     try:
-        url = f"https://query2.finance.yahoo.com/v1/finance/search?q={symbol}&newsCount=5"
-        headers = {
-            'User-Agent': 'Mozilla/5.0'
-        }
-        response = requests.get(url, headers=headers)
-        
         news_items = []
-        if response.status_code == 200:
-            data = response.json()
-            if 'news' in data:
-                for item in data['news']:
-                    news_items.append({
-                        'title': item.get('title', ''),
-                        'snippet': '',  # Will be populated from the article if needed
-                        'publisher': item.get('publisher', ''),
-                        'link': item.get('link', ''),
-                        'published_date': datetime.fromtimestamp(item.get('providerPublishTime', 0)).strftime('%Y-%m-%d %H:%M:%S') if item.get('providerPublishTime') else ''
-                    })
+        try:
+            news_items = fetch_with_deadline('yahoo_news', symbol, lambda: fetch_yahoo_news(symbol))
+            _news_counts[symbol] = (time.time(), len(news_items))
+        except Exception as e:
+            print(f"Error getting news for {symbol}: {e}")
         
         # If no news found, use company description as fallback
         if not news_items:
-            ticker = yf.Ticker(symbol)
-            if hasattr(ticker, 'info'):
-                info = ticker.info
-                if 'longBusinessSummary' in info:
-                    news_items.append({
-                        'title': f"{symbol} Company Overview",
-                        'snippet': info['longBusinessSummary'],
-                        'publisher': 'Yahoo Finance',
-                        'link': f'https://finance.yahoo.com/quote/{symbol}',
-                        'published_date': datetime.now().strftime('%Y-%m-%d')
-                    })
+            info = get_ticker_info(symbol)
+            if 'longBusinessSummary' in info:
+                news_items.append({
+                    'title': f"{symbol} Company Overview",
+                    'snippet': info['longBusinessSummary'],
+                    'publisher': 'Yahoo Finance',
+                    'link': f'https://finance.yahoo.com/quote/{symbol}',
+                    'published_date': datetime.now().strftime('%Y-%m-%d')
+                })
         
         return news_items
     except Exception as e:
@@ -54,14 +77,14 @@ def analyze_news_sentiment(news_items):
     count = 0
     for article in news_items:
         if article.get('title'):
-            blob = TextBlob(article['title'])
+            blob = textblob.TextBlob(article['title'])
             sentiment = blob.sentiment.polarity
             print(f"Title sentiment for '{article['title']}': {sentiment}")
             total_sentiment += sentiment
             count += 1
             
         if article.get('snippet'):
-            blob = TextBlob(article['snippet'])
+            blob = textblob.TextBlob(article['snippet'])
             sentiment = blob.sentiment.polarity
             print(f"Snippet sentiment: {sentiment}")
             total_sentiment += sentiment
@@ -75,7 +98,7 @@ def get_stock_data(symbol, exchange=None):
     """Get basic stock data from Yahoo Finance."""
     try:
         ticker = yf.Ticker(symbol)
-        info = ticker.info if hasattr(ticker, 'info') else {}
+        info = get_ticker_info(symbol)
         
         # Get current price with fallbacks
         price = info.get('regularMarketPrice', 0)
@@ -124,10 +147,22 @@ def get_stock_data(symbol, exchange=None):
         }
 
 def get_comprehensive_stock_data(symbol, exchange=None):
-    """Get comprehensive stock data including analyst recommendations and news."""
+    """Get comprehensive stock data including analyst recommendations and news,
+    reusing the shared market data cache when enabled."""
+    cached = cache_get('comprehensive', symbol)
+    if cached:
+        return cached
+
+    data = fetch_comprehensive_stock_data(symbol, exchange)
+    if data.get('success'):
+        cache_put('comprehensive', symbol, data)
+    return data
+
+def fetch_comprehensive_stock_data(symbol, exchange=None):
+    """Fetch comprehensive stock data including analyst recommendations and news."""
     try:
         ticker = yf.Ticker(symbol)
-        info = ticker.info if hasattr(ticker, 'info') else {}
+        info = get_ticker_info(symbol)
         
         # Get news data using GoogleNews
         news_items = get_stock_news(symbol)
@@ -138,7 +173,7 @@ def get_comprehensive_stock_data(symbol, exchange=None):
         # Get recommendations
         recommendations = []
         try:
-            recs = ticker.recommendations
+            recs = fetch_with_deadline('yfinance_recommendations', symbol, lambda: ticker.recommendations)
             if isinstance(recs, pd.DataFrame) and not recs.empty:
                 # Get the last 5 recommendations
                 recent_recs = recs.tail(5)
@@ -247,3 +282,73 @@ def get_comprehensive_stock_data(symbol, exchange=None):
             'success': False,
             'error': str(e)
         }
+
+def get_batch_quotes(symbols):
+    """Get the latest price and volume for many symbols in a single request
+    to the configured market data provider."""
+    symbols = sorted(set(symbols))
+    if not symbols:
+        return {}
+
+    quotes = {}
+    try:
+        provider_quotes = fetch_with_deadline(
+            'market_data_quotes', 'latest',
+            lambda: get_market_data_provider().get_quotes(symbols), items=symbols
+        )
+        for symbol, quote in provider_quotes.items():
+            quotes[symbol] = {
+                'price': quote.price,
+                'volume': quote.volume,
+                'avg_volume': quote.avg_volume,
+            }
+        cache_put_many('quote', quotes)
+    except Exception as e:
+        print(f"Error getting batch quotes: {e}")
+    return quotes
+
+def get_cached_quote(symbol, max_age_seconds):
+    """Return the last batched quote for a symbol if it's newer than max_age_seconds,
+    checking the market data cache (this process, then the shared cache) first,
+    then the shared memory segment."""
+    cached = cache_get('quote', symbol, max_age_seconds)
+    if cached or not MARKET_DATA_SHM_ENABLED:
+        return cached
+    return get_shared_quote(symbol, max_age_seconds)
+
+def get_cached_news_count(symbol):
+    """Return the number of news articles last fetched for a symbol (0 if never fetched)."""
+    cached = _news_counts.get(symbol)
+    return cached[1] if cached else 0
+
+def get_batch_daily_bars(symbols, period="1mo"):
+    """Get daily closes, volumes and bar timestamps for many symbols in a single request to the
+    configured market data provider, fetching only the symbols missing from the
+    shared market data cache."""
+    bars_by_symbol = {}
+    missing_symbols = []
+    for symbol in sorted(set(symbols)):
+        cached = cache_get('daily_bars', f"{symbol}:{period}")
+        if cached:
+            bars_by_symbol[symbol] = cached
+        else:
+            missing_symbols.append(symbol)
+    symbols = missing_symbols
+    if not symbols:
+        return bars_by_symbol
+
+    try:
+        provider_bars = fetch_with_deadline(
+            'market_data_bars', period,
+            lambda: get_market_data_provider().get_bars(symbols, period=period), items=symbols
+        )
+        for symbol, bars in provider_bars.items():
+            bars_by_symbol[symbol] = {
+                'closes': [bar.close for bar in bars],
+                'volumes': [bar.volume for bar in bars],
+                'timestamps': [bar.timestamp for bar in bars],
+            }
+        cache_put_many('daily_bars', {f"{symbol}:{period}": bars_by_symbol[symbol] for symbol in symbols if symbol in bars_by_symbol})
+    except Exception as e:
+        print(f"Error getting batch daily bars: {e}")
+    return bars_by_symbol